@@ -1,2 +1,15 @@
 watchlist = ["AMD", "NVDA", "INTC", "TSM", "QCOM", "MSFT", "AAPL", "GOOG", "AMZN", "META"]
-test_stock = "INTC"
\ No newline at end of file
+test_stock = "INTC"
+
+# Scanner signals, evaluated every 5-minute candle for the whole watchlist (see tools/signals.py).
+# Optional "min_step": how far the level (%, z-score or price) must move to re-alert within the cooldown.
+scan_rules = [
+    {"name": "new_high_14d", "type": "new_high", "days": 14},
+    {"name": "new_low_14d", "type": "new_low", "days": 14},
+    {"name": "gap_up", "type": "gap", "direction": "up", "min_pct": 2.0},
+    {"name": "gap_down", "type": "gap", "direction": "down", "min_pct": 2.0},
+    {"name": "volume_spike", "type": "volume_spike", "z": 4.0},
+    {"name": "golden_cross", "type": "ma_cross", "fast": 20, "slow": 50, "direction": "up"},
+    {"name": "move_up_since_open", "type": "move_since_open", "direction": "up", "min_pct": 4.0},
+    {"name": "move_down_since_open", "type": "move_since_open", "direction": "down", "min_pct": 4.0},
+]
@@ -1,13 +1,27 @@
-from langchain_nvidia_ai_endpoints import ChatNVIDIA
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
 import os
+import re
 import json
 import asyncio
+import hashlib
+import logging
+from time import monotonic
 from datetime import datetime, timedelta
 
-from telegram.ext.filters import TEXT
-from finhub_api import get_stock_data
+from finhub_api import get_stock_data, get_watchlist_data
+from cache import TTLCache
+from response_store import RESPONSE_STORE, check_live
+from rate_limit import INTERACTIVE
+import indicators
+from compact import compact_payload, compact_batch, encode, estimate_tokens, SHORT_TOKEN_BUDGET, DEEP_TOKEN_BUDGET
+from metrics import METRICS, span
+from lazy import lazy_import
+
+# langchain takes most of the bot's startup time; imported on first use or warmed after startup
+nvidia_endpoints = lazy_import("langchain_nvidia_ai_endpoints")
+output_parsers = lazy_import("langchain_core.output_parsers")
+prompts = lazy_import("langchain_core.prompts")
+
+LOGGER = logging.getLogger("stock_bot.ai")
 
 chat_system_prompt = """You are StockBot, a concise, factual financial assistant designed for interactive chat after the initial stock rating has been generated.
 
@@ -56,6 +70,7 @@ Rating Reasoning
 
 Rules:
 - Consider both stock-specific data and the current market sentiment (Fear & Greed Index) in your reasoning.
+- When "indicators" are present, use them (trend, RSI, distance from highs/lows) for the price history; do not recompute them.
 - If stock data (price) is empty, missing, or invalid, do NOT attempt a rating. 
   This usually happens if the user typed an incorrect or non-existent ticker. 
   Instead, politely reply:
@@ -75,6 +90,8 @@ You will receive the following information:
 - Insider sentiment
 - Market status (SPY — represents the top 500 companies)
 - Market fear and greed index
+- Price indicators when available ("indicators": returns, SMA/EMA trend, RSI, ATR, volatility,
+  distance from the 10-day high/low, volume z-score), precomputed from 5-minute candles
 
 Fear And Greed Instraction:
 Do NOT calculate or guess the numerical score.
@@ -122,17 +139,96 @@ Guidelines:
 - Keep output user-friendly, professional, and direct.
 """
 
+watchlist_system_prompt = """
+You are Beerski — a precise, no-nonsense financial assistant.
+
+You receive one shared market context ("market": SPY quote, market news, insider sentiment, Fear & Greed label)
+and data for several stocks ("stocks": price, news, insider sentiment and, when available,
+precomputed price indicators per symbol).
+
+Rate EVERY stock in "stocks" from 1 to 5, considering its own data and the shared market context.
+Do NOT calculate or guess a Fear & Greed number; act on the label only.
+If a stock's price data is empty or missing, use rating 0 and reason "not enough data".
+
+Output ONLY a JSON array, no Markdown, no text before or after it, one object per stock:
+[{"symbol": "<SYMBOL>", "rating": <1-5>, "reason": "<one short sentence, max 15 words>"}]
+"""
+
+MODEL = "meta/llama-3.1-70b-instruct"  # consider switching to a known-good model for your account
+TEMPERATURE = 0.0
+MAX_TOKENS = 800
+
 def get_nvidia_ai_client():
-    return ChatNVIDIA(
-        model="meta/llama-3.1-70b-instruct",  # consider switching to a known-good model for your account
+    return nvidia_endpoints.ChatNVIDIA(
+        model=MODEL,
         api_key=os.getenv("NVIDIA_API_KEY"),
-        temperature=0.0,
-        max_tokens=800
+        temperature=TEMPERATURE,
+        max_tokens=MAX_TOKENS
     )
 
 
+# --- LLM RESULT CACHE ---
+# temperature=0.0 makes the answer a function of (prompt, model settings, data),
+# so identical requests within the TTL are answered from memory.
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "300"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "256"))
+LLM_CACHE = TTLCache("llm", ttls={"llm": LLM_CACHE_TTL}, stale={"llm": 0}, maxsize=LLM_CACHE_SIZE, store=RESPONSE_STORE)
+
+# Fields that change on every fetch without changing the meaning of the data
+VOLATILE_KEYS = {"t", "date_range", "partial", "missing"}
+# Quote fields that move tick by tick; the key keeps only the day's change, bucketed
+TICK_KEYS = {"c", "d", "h", "l", "o", "pc"}
+DP_BUCKET = float(os.getenv("LLM_CACHE_DP_BUCKET", "0.5"))
+FLOAT_DECIMALS = 2
+
+
+def _bucket(value, step):
+    return round(round(value / step) * step, FLOAT_DECIMALS)
+
+
+def normalize_payload(data):
+    if isinstance(data, dict):
+        if "dp" in data and "c" in data:
+            # a quote: a one-cent move must not make a new key, a material move must
+            dp = data.get("dp")
+            data = {k: v for k, v in data.items() if k not in TICK_KEYS}
+            if isinstance(dp, (int, float)):
+                data["dp"] = _bucket(float(dp), DP_BUCKET)
+        return {k: normalize_payload(v) for k, v in data.items() if k not in VOLATILE_KEYS}
+    if isinstance(data, (list, tuple)):
+        return [normalize_payload(v) for v in data]
+    if isinstance(data, float):
+        return round(data, FLOAT_DECIMALS)
+    return data
+
+
+def llm_cache_key(user_input, system_prompt):
+    canonical = json.dumps(
+        {
+            "system_prompt": system_prompt,
+            "model": {"name": MODEL, "temperature": TEMPERATURE, "max_tokens": MAX_TOKENS},
+            "data": normalize_payload(user_input),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return ("llm", hashlib.sha256(canonical.encode("utf-8")).hexdigest())
+
+
+def _has_partial(payload):
+    # batch payloads nest their symbols, {"market": ..., "stocks": {symbol: {..., "partial": True}}}
+    return bool(payload.get("partial")) or any(isinstance(v, dict) and _has_partial(v) for v in payload.values())
+
+
+def is_cacheable(user_input):
+    # Only structured payloads are cached; partial ones (or batches with a partial symbol) are retried next time
+    return TEMPERATURE == 0.0 and isinstance(user_input, dict) and not _has_partial(user_input)
+
+
 def _build_template(system_prompt):
-    return ChatPromptTemplate.from_messages(
+    return prompts.ChatPromptTemplate.from_messages(
         [
             ("system", system_prompt + "\nUse insider_sentiment explicitly in your reasoning and final output."),
             ("user", "Analyze the following structured stock data:\n\n{user_input}")
@@ -142,27 +238,277 @@ def _build_template(system_prompt):
 
 def _to_user_input(data) -> str:
     if isinstance(data, (dict, list)):
-        return json.dumps(data, ensure_ascii=False, indent=2)
+        return encode(data)
     return str(data)
 
 
+def token_budget_for(system_prompt):
+    return SHORT_TOKEN_BUDGET if system_prompt == short_system_prompt else DEEP_TOKEN_BUDGET
+
+
+def compact_for_prompt(user_input, system_prompt):
+    """Compacts a stock payload to the prompt's token budget and logs the saving."""
+    if not isinstance(user_input, dict):
+        return user_input
+    payload, stats = compact_payload(user_input, token_budget_for(system_prompt))
+    LOGGER.info(
+        f"Prompt payload for {user_input.get('symbol')}: ~{stats['tokens_before']} -> "
+        f"~{stats['tokens_after']} tokens (budget {stats['budget']})"
+    )
+    return payload
+
+
+def _prepare_prompt(user_input, system_prompt):
+    """(compacted payload, LLM_CACHE key or None); CPU-bound, so the async paths run it in a thread."""
+    user_input = compact_for_prompt(user_input, system_prompt)
+    return user_input, llm_cache_key(user_input, system_prompt) if is_cacheable(user_input) else None
+
+
 def ask_nvidia_ai(user_input,system_prompt):
+    user_input, key = _prepare_prompt(user_input, system_prompt)
+    if key:
+        return LLM_CACHE.get_or_fetch(key, lambda: _invoke_nvidia_ai(user_input, system_prompt))
+    return _invoke_nvidia_ai(user_input, system_prompt)
+
+def _count_tokens(prompt_text, system_prompt, answer=None):
+    # estimates (~4 chars per token); streamed answers count chunks instead, see StreamStats
+    METRICS.increment("llm_prompt_tokens", estimate_tokens(system_prompt) + estimate_tokens(prompt_text))
+    if answer is not None:
+        METRICS.increment("llm_completion_tokens", estimate_tokens(answer))
+
+def _invoke_nvidia_ai(user_input,system_prompt):
+    check_live("LLM")
     template = _build_template(system_prompt)
     client = get_nvidia_ai_client()
-    chain = template | client | StrOutputParser()
-    return chain.invoke({"user_input": _to_user_input(user_input)}).strip()
+    chain = template | client | output_parsers.StrOutputParser()
+    prompt_text = _to_user_input(user_input)
+    with span("llm_request_seconds", mode="invoke"):
+        answer = chain.invoke({"user_input": prompt_text}).strip()
+    _count_tokens(prompt_text, system_prompt, answer)
+    return answer
 
 def ask_nvidia_ai_stream(user_input,system_prompt):
+    user_input = compact_for_prompt(user_input, system_prompt)
     template = _build_template(system_prompt)
     client = get_nvidia_ai_client()
-    chain = template | client | StrOutputParser()
+    chain = template | client | output_parsers.StrOutputParser()
     for text in chain.stream({"user_input": _to_user_input(user_input)}):
         yield text
 
-def prepare_stock_data(symbol: str):
+class StreamStats:
+    """End-of-stream statistics; each streamed chunk is counted as one token."""
+
+    def __init__(self):
+        self.started = monotonic()
+        self.first_token_at = None
+        self.finished_at = None
+        self.tokens = 0
+        self.cancelled = False
+
+    def record(self, text):
+        if self.first_token_at is None:
+            self.first_token_at = monotonic()
+        self.tokens += 1
+
+    def finish(self):
+        self.finished_at = monotonic()
+
+    @property
+    def time_to_first_token(self):
+        return None if self.first_token_at is None else self.first_token_at - self.started
+
+    @property
+    def tokens_per_second(self):
+        if self.first_token_at is None or self.finished_at is None:
+            return 0.0
+        duration = self.finished_at - self.first_token_at
+        return self.tokens / duration if duration > 0 else float(self.tokens)
+
+    def as_dict(self):
+        return {
+            "ttft_s": None if self.time_to_first_token is None else round(self.time_to_first_token, 3),
+            "tokens_per_s": round(self.tokens_per_second, 1),
+            "tokens": self.tokens,
+            "total_s": None if self.finished_at is None else round(self.finished_at - self.started, 3),
+            "cancelled": self.cancelled,
+        }
+
+
+async def astream_nvidia_ai(user_input, system_prompt, stats=None):
+    """
+    Async-native streaming: tokens are produced by the chain's async stream, so the
+    event loop is never blocked. Cancelling the consuming task stops the request.
+    Pass a StreamStats to collect time to first token / tokens per second / total tokens.
+    """
+    user_input = await asyncio.to_thread(compact_for_prompt, user_input, system_prompt)
+    async for text in _astream_chain(user_input, system_prompt, stats):
+        yield text
+
+
+async def astream_analysis(user_input, system_prompt, stats=None):
+    """
+    Streamed counterpart of analyze_from_data: a cached answer is yielded at once,
+    otherwise the model is streamed and the complete answer is stored in LLM_CACHE.
+    """
+    stats = stats if stats is not None else StreamStats()
+    user_input, key = await asyncio.to_thread(_prepare_prompt, user_input, system_prompt)
+    cached = await LLM_CACHE.apeek(key) if key else None
+    if cached is not None:
+        stats.record(cached)
+        stats.finish()
+        yield cached
+        return
+    answer = ""
+    async for text in _astream_chain(user_input, system_prompt, stats):
+        answer += text
+        yield text
+    if key and answer.strip():
+        await LLM_CACHE.aput(key, answer.strip())
+
+
+async def _astream_chain(user_input, system_prompt, stats=None):
+    stats = stats if stats is not None else StreamStats()
+    check_live("LLM")
+    template = _build_template(system_prompt)
+    client = get_nvidia_ai_client()
+    chain = template | client | output_parsers.StrOutputParser()
+    prompt_text = _to_user_input(user_input)
+    _count_tokens(prompt_text, system_prompt)
+    try:
+        async for text in chain.astream({"user_input": prompt_text}):
+            stats.record(text)
+            yield text
+    except asyncio.CancelledError:
+        stats.cancelled = True
+        raise
+    finally:
+        stats.finish()
+        if stats.time_to_first_token is not None:
+            METRICS.observe("llm_ttft_seconds", stats.time_to_first_token)
+        METRICS.observe("llm_request_seconds", stats.finished_at - stats.started, mode="stream")
+        METRICS.increment("llm_completion_tokens", stats.tokens)
+
+# --- WATCHLIST BATCH RATING ---
+# Tickers per LLM call; batches run concurrently, so a longer watchlist mostly adds parallel calls
+WATCHLIST_BATCH_SIZE = int(os.getenv("WATCHLIST_BATCH_SIZE", "5"))
+# Batches of one /watchlist sent at once, so a long list cannot crowd out other users' LLM calls
+WATCHLIST_CONCURRENCY = int(os.getenv("WATCHLIST_CONCURRENCY", "3"))
+# Symbols one /watchlist rates: one wave of concurrent batches (and ~3-4 Finnhub calls each)
+WATCHLIST_MAX_SYMBOLS = WATCHLIST_BATCH_SIZE * WATCHLIST_CONCURRENCY
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
+_RATING_LINE_RE = re.compile(r"([A-Z][A-Z0-9.\-]{0,9})\W+(?:rating\W+)?([0-5])\s*(?:/\s*5)?\W*(.*)")
+
+
+def cap_watchlist(symbols, limit=WATCHLIST_MAX_SYMBOLS):
+    """Splits a requested watchlist into (rated, dropped): only the first `limit` symbols are rated."""
+    return symbols[:limit], symbols[limit:]
+
+
+def parse_batch_ratings(text, symbols):
+    """
+    Parses a batch answer into {symbol: {"rating": int or None, "reason": str}} for the requested symbols.
+    Expects a JSON array; falls back to "SYMBOL: 4/5 reason" lines if the model ignored the format.
+    """
+    wanted = {symbol.upper() for symbol in symbols}
+    ratings = {}
+    match = _JSON_ARRAY_RE.search(text or "")
+    try:
+        items = json.loads(match.group(0)) if match else []
+    except ValueError:
+        items = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        symbol = str(item.get("symbol", "")).upper()
+        if symbol in wanted:
+            try:
+                rating = int(item.get("rating"))
+            except (TypeError, ValueError):
+                rating = None
+            ratings[symbol] = {"rating": rating or None, "reason": str(item.get("reason") or "").strip()}
+    if not ratings:
+        for line in (text or "").splitlines():
+            line_match = _RATING_LINE_RE.search(line.strip().strip("*-• "))
+            if line_match and line_match.group(1) in wanted:
+                ratings[line_match.group(1)] = {"rating": int(line_match.group(2)) or None, "reason": line_match.group(3).strip()}
+    return ratings
+
+
+async def ainvoke_nvidia_ai(user_input, system_prompt):
+    """Non-streaming async call sharing LLM_CACHE with ask_nvidia_ai."""
+    key = await asyncio.to_thread(llm_cache_key, user_input, system_prompt) if is_cacheable(user_input) else None
+    cached = await LLM_CACHE.apeek(key) if key else None
+    if cached is not None:
+        return cached
+    check_live("LLM")
+    template = _build_template(system_prompt)
+    chain = template | get_nvidia_ai_client() | output_parsers.StrOutputParser()
+    prompt_text = _to_user_input(user_input)
+    with span("llm_request_seconds", mode="ainvoke"):
+        answer = (await chain.ainvoke({"user_input": prompt_text})).strip()
+    _count_tokens(prompt_text, system_prompt, answer)
+    if key and answer:
+        await LLM_CACHE.aput(key, answer)
+    return answer
+
+
+async def arate_watchlist(watchlist_data, batch_size=WATCHLIST_BATCH_SIZE, concurrency=WATCHLIST_CONCURRENCY):
+    """
+    Rates every symbol of a get_watchlist_data result with batched LLM calls, several tickers
+    per prompt, at most `concurrency` batches at once. Returns {symbol: {"rating", "reason"}}.
+    """
+    symbols = list(watchlist_data["symbols"])
+    batches = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def rate(batch):
+        payload = compact_batch(watchlist_data["market"], {sy: watchlist_data["symbols"][sy] for sy in batch})
+        try:
+            async with semaphore:
+                answer = await ainvoke_nvidia_ai(payload, watchlist_system_prompt)
+        except Exception as e:
+            LOGGER.error(f"Watchlist batch {batch} failed: {e}")
+            return {}
+        ratings = parse_batch_ratings(answer, batch)
+        if len(ratings) < len(batch):
+            LOGGER.warning(f"Watchlist batch answer is missing {sorted(set(batch) - set(ratings))}")
+        return ratings
+
+    ratings = {}
+    for result in await asyncio.gather(*(rate(batch) for batch in batches)):
+        ratings.update(result)
+    return ratings
+
+
+def attach_indicators(payloads):
+    """Adds the indicator summary from the local candle store to each {symbol: payload} that has one."""
+    try:
+        summaries = indicators.summarize(list(payloads))
+    except Exception as e:
+        LOGGER.warning(f"Indicators for {list(payloads)} failed: {e}")
+        return
+    for symbol, payload in payloads.items():
+        if isinstance(payload, dict) and symbol.upper() in summaries:
+            payload["indicators"] = summaries[symbol.upper()]
+
+
+def prepare_watchlist_data(symbols):
+    to_date = datetime.utcnow().date()
+    from_date = to_date - timedelta(days=90)
+    with span("payload_build_seconds", kind="watchlist"):
+        data = get_watchlist_data(symbols, from_date.isoformat(), to_date.isoformat())
+        attach_indicators(data["symbols"])
+        return data
+
+
+def prepare_stock_data(symbol: str, lane=INTERACTIVE):
     to_date = datetime.utcnow().date()
     from_date = to_date - timedelta(days=90)
-    return get_stock_data(symbol, from_date.isoformat(), to_date.isoformat())
+    with span("payload_build_seconds", kind="symbol"):
+        data = get_stock_data(symbol, from_date.isoformat(), to_date.isoformat(), lane)
+        if isinstance(data, dict):
+            attach_indicators({symbol: data})
+        return data
 
 
 def analyze_from_data(data,system_prompt) -> str:
@@ -0,0 +1,229 @@
+"""
+Local stand-ins for Finnhub, the NVIDIA chat model, the Telegram Bot API and yfinance,
+used by benchmark.py so load tests run offline without spending API quota.
+Every fake has configurable latency (mean +/- jitter) and error rate.
+"""
+import json
+import time
+import random
+import asyncio
+import itertools
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import requests
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from telegram.request import BaseRequest
+
+
+@dataclass
+class FakeLatency:
+    mean: float = 0.1
+    jitter: float = 0.05
+    error_rate: float = 0.0
+
+    def delay(self):
+        return max(0.0, random.uniform(self.mean - self.jitter, self.mean + self.jitter))
+
+    def fails(self):
+        return random.random() < self.error_rate
+
+
+# --- FINNHUB ---
+class FakeFinnhubClient:
+    """Answers the finnhub.Client endpoints the bot uses; errors surface as connection errors (retried)."""
+
+    def __init__(self, latency=None, invalid_symbols=("ZZZZ",)):
+        self.latency = latency or FakeLatency()
+        self.invalid_symbols = set(invalid_symbols)
+        self._session = requests.Session()
+        self.calls = 0
+
+    def _respond(self, value):
+        self.calls += 1
+        time.sleep(self.latency.delay())
+        if self.latency.fails():
+            raise requests.ConnectionError("fake finnhub connection reset")
+        return value
+
+    def quote(self, symbol):
+        if symbol in self.invalid_symbols:
+            return self._respond({"c": 0, "d": None, "dp": None, "h": 0, "l": 0, "o": 0, "pc": 0, "t": 0})
+        price = 50 + (hash(symbol) % 400)
+        return self._respond({"c": price, "d": 1.2, "dp": 0.8, "h": price * 1.01, "l": price * 0.99,
+                              "o": price, "pc": price - 1.2, "t": int(time.time())})
+
+    def company_news(self, symbol, _from=None, to=None):
+        now = int(time.time())
+        return self._respond([
+            {"headline": f"{symbol} headline {i}", "summary": f"Summary of story {i} about {symbol}. " * 4,
+             "datetime": now - i * 3600, "url": f"https://example.com/{symbol}/{i}"}
+            for i in range(20)
+        ])
+
+    def stock_insider_sentiment(self, symbol, _from=None, to=None):
+        return self._respond({"data": [{"year": 2025, "month": m, "change": 100 * m, "mspr": 1.5 * m} for m in range(1, 13)],
+                              "symbol": symbol})
+
+    def general_news(self, category, min_id=0):
+        now = int(time.time())
+        return self._respond([{"headline": f"Market story {i}", "summary": "Market summary. " * 6, "datetime": now - i * 600}
+                              for i in range(30)])
+
+    def stock_symbols(self, exchange):
+        return self._respond([{"symbol": symbol, "description": f"{symbol} Inc", "type": "Common Stock"}
+                              for symbol in ("AMD", "NVDA", "INTC", "TSM", "QCOM", "MSFT", "AAPL", "GOOG",
+                                             "AMZN", "META", "TSLA", "NFLX", "BRK.A", "BRK.B")])
+
+    def symbol_lookup(self, query):
+        return self._respond({"count": 3, "result": [{"description": f"{query} Corp {i}", "symbol": f"{query}{i}"} for i in range(3)]})
+
+
+class FakeFearAndGreed:
+    def __init__(self, latency=None):
+        self.latency = latency or FakeLatency()
+
+    def get(self):
+        time.sleep(self.latency.delay())
+        if self.latency.fails():
+            raise ConnectionError("fake fear and greed timeout")
+        return type("FearGreedIndex", (), {"value": 42.0, "description": "fear"})()
+
+
+# --- LLM ---
+FAKE_ANSWER_WORDS = (
+    "Stock Rating ================ Stock name: {symbol}: 4/5 Rating Reasoning ================== "
+    "Strong news flow, insider buying and a constructive market backdrop support the rating. 🚀"
+).split()
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model with a time to first token and a steady token rate (one word per token)."""
+
+    first_token_latency: float = 0.4
+    tokens_per_second: float = 40.0
+    answer_tokens: int = 80
+    error_rate: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _tokens(self):
+        if random.random() < self.error_rate:
+            raise RuntimeError("fake LLM error")
+        words = itertools.cycle(FAKE_ANSWER_WORDS)
+        return [next(words) + " " for _ in range(self.answer_tokens)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._tokens()
+        time.sleep(self.first_token_latency + len(tokens) / self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._tokens()
+        await asyncio.sleep(self.first_token_latency + len(tokens) / self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._tokens()
+        time.sleep(self.first_token_latency)
+        for token in tokens:
+            time.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._tokens()
+        await asyncio.sleep(self.first_token_latency)
+        for token in tokens:
+            await asyncio.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+# --- TELEGRAM ---
+class FakeTelegramRequest(BaseRequest):
+    """
+    Bot API transport for telegram.Bot: answers every method locally, so the real PTB stack
+    (including the rate limiter) runs. A failing request answers 429 with retry_after.
+    """
+
+    def __init__(self, latency=None, retry_after=1):
+        self.latency = latency or FakeLatency(mean=0.05, jitter=0.02)
+        self.retry_after = retry_after
+        self._message_ids = itertools.count(1)
+        self.calls = {}
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    @property
+    def read_timeout(self):
+        return 5.0
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit("/", 1)[-1]
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        await asyncio.sleep(self.latency.delay())
+        params = request_data.parameters if request_data is not None else {}
+        if endpoint != "getMe" and self.latency.fails():
+            body = {"ok": False, "error_code": 429, "description": "Too Many Requests",
+                    "parameters": {"retry_after": self.retry_after}}
+            return 429, json.dumps(body).encode()
+        if endpoint == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "BenchBot", "username": "bench_bot"}
+        elif endpoint in ("sendMessage", "editMessageText"):
+            result = {
+                "message_id": int(params.get("message_id") or next(self._message_ids)),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+                "text": str(params.get("text", "")),
+            }
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+def fake_text_update(bot, user_id, text, update_id):
+    """A private-chat text message Update from user_id, bound to bot."""
+    from telegram import Update
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "text": text,
+        },
+    }, bot)
+
+
+# --- YFINANCE ---
+def fake_yf_download(latency=None):
+    """yf.download stand-in returning 5-minute OHLCV candles (ticker-first columns) for the requested window."""
+    latency = latency or FakeLatency(mean=0.5, jitter=0.2)
+
+    def download(tickers, interval="5m", period=None, start=None, **kwargs):
+        time.sleep(latency.delay())
+        end = pd.Timestamp.now(tz="UTC").floor("5min")
+        begin = pd.Timestamp(start) if start is not None else end - pd.Timedelta(days=int(str(period or "14d").rstrip("d")))
+        index = pd.date_range(begin.floor("5min"), end, freq="5min")
+        index = index[(index.hour * 60 + index.minute >= 13 * 60 + 30) & (index.hour < 20) & (index.weekday < 5)]
+        if not len(index):
+            index = pd.DatetimeIndex([end])
+        rng = np.random.default_rng()
+        columns, frames = [], []
+        for ticker in tickers:
+            close = 100 * np.exp(np.cumsum(rng.normal(0, 0.003, len(index))))
+            frames.append(np.column_stack([close, close * 1.002, close * 0.998, close, rng.integers(1e3, 1e5, len(index))]))
+            columns += [(ticker, field) for field in ("Open", "High", "Low", "Close", "Volume")]
+        return pd.DataFrame(np.hstack(frames), index=index, columns=pd.MultiIndex.from_tuples(columns))
+
+    return download
@@ -0,0 +1,309 @@
+"""
+Offline load test / benchmark harness. Runs the real bot, fetch and scanner code against the local
+fakes in bench_fakes.py (no network, no API quota) and reports throughput, p50/p99 latency,
+event-loop blocking time and peak memory.
+
+    python benchmark.py users --users 50 --messages 3
+    python benchmark.py fetch --symbols 40
+    python benchmark.py scan --symbols 500
+    python benchmark.py startup
+    python benchmark.py all
+"""
+import os
+import sys
+import time
+import random
+import subprocess
+import asyncio
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+# keep benchmark candles and alert state away from the real store
+os.environ.setdefault("CANDLE_STORE_DIR", tempfile.mkdtemp(prefix="stock_bot_bench_"))
+os.environ.setdefault("PREWARM_ENABLED", "0")
+os.environ.setdefault("RESPONSE_STORE_PATH", os.path.join(os.environ["CANDLE_STORE_DIR"], "responses.sqlite3"))
+
+import bench_fakes
+from bench_fakes import FakeLatency
+from text_table import plain_table
+
+LOGGER = logging.getLogger("stock_bot.benchmark")
+
+SYMBOLS = ["AMD", "NVDA", "INTC", "TSM", "QCOM", "MSFT", "AAPL", "GOOG", "AMZN", "META", "TSLA", "NFLX"]
+
+
+class LoopMonitor:
+    """Measures event-loop blocking: how late a short periodic sleep wakes up."""
+
+    def __init__(self, interval=0.01, threshold=0.005):
+        self.interval = interval
+        self.threshold = threshold
+        self.blocked = 0.0
+        self.max_lag = 0.0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = loop.time() - started - self.interval
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                self.blocked += lag
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def report(name, latencies, wall, monitor=None, extra=None):
+    peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+    row = {
+        "scenario": name,
+        "ops": len(latencies),
+        "throughput/s": f"{len(latencies) / wall:.2f}" if wall else "-",
+        "p50 ms": f"{percentile(latencies, 50) * 1000:.0f}" if latencies else "-",
+        "p99 ms": f"{percentile(latencies, 99) * 1000:.0f}" if latencies else "-",
+        "wall s": f"{wall:.2f}",
+        "loop blocked ms": f"{monitor.blocked * 1000:.0f} (max {monitor.max_lag * 1000:.0f})" if monitor else "-",
+        "peak MB": f"{peak / 2 ** 20:.1f}" if peak is not None else "-",
+    }
+    row.update(extra or {})
+    return row
+
+
+def install_fakes(args):
+    """Swaps the Finnhub client, fear & greed and the chat model for the local fakes."""
+    import ai
+    import finhub_api
+    import finhub_client
+    import lazy
+    from rate_limit import TokenBucket
+
+    # the bot warms its lazy imports right after startup; don't count them against the first requests
+    lazy.warm_up()
+    finhub_client._CLIENT = bench_fakes.FakeFinnhubClient(FakeLatency(args.finnhub_latency, args.finnhub_latency / 2, args.finnhub_errors))
+    finhub_client._LIMITER = TokenBucket(rate=args.finnhub_rate, capacity=max(1, int(args.finnhub_rate)))
+    finhub_api.fear_and_greed = bench_fakes.FakeFearAndGreed(FakeLatency(args.finnhub_latency, args.finnhub_latency / 2))
+    model = bench_fakes.FakeChatModel(
+        first_token_latency=args.llm_ttft,
+        tokens_per_second=args.llm_tps,
+        answer_tokens=args.llm_tokens,
+        error_rate=args.llm_errors,
+    )
+    ai.get_nvidia_ai_client = lambda: model
+    if not args.warm_cache:
+        for cache in (finhub_api.SYMBOL_CACHE, finhub_api.MARKET_CACHE, ai.LLM_CACHE):
+            cache.invalidate()
+
+
+# --- SCENARIOS ---
+async def bench_users(args):
+    """N simulated users, each sending M ticker messages through bot.echo_message."""
+    install_fakes(args)
+    import bot
+    from telegram.ext import Defaults, ExtBot
+    from outbound import OUTBOUND
+
+    tg_request = bench_fakes.FakeTelegramRequest(FakeLatency(args.tg_latency, args.tg_latency / 2, args.tg_errors))
+    tg_bot = ExtBot(
+        "123456:bench",
+        request=tg_request,
+        get_updates_request=bench_fakes.FakeTelegramRequest(),
+        rate_limiter=OUTBOUND,
+        defaults=Defaults(parse_mode="MarkdownV2"),
+    )
+    await tg_bot.initialize()
+    user_ids = [100000 + i for i in range(args.users)]
+    bot._ALLOWED_ID_SET.update(user_ids)
+    update_ids = iter(range(1, 10 ** 9))
+    latencies, errors = [], 0
+
+    async def user(user_id):
+        nonlocal errors
+        context = SimpleNamespace(bot=tg_bot, user_data={}, args=[])
+        for _ in range(args.messages):
+            update = bench_fakes.fake_text_update(tg_bot, user_id, random.choice(SYMBOLS[:args.distinct]), next(update_ids))
+            started = time.perf_counter()
+            try:
+                await bot.echo_message(update, context)
+            except Exception as e:
+                LOGGER.warning(f"echo_message failed for {user_id}: {e!r}")
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    monitor = LoopMonitor()
+    monitor.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(user(user_id) for user_id in user_ids))
+    wall = time.perf_counter() - started
+    await monitor.stop()
+    await tg_bot.shutdown()
+    return report(f"users x{args.users}", latencies, wall, monitor,
+                  {"errors": errors, "telegram calls": sum(tg_request.calls.values())})
+
+
+async def bench_fetch(args):
+    """get_stock_data for M symbols from a thread pool, like concurrent users would."""
+    install_fakes(args)
+    import finhub_api
+    import finhub_client
+
+    symbols = [f"{random.choice(SYMBOLS)}{i}" for i in range(args.symbols)]
+    latencies = []
+
+    def fetch(symbol):
+        started = time.perf_counter()
+        finhub_api.get_stock_data(symbol, "2025-01-01", "2025-03-01")
+        latencies.append(time.perf_counter() - started)
+
+    monitor = LoopMonitor()
+    monitor.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        await asyncio.gather(*(asyncio.get_running_loop().run_in_executor(pool, fetch, sy) for sy in symbols))
+    wall = time.perf_counter() - started
+    await monitor.stop()
+    return report(f"fetch x{args.symbols}", latencies, wall, monitor,
+                  {"finnhub calls": finhub_client._CLIENT.calls})
+
+
+async def bench_scan(args):
+    """Scanner cycles (download, rules, notify) over M symbols: a cold cycle, then incremental ones."""
+    import httpx
+    import yfinance
+    yfinance.download = bench_fakes.fake_yf_download(FakeLatency(args.yf_latency, args.yf_latency / 2))
+    import fetch_yfinance
+    import scan_scheduler
+    from notifier import AlertNotifier
+
+    tg_latency = FakeLatency(args.tg_latency, args.tg_latency / 2)
+
+    async def telegram(request):
+        await asyncio.sleep(tg_latency.delay())
+        return httpx.Response(200, json={"ok": True, "result": True})
+
+    symbols = [f"S{i:04d}" for i in range(args.symbols)]
+    latencies = []
+    monitor = LoopMonitor()
+    monitor.start()
+    started = time.perf_counter()
+    async with AlertNotifier(token="bench", chat_ids=[1, 2, 3], transport=httpx.MockTransport(telegram)) as notifier:
+        for _ in range(args.cycles):
+            cycle_started = time.perf_counter()
+            await scan_scheduler.run_cycle(symbols, notifier)
+            latencies.append(time.perf_counter() - cycle_started)
+    wall = time.perf_counter() - started
+    await monitor.stop()
+    rules = fetch_yfinance.SIGNALS.stats()["avg_ms"]
+    return report(f"scan x{args.symbols}", latencies, wall, monitor,
+                  {"rules avg ms": round(sum(rules.values()), 2)})
+
+
+STARTUP_SCRIPT = """
+import sys, time
+started = time.perf_counter()
+import bot
+sys.stderr.write(f"phase: import bot {time.perf_counter() - started}\\n")
+started = time.perf_counter()
+import lazy
+lazy.warm_up()
+sys.stderr.write(f"phase: lazy warm-up {time.perf_counter() - started}\\n")
+"""
+
+
+async def bench_startup(args):
+    """Import cost per module in a fresh interpreter (python -X importtime): importing bot, then the lazy warm-up."""
+    env = {**os.environ, "PREWARM_ENABLED": "0", "PYTHONDONTWRITEBYTECODE": "1"}
+    result = await asyncio.to_thread(
+        subprocess.run, [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    rows, phase_rows = [], []
+    phase = "import bot"
+    for line in result.stderr.splitlines():
+        if line.startswith("phase: "):
+            name, seconds = line[len("phase: "):].rsplit(" ", 1)
+            phase_rows.append({"phase": name, "module": "(total)", "self ms": "", "cumulative ms": f"{float(seconds) * 1000:.0f}"})
+            phase = "lazy warm-up"
+            continue
+        if not line.startswith("import time:") or "|" not in line[12:] or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[12:].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        # bot's direct imports; during the warm-up the lazy modules themselves
+        if depth <= (1 if phase == "import bot" else 0) and int(cumulative_us) >= args.min_import_ms * 1000:
+            rows.append({"phase": phase, "module": name.strip(), "self ms": f"{int(self_us) / 1000:.1f}",
+                         "cumulative ms": int(cumulative_us) / 1000})
+    rows.sort(key=lambda row: (row["phase"] != "import bot", -row["cumulative ms"]))
+    for row in rows:
+        row["cumulative ms"] = f"{row['cumulative ms']:.0f}"
+    return phase_rows + rows
+
+
+SCENARIOS = {"users": bench_users, "fetch": bench_fetch, "scan": bench_scan, "startup": bench_startup}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for the stock bot")
+    parser.add_argument("scenario", choices=[*SCENARIOS, "all"])
+    parser.add_argument("--users", type=int, default=20, help="simulated concurrent users")
+    parser.add_argument("--messages", type=int, default=3, help="ticker messages per user")
+    parser.add_argument("--distinct", type=int, default=len(SYMBOLS), help="distinct tickers the users pick from")
+    parser.add_argument("--symbols", type=int, default=50, help="symbols for fetch / scan")
+    parser.add_argument("--concurrency", type=int, default=8, help="fetch threads")
+    parser.add_argument("--cycles", type=int, default=3, help="scan cycles")
+    parser.add_argument("--finnhub-latency", type=float, default=0.15)
+    parser.add_argument("--finnhub-errors", type=float, default=0.0)
+    parser.add_argument("--finnhub-rate", type=float, default=1000.0, help="Finnhub limiter calls/second")
+    parser.add_argument("--llm-ttft", type=float, default=0.4)
+    parser.add_argument("--llm-tps", type=float, default=40.0)
+    parser.add_argument("--llm-tokens", type=int, default=80)
+    parser.add_argument("--llm-errors", type=float, default=0.0)
+    parser.add_argument("--tg-latency", type=float, default=0.05)
+    parser.add_argument("--tg-errors", type=float, default=0.0, help="share of Telegram calls answered with 429")
+    parser.add_argument("--yf-latency", type=float, default=0.5)
+    parser.add_argument("--min-import-ms", type=float, default=5.0, help="startup: hide cheaper imports")
+    parser.add_argument("--warm-cache", action="store_true", help="keep caches between scenarios")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="skip peak-memory tracking (it slows Python code)")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    tables = []
+    for name in names:
+        if not args.no_tracemalloc:
+            tracemalloc.start()
+        rows = await SCENARIOS[name](args)
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        tables.append(rows if isinstance(rows, list) else [rows])
+    # load scenarios share one table, startup gets its own
+    load = [table[0] for table in tables if "ops" in table[0]]
+    for rows in ([load] if load else []) + [table for table in tables if "ops" not in table[0]]:
+        headers = list(dict.fromkeys(key for row in rows for key in row))
+        print(plain_table([[row.get(h, "") for h in headers] for row in rows], headers))
+        print()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,8 +1,11 @@
 import os
+import re
 import html
+import secrets
 import asyncio
 import contextlib
 import logging
+from datetime import datetime, timezone
 from telegram import (
     Update,
     ReplyKeyboardMarkup,
@@ -17,23 +20,62 @@ from telegram.ext import (
     Defaults
 )
 from telegram.helpers import escape_markdown
-from telegram.constants import ParseMode, ChatAction
-from telegram.error import BadRequest
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, RetryAfter, TelegramError
 from ai import (
     ask_nvidia_ai,
-    ask_nvidia_ai_stream,
+    astream_nvidia_ai,
+    astream_analysis,
+    StreamStats,
     prepare_stock_data,
+    prepare_watchlist_data,
+    arate_watchlist,
+    cap_watchlist,
     analyze_from_data,
     system_prompt,
     short_system_prompt,
     chat_system_prompt
 )
 from finhub_api import get_latest_company_news_last_two_weeks
+from session_store import SESSION_STORE
+from settings_loader import get_watchlist
+from prewarm import PREWARM
+from ticker_index import TICKERS, normalize_ticker
+from text_table import plain_table
+from outbound import OUTBOUND, TYPING
+from metrics import METRICS, request_trace, start_metrics_server
+from response_store import RESPONSE_STORE
+from lazy import warm_up_in_background
+from concurrency import (
+    ChatOrderedUpdateProcessor,
+    ANALYSIS_GATE,
+    INFLIGHT_RATINGS,
+    register_cancellable,
+    unregister_cancellable
+)
 
 TOKEN = os.environ.get("TG_TOKEN")
 ACL_ALLOWED_IDS = os.environ.get("TG_ALLOWED_IDS", "")
+ADMIN_IDS = os.environ.get("TG_ADMIN_IDS", "")
 LOGGER = logging.getLogger("stock_bot")
 
+# --- SERVING MODE ---
+# "polling" (default) or "webhook": Telegram pushes updates to a local HTTP server
+# (put a TLS reverse proxy in front of it; WEBHOOK_URL is the public address)
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram").strip("/")
+# Checked against X-Telegram-Bot-Api-Secret-Token; a random one is used per start if unset
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# Parallel HTTPS connections Telegram may open to deliver updates (1-100)
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+# Updates buffered before dispatch; when full, delivery waits (Telegram retries) instead of piling up memory
+UPDATE_QUEUE_SIZE = int(os.getenv("BOT_UPDATE_QUEUE_SIZE", "1000"))
+# Only messages are handled; don't let Telegram send anything else
+ALLOWED_UPDATES = [Update.MESSAGE]
+
 # --- STOCK LOGIC ---
 def get_stock_info(symbol: str) -> str:
     try:
@@ -45,6 +87,8 @@ def get_stock_info(symbol: str) -> str:
 
 # --- ACL ---
 _ALLOWED_ID_SET = {int(x.strip()) for x in ACL_ALLOWED_IDS.split(",") if x.strip()}
+# Admin-only commands (/stats); nobody is an admin unless TG_ADMIN_IDS is set
+_ADMIN_ID_SET = {int(x.strip()) for x in ADMIN_IDS.split(",") if x.strip()}
 
 
 def is_authorized(user_id: int) -> bool:
@@ -60,6 +104,10 @@ def _user_label(user):
     return f"id={user.id} {username} name=\"{user.first_name or ''} {user.last_name or ''}\"".strip()
 
 
+def is_admin(user_id: int) -> bool:
+    return user_id in _ADMIN_ID_SET
+
+
 def log_access(user, allowed: bool, action: str, reason: str = ""):
     status = "ALLOWED" if allowed else "DENIED"
     msg = f"ACL {status} | {action} | user: {_user_label(user)}"
@@ -72,14 +120,263 @@ def log_access(user, allowed: bool, action: str, reason: str = ""):
 
 
 # --- STREAM HELPERS ---
-# Chat Typing.
-async def _send_typing(chat_id: int, context: ContextTypes.DEFAULT_TYPE):
+# Chat Typing is a shared per-chat heartbeat: `async with TYPING.typing(bot, chat_id)` (see outbound).
+
+class StatusMessage:
+    """One status message per request; later stages edit it instead of sending new messages."""
+
+    def __init__(self, update: Update):
+        self.update = update
+        self.message = None
+        self.text = None
+
+    async def set(self, text: str):
+        if text == self.text:
+            return
+        try:
+            if self.message is None:
+                self.message = await self.update.message.reply_text(text, parse_mode=None, reply_markup=reply_menu())
+            else:
+                await self.message.edit_text(text, parse_mode=None)
+            self.text = text
+        except TelegramError as e:
+            # status updates are best effort
+            LOGGER.debug(f"Status update skipped: {e}")
+
+class StreamingReply:
+    """
+    One Telegram message that is progressively edited while text streams in.
+    Edits are coalesced: at most one per `interval` seconds; the interval backs off on
+    RetryAfter and slowly returns to the minimum while edits succeed.
+    Partial text is sent as plain text, finalize() applies the Markdown fallback chain.
+    """
+
+    MAX_LEN = 4096
+    MIN_INTERVAL = 1.0
+    MAX_INTERVAL = 5.0
+
+    def __init__(self, update: Update, started: float = None):
+        self.update = update
+        self.loop = asyncio.get_running_loop()
+        self.started = started if started is not None else self.loop.time()
+        self.message = None
+        self.shown = ""
+        self.interval = self.MIN_INTERVAL
+        self.next_edit_at = 0.0
+        self.first_visible_at = None
+        self.edits = 0
+
+    @property
+    def time_to_first_visible(self):
+        return None if self.first_visible_at is None else self.first_visible_at - self.started
+
+    def _clip(self, text):
+        return text if len(text) <= self.MAX_LEN else text[: self.MAX_LEN - 1] + "…"
+
+    async def update_text(self, text: str):
+        now = self.loop.time()
+        if not text.strip() or text == self.shown or now < self.next_edit_at:
+            return
+        clipped = self._clip(text)
+        try:
+            if self.message is None:
+                self.message = await self.update.message.reply_text(clipped, parse_mode=None, reply_markup=reply_menu())
+                self.first_visible_at = self.loop.time()
+            else:
+                # no retries: a rate-limited edit is simply skipped and merged into the next one
+                # (Message shortcuts don't take rate_limit_args, the ExtBot methods do)
+                await self.message.get_bot().edit_message_text(
+                    clipped,
+                    chat_id=self.message.chat_id,
+                    message_id=self.message.message_id,
+                    parse_mode=None,
+                    rate_limit_args={"max_retries": 0},
+                )
+            self.shown = text
+            self.edits += 1
+            self.interval = max(self.MIN_INTERVAL, self.interval * 0.9)
+            self.next_edit_at = self.loop.time() + self.interval
+        except RetryAfter as e:
+            self.interval = min(self.MAX_INTERVAL, self.interval * 2)
+            self.next_edit_at = self.loop.time() + max(_retry_after_seconds(e), self.interval)
+        except BadRequest as e:
+            LOGGER.debug(f"Streaming edit skipped: {e}")
+        except TelegramError as e:
+            # TimedOut / NetworkError: skip this edit, the next one (or finalize) carries the text
+            self.interval = min(self.MAX_INTERVAL, self.interval * 2)
+            self.next_edit_at = self.loop.time() + self.interval
+            LOGGER.warning(f"Streaming edit failed: {e}")
+
+    async def finalize(self, text: str):
+        """Final formatting pass: Markdown, then MarkdownV2 (escaped), then plain text."""
+        if self.message is None:
+            await _send_formatted(self.update, text)
+            self.first_visible_at = self.loop.time()
+            return
+        attempts = (
+            (self._clip(text), ParseMode.MARKDOWN),
+            (self._clip(escape_markdown(text, version=2)), ParseMode.MARKDOWN_V2),
+            (self._clip(text), None),
+        )
+        for body, parse_mode in attempts:
+            try:
+                await self.message.edit_text(body, parse_mode=parse_mode)
+                return
+            except BadRequest as e:
+                if "not modified" in str(e).lower():
+                    return
+                continue
+
+
+async def _send_formatted(update: Update, text: str):
+    # Send final as new message with safe parse fallbacks
+    try:
+        await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
+    except BadRequest:
+        try:
+            safe_mdv2 = escape_markdown(text, version=2)
+            await update.message.reply_text(safe_mdv2, parse_mode=ParseMode.MARKDOWN_V2)
+        except BadRequest:
+            await update.message.reply_text(text, parse_mode=None)
+
+
+def _retry_after_seconds(e: RetryAfter) -> float:
+    return float(e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after)
+
+
+def _log_first_visible(symbol: str, reply: StreamingReply):
+    if reply.time_to_first_visible is not None:
+        LOGGER.info(f"Time to first visible text for {symbol}: {reply.time_to_first_visible:.2f}s ({reply.edits} edits)")
+
+
+async def _stream_chat_reply(raw_text: str, loading_msg):
+    """Streams a chat answer into loading_msg without blocking the event loop; returns StreamStats."""
+    stats = StreamStats()
+    ai_response = ""
+    shown = ""
+    loop = asyncio.get_running_loop()
+    edit_interval = StreamingReply.MIN_INTERVAL  # seconds between edits to prevent rate limits
+    next_edit_at = loop.time() + edit_interval
     try:
-        while True:
-            await context.bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
-            await asyncio.sleep(2)
+        async for token in astream_nvidia_ai(raw_text, chat_system_prompt, stats):
+            ai_response += token
+            if loop.time() < next_edit_at:
+                continue
+            try:
+                # no retries: a rate-limited edit is skipped and merged into the next one, so the stream never stalls
+                await loading_msg.get_bot().edit_message_text(
+                    ai_response or "🤖 Generating response...",
+                    chat_id=loading_msg.chat_id,
+                    message_id=loading_msg.message_id,
+                    parse_mode=ParseMode.HTML,
+                    rate_limit_args={"max_retries": 0},
+                )
+                shown = ai_response
+                next_edit_at = loop.time() + edit_interval
+            except RetryAfter as e:
+                next_edit_at = loop.time() + max(_retry_after_seconds(e), edit_interval)
+            except BadRequest as e:
+                # e.g. an HTML tag the stream has not closed yet
+                next_edit_at = loop.time() + edit_interval
+                LOGGER.debug(f"Chat stream edit skipped: {e}")
+            except TelegramError as e:
+                next_edit_at = loop.time() + edit_interval
+                LOGGER.warning(f"Chat stream edit failed: {e}")
+        # Final edit to ensure all content is updated
+        if ai_response and ai_response != shown:
+            with contextlib.suppress(BadRequest):
+                await loading_msg.edit_text(ai_response, parse_mode=ParseMode.HTML)
     except asyncio.CancelledError:
-        return
+        with contextlib.suppress(TelegramError):
+            await loading_msg.edit_text(f"{ai_response}\n\n⏹ Stopped, a new message arrived.", parse_mode=None)
+        raise
+    return stats
+
+
+async def _analyze(symbol: str, data, prompt: str, on_text=None) -> str:
+    """Runs the model on data; with on_text the answer is streamed (on_text gets the text so far)."""
+    if on_text is None:
+        return await asyncio.to_thread(analyze_from_data, data, prompt)
+    stats = StreamStats()
+    answer = ""
+    async for token in astream_analysis(data, prompt, stats):
+        answer += token
+        await on_text(answer)
+    LOGGER.info(f"Analysis stream for {symbol}: {stats.as_dict()}")
+    return answer.strip()
+
+
+async def _rate_symbol(status: StatusMessage, symbol: str, prompt: str, data=None, on_text=None):
+    """
+    Fetch (unless data is given) + analyze one symbol inside the admission gate,
+    reporting each stage on the request's status message. on_text receives streamed text.
+    Returns (data, result).
+    """
+    async with ANALYSIS_GATE.admit(_queue_notifier(status)):
+        if data is None:
+            await status.set(f"📡 Fetching data for {symbol}...")
+            data = await asyncio.to_thread(prepare_stock_data, symbol)
+        await status.set(f"🤖 Go Go Power Rangers! Feeding the beast with {symbol} data...")
+        try:
+            # send data to AI
+            return data, await _analyze(symbol, data, prompt, on_text)
+        except TelegramError:
+            # a failed reply is not a data or model problem: refetching and re-running the model won't fix it
+            raise
+        except Exception as e:
+            # Data or analysis failed (e.g. a stale or partial payload): fetch once more and retry
+            LOGGER.warning(f"Analysis of {symbol} failed ({e}), refetching")
+            data_fallback = await asyncio.to_thread(prepare_stock_data, symbol)
+            return data_fallback, await _analyze(symbol, data_fallback, prompt, on_text)
+
+
+def _remember_snapshot(user, symbol: str, data, fetched_at=None):
+    # Only real payloads are worth reusing (not the invalid-ticker message)
+    if user and isinstance(data, dict):
+        SESSION_STORE.put(user.id, symbol, data, fetched_at=fetched_at)
+
+
+def _recent_news_from_snapshot(snapshot, days=14, limit=10):
+    """Latest news from the user's snapshot, or None if it holds no news list."""
+    news = snapshot["data"].get("news") if snapshot else None
+    if not isinstance(news, list):
+        return None
+    cutoff = datetime.now(timezone.utc).timestamp() - days * 24 * 60 * 60
+    return [item for item in news if (item.get("datetime") or 0) >= cutoff][:limit]
+
+
+def _queue_notifier(status: StatusMessage):
+    """Tells the user their place in line when all analysis slots are busy."""
+    async def notify(position: int):
+        await status.set(f"⏳ The bot is busy right now, you are #{position} in line. Your request will start automatically.")
+    return notify
+
+
+RATING_EMOJI = {5: "🚀", 4: "🚀", 3: "😐", 2: "🔻", 1: "🔻"}
+
+
+def _format_watchlist(symbols, data, ratings):
+    """Summary table (price, day change, rating) plus one reason line per symbol."""
+    rows, reasons = [], []
+    for symbol in symbols:
+        payload = data["symbols"].get(symbol)
+        if payload is None:
+            rows.append([symbol, "-", "-", "invalid" if symbol in data["invalid"] else "n/a"])
+            continue
+        price = payload.get("price") or {}
+        rating = ratings.get(symbol, {})
+        value = rating.get("rating")
+        rows.append([
+            symbol,
+            f"{price['c']:.2f}" if isinstance(price.get("c"), (int, float)) else "-",
+            f"{price['dp']:+.2f}%" if isinstance(price.get("dp"), (int, float)) else "-",
+            f"{value}/5" if value else "n/a",
+        ])
+        if rating.get("reason"):
+            reasons.append(f"{RATING_EMOJI.get(value, '•')} {symbol}: {rating['reason']}")
+    table = plain_table(rows, ["Symbol", "Price", "Day", "Rating"])
+    return "📋 Watchlist ratings\n```\n" + table + "\n```\n" + "\n".join(reasons)
+
 
 # --- MENUS ---
 # --- REPLY KEYBOARD (persistent bottom menu) ---
@@ -108,22 +405,135 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=reply_menu()
     )
 
+async def watchlist_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/watchlist [SYMBOLS...]: rates setting.watchlist (or the given symbols) in one summary."""
+    user = update.effective_user
+    if not is_authorized(user.id if user else 0):
+        log_access(user, False, "watchlist", "user not in ACL")
+        return
+    log_access(user, True, "watchlist")
+    started = asyncio.get_running_loop().time()
+    symbols = list(dict.fromkeys(normalize_ticker(arg) or arg.upper() for arg in context.args)) or get_watchlist()
+    if not symbols:
+        await update.message.reply_text("No watchlist configured.", parse_mode=None, reply_markup=reply_menu())
+        return
+    symbols, dropped = cap_watchlist(symbols)
+    if dropped:
+        await update.message.reply_text(
+            f"⚠️ /watchlist rates up to {len(symbols)} symbols at once; skipped: {', '.join(dropped)}",
+            parse_mode=None,
+        )
+    status = StatusMessage(update)
+    await status.set(f"📋 Rating {len(symbols)} symbols...")
+    with request_trace("watchlist", symbols=len(symbols), user=user.id if user else None):
+        await _rate_watchlist(update, context, status, symbols, started)
+
+
+async def _rate_watchlist(update: Update, context: ContextTypes.DEFAULT_TYPE, status: StatusMessage, symbols, started):
+    try:
+        async with TYPING.typing(context.bot, update.effective_chat.id):
+            # the whole list counts as one analysis: one shared fetch and a few batched LLM calls
+            async with ANALYSIS_GATE.admit(_queue_notifier(status)):
+                await status.set(f"📡 Fetching data for {len(symbols)} symbols...")
+                data = await asyncio.to_thread(prepare_watchlist_data, symbols)
+                await status.set(f"🤖 Rating {len(data['symbols'])} symbols...")
+                ratings = await arate_watchlist(data)
+    except Exception as e:
+        LOGGER.exception("Watchlist rating failed")
+        await status.set(f"⚠️ Watchlist rating failed: {e}")
+        return
+    await _send_formatted(update, _format_watchlist(symbols, data, ratings))
+    elapsed = asyncio.get_running_loop().time() - started
+    LOGGER.info(f"Watchlist of {len(symbols)} symbols rated in {elapsed:.2f}s")
+    await status.set(f"✅ Watchlist rated in {elapsed:.1f}s")
+
+
+def _format_stats(store_stats=None):
+    """
+    Latency percentiles per stage plus counters and queue gauges, as one HTML <pre> block
+    (escaped: metric names and labels contain underscores and other Markdown characters).
+    """
+    snapshot = METRICS.snapshot()
+
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.0f}"
+
+    rows = []
+    for (name, labels), summary in sorted(snapshot["histograms"].items()):
+        label = name.replace("_seconds", "")
+        if labels:
+            label += " " + ",".join(v for _, v in labels)
+        rows.append([label, summary["count"], ms(summary["p50"]), ms(summary["p95"]), ms(summary["p99"])])
+    lines = [plain_table(rows, ["Stage", "n", "p50", "p95", "p99"]) if rows else "no samples yet", ""]
+    for (name, labels), value in sorted(snapshot["counters"].items()) + sorted(snapshot["gauges"].items()):
+        lines.append(f"{name}{' ' + ','.join(v for _, v in labels) if labels else ''}: {value}")
+    gate, outbound = ANALYSIS_GATE.stats(), OUTBOUND.stats()
+    lines.append(f"analyses in flight: {gate['in_flight']}/{gate['limit']}, queued: {gate['waiting']}")
+    lines.append(f"telegram queue: {outbound['queued']} (max {outbound['max_queued']}), retry_after hits: {outbound['retry_after_hits']}")
+    lines.append(f"prewarm: {PREWARM.stats()}")
+    if store_stats is not None:
+        lines.append(f"response store: {store_stats}")
+    return "📈 Latency (ms)\n<pre>" + html.escape("\n".join(lines), quote=False) + "</pre>"
+
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/stats: admin-only latency and load overview."""
+    user = update.effective_user
+    if not is_admin(user.id if user else 0):
+        log_access(user, False, "stats", "not an admin")
+        return
+    log_access(user, True, "stats")
+    # the response store's totals are a full-table query, kept off the event loop
+    store_stats = await asyncio.to_thread(RESPONSE_STORE.stats) if RESPONSE_STORE is not None else None
+    await update.message.reply_text(_format_stats(store_stats), parse_mode=ParseMode.HTML)
+
+
+def _request_kind(raw_text: str, context: ContextTypes.DEFAULT_TYPE):
+    """(kind, symbol) of a text message, for the request trace."""
+    text = raw_text.upper()
+    last_symbol = context.user_data.get("last_symbol")
+    if text == "📰 LATEST 2W NEWS":
+        return "news", last_symbol
+    if text == "🆘 HELP":
+        return "help", None
+    if text == "🤔 DEEP DIVE":
+        return "deep_dive", last_symbol
+    symbol = normalize_ticker(raw_text)
+    if symbol:
+        return ("unknown_ticker" if TICKERS.is_known(symbol) is False else "rating"), symbol
+    if raw_text.startswith("!"):
+        return "chat", None
+    return "echo", None
+
+
 async def echo_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     if not is_authorized(user.id if user else 0):
         log_access(user, False, "echo_message", "user not in ACL")
         return
     log_access(user, True, "echo_message")
+    kind, symbol = _request_kind(update.message.text.strip(), context)
+    # every stage's span (Finnhub, payload, LLM, Telegram) is logged as one JSON line per request
+    with request_trace(kind, symbol=symbol, user=user.id if user else None):
+        await _handle_message(update, context, user)
+
+
+async def _handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE, user):
+    request_started = asyncio.get_running_loop().time()
     raw_text = update.message.text.strip()
     text = raw_text.upper()
     safe_text = escape_markdown(text, version=2)
 
     # Handle reply keyboard buttons by text (we compare upper-cased)
     if text == "📰 LATEST 2W NEWS":
-        symbol = (context.user_data.get("last_symbol") or "").upper()
-        if symbol and symbol.isalpha() and 1 <= len(symbol) <= 5:
+        # after a restart user_data is empty, the restored snapshot still knows the symbol
+        symbol = normalize_ticker(context.user_data.get("last_symbol") or SESSION_STORE.last_symbol(user.id))
+        if symbol:
             try:
-                news = get_latest_company_news_last_two_weeks(symbol, limit=10)
+                # Serve from the quick rating's snapshot while it is fresh
+                news = _recent_news_from_snapshot(SESSION_STORE.get_fresh(user.id, symbol))
+                if news is None:
+                    news = await asyncio.to_thread(get_latest_company_news_last_two_weeks, symbol, 10)
                 if isinstance(news, list) and news:
                     lines = [f"📰 Latest news for {symbol} (last 2w):\n"]
                     for item in news[:10]:
@@ -137,11 +547,8 @@ async def echo_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     text_out = f"No recent news found for {symbol}."
             except Exception as exc:
                 text_out = f"Failed to fetch news for {symbol}: {exc}"
-            try:            
-                await update.message.reply_text(text_out, parse_mode=None, reply_markup=reply_menu())
-            except Exception as e:
-                logging.error(f"Error sending Telegram message Trying again")
-                await update.message.reply_text(text_out, parse_mode=None, reply_markup=reply_menu())
+            # rate limits and RetryAfter are handled by the outbound scheduler
+            await update.message.reply_text(text_out, parse_mode=None, reply_markup=reply_menu())
         else:
             await update.message.reply_text("Send a stock ticker (e.g. AMD) first, then press ‘Latest 2w News’.", parse_mode=None, reply_markup=reply_menu())
         return
@@ -149,104 +556,157 @@ async def echo_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Send a stock ticker like `AMD` or `NVDA` to get info, or go fuck yourself.", parse_mode=None, reply_markup=reply_menu())
         return
     if text == "🤔 DEEP DIVE":
-        await update.message.reply_text("Let's go!.", parse_mode=None, reply_markup=reply_menu())
-        symbol = (context.user_data.get("last_symbol") or "").upper()
+        symbol = (context.user_data.get("last_symbol") or SESSION_STORE.last_symbol(user.id) or "").upper()
         if symbol:
-            # fetch stock info for deep dive
-            data = await asyncio.to_thread(prepare_stock_data, symbol)
-            await update.message.reply_text(f"🤖 Go Go Power Rangers\! \n Feeding the beast with {text} data ", reply_markup=reply_menu())
-            result = await asyncio.to_thread(analyze_from_data, data , system_prompt)  # type: ignore[name-defined]
-            await update.message.reply_text("Generating response!", parse_mode=ParseMode.MARKDOWN)
-            await update.message.reply_text(result, parse_mode=ParseMode.HTML)
+            # One status message per request, edited as the request moves through its stages
+            status = StatusMessage(update)
+            await status.set("Let's go!")
+            # fetch stock info for deep dive, reusing the quick rating's data while fresh
+            snapshot = SESSION_STORE.get_fresh(user.id, symbol)
+            reply = StreamingReply(update, started=request_started)
+            async with TYPING.typing(context.bot, update.effective_chat.id):
+                data, result = await INFLIGHT_RATINGS.run(
+                    (symbol, "deep"),
+                    lambda: _rate_symbol(
+                        status, symbol, system_prompt,
+                        data=snapshot["data"] if snapshot else None,
+                        on_text=reply.update_text
+                    )
+                )
+            if snapshot is None:
+                _remember_snapshot(user, symbol, data)
+            await reply.finalize(result)
+            await status.set(f"✅ Deep dive for {symbol} ready")
+            _log_first_visible(symbol, reply)
         else:
             await update.message.reply_text("No stock provided, run a quick search before deep diving. 🤿", parse_mode=ParseMode.MARKDOWN)
         return 
 
-    # Detect stock ticker format
-    if text.isalpha() and 1 <= len(text) <= 5:
+    # Detect stock ticker format; symbols the local index doesn't list are answered right away
+    symbol = normalize_ticker(raw_text)
+    if symbol and TICKERS.is_known(symbol) is False:
+        suggestions = TICKERS.suggest(symbol)
+        if suggestions:
+            rows = [[match, name] for match, name in suggestions]
+            await _send_formatted(update, f"🤷 {symbol} is not a listed ticker. Did you mean:\n```\n{plain_table(rows, ['Symbol', 'Name'])}\n```")
+            return
+        symbol = None
+    if symbol:
         # remember last symbol for quick callbacks
-        context.user_data["last_symbol"] = text
-        # Let user know bot is working
-        loading_text = escape_markdown("⏳ Request started...", version=2)
-        loading_msg = await update.message.reply_text(loading_text, reply_markup=reply_menu())
-
-        # Show typing indicator while we compute the response
-        typing_task = asyncio.create_task(_send_typing(update.effective_chat.id, context))
+        context.user_data["last_symbol"] = symbol
+        # Let user know bot is working; one status message per request, edited per stage
+        status = StatusMessage(update)
+        await status.set("⏳ Request started...")
 
+        PREWARM.history.record(symbol)
         accum = ""
-        last_sent = None
-        last_edit = asyncio.get_event_loop().time()
-        message_editable = False
-        try:
-
-            # Stage: fetching data
-            try:
-                # send notification message to user
-                loading_msg = await update.message.reply_text(f"Fetching data for {text} ", reply_markup=reply_menu())
-            except BadRequest:
-                pass
-            # Fetch once before streaming
-            data = await asyncio.to_thread(prepare_stock_data, text)
-
-            # Stage: analyzing
-            try:
-                loading_msg = await update.message.reply_text(f"🤖 Go Go Power Rangers\! \n Feeding the beast with {text} data ", reply_markup=reply_menu())
-            except BadRequest as e:
-                print(e)
-                pass
-            try:
-                # send data to AI
-                result = await asyncio.to_thread(analyze_from_data, data , short_system_prompt)  # type: ignore[name-defined]
-            except Exception:
-                # If data wasn't fetched yet for any reason, fetch once now
-                data_fallback = await asyncio.to_thread(prepare_stock_data, text)
-                result = await asyncio.to_thread(analyze_from_data, data_fallback , short_system_prompt)
-            accum = result
-        finally:
-            # Notification
-            loading_msg = await update.message.reply_text(f"Generating response\!", reply_markup=reply_menu())
-            typing_task.cancel()
-            with contextlib.suppress(asyncio.CancelledError):
-                await typing_task
-        if not message_editable:
-            # Send final as new message with safe parse fallbacks
-            try:
-                await update.message.reply_text(accum, parse_mode=ParseMode.MARKDOWN)
-            except BadRequest:
-                try:
-                    safe_mdv2 = escape_markdown(accum, version=2)
-                    await update.message.reply_text(safe_mdv2, parse_mode=ParseMode.MARKDOWN_V2)
-                except BadRequest:
-                    await update.message.reply_text(accum, parse_mode=None)
+        # The answer streams into one message that is edited as text arrives
+        reply = StreamingReply(update, started=request_started)
+        warmed = PREWARM.get_fresh(symbol)
+        if warmed is not None:
+            # Rated in the background a few minutes ago: answer at once
+            LOGGER.info(f"Serving pre-warmed rating for {symbol}")
+            data = warmed["data"]
+            # up to PREWARM_MAX_AGE old, so say so rather than pass it off as a fresh rating
+            age = max(1, round((datetime.now(timezone.utc).timestamp() - warmed["at"]) / 60))
+            accum = f"_Rated {age} min ago; prices may have moved since._\n\n{warmed['answer']}"
+            # the snapshot ages from the background fetch, not from now
+            _remember_snapshot(user, symbol, data, fetched_at=warmed["at"])
+        else:
+            # Show typing indicator while we compute the response
+            async with TYPING.typing(context.bot, update.effective_chat.id):
+                # Chats asking for the same symbol at the same time share one fetch + LLM call
+                data, accum = await INFLIGHT_RATINGS.run(
+                    (symbol, "short"),
+                    lambda: _rate_symbol(status, symbol, short_system_prompt, on_text=reply.update_text)
+                )
+                _remember_snapshot(user, symbol, data)
+        # Chats that attached to another chat's request get the answer as a new message
+        await reply.finalize(accum)
+        await status.set(f"✅ {symbol} rating ready")
+        _log_first_visible(symbol, reply)
     elif raw_text.startswith("!"): 
-        typing_task = asyncio.create_task(_send_typing(update.effective_chat.id, context))
         # Send a placeholder/loading message to be edited
         loading_msg = await update.message.reply_text("🤖 Generating response...", parse_mode=ParseMode.HTML)
-        ai_response = ""
-        last_edit_time = asyncio.get_event_loop().time()
-        edit_interval = 0.2  # seconds between edits to prevent rate limits
+        stream_task = asyncio.create_task(_stream_chat_reply(raw_text, loading_msg))
+        # a newer message from this chat cancels the answer (see ChatOrderedUpdateProcessor)
+        register_cancellable(update.effective_chat.id, stream_task)
         try:
-            stream = await asyncio.to_thread(ask_nvidia_ai_stream, raw_text, chat_system_prompt)  # type: ignore[name-defined]
-            for token in stream:
-                ai_response += token
-                now = asyncio.get_event_loop().time()
-                if now - last_edit_time > edit_interval:
-                    try:
-                        await loading_msg.edit_text(ai_response or "🤖 Generating response...", parse_mode=ParseMode.HTML)
-                        last_edit_time = now
-                    except Exception as e:
-                        # Optionally log or handle edit errors due to Telegram rate limits
-                        pass
-            typing_task.cancel()
-            # Final edit to ensure all content is updated
-            #await loading_msg.edit_text(ai_response, parse_mode=ParseMode.HTML)
-        except Exception as e:
-            await loading_msg.edit_text(f"⚠️ Error generating response: {e}", parse_mode=ParseMode.HTML)
+            async with TYPING.typing(context.bot, update.effective_chat.id):
+                await asyncio.wait({stream_task})
+            if stream_task.cancelled():
+                LOGGER.info("Chat stream cancelled by a newer message")
+            elif stream_task.exception() is not None:
+                await loading_msg.edit_text(f"⚠️ Error generating response: {stream_task.exception()}", parse_mode=ParseMode.HTML)
+            else:
+                LOGGER.info(f"Chat stream stats: {stream_task.result().as_dict()}")
+        finally:
+            unregister_cancellable(update.effective_chat.id, stream_task)
     else:
         await update.message.reply_text(f"🪞 You said: *{safe_text}*", reply_markup=reply_menu())
 
 
 # --- MAIN ---
+async def _post_init(app):
+    # background jobs start once the bot is up, on the bot's event loop
+    PREWARM.start()
+    # loads the local ticker index from disk and keeps it fresh
+    TICKERS.start()
+    app.bot_data["metrics_server"] = await start_metrics_server()
+    # langchain & co. are imported lazily; load them now instead of on the first request
+    app.bot_data["import_warm_up"] = asyncio.create_task(warm_up_in_background())
+
+
+async def _post_shutdown(app):
+    await PREWARM.stop()
+    await TICKERS.stop()
+    try:
+        await asyncio.to_thread(SESSION_STORE.save)
+    except OSError as e:
+        LOGGER.warning(f"Could not save session snapshots: {e}")
+    warm_up = app.bot_data.get("import_warm_up")
+    if warm_up is not None:
+        await asyncio.gather(warm_up, return_exceptions=True)
+    server = app.bot_data.get("metrics_server")
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+
+
+def _webhook_secret():
+    secret = WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    if not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", secret):
+        raise ValueError("WEBHOOK_SECRET must be 1-256 characters of A-Z, a-z, 0-9, _ and -")
+    return secret
+
+
+def run(app):
+    """Serves updates in the configured mode; each mode registers or removes the webhook on startup."""
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL:
+            raise ValueError("BOT_MODE=webhook needs WEBHOOK_URL (the public https address Telegram posts to)")
+        webhook_url = f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}"
+        LOGGER.info(f"Webhook mode: {webhook_url} -> http://{WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}")
+        # set_webhook (with the secret and max_connections) runs on startup; requests without
+        # the secret header are rejected with 403 by PTB's webhook server
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=webhook_url,
+            secret_token=_webhook_secret(),
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=ALLOWED_UPDATES,
+            bootstrap_retries=3,
+        )
+    elif BOT_MODE == "polling":
+        # start_polling deletes any webhook left over from a webhook deployment
+        LOGGER.info("Polling mode")
+        app.run_polling(allowed_updates=ALLOWED_UPDATES, bootstrap_retries=3)
+    else:
+        raise ValueError(f"Unknown BOT_MODE {BOT_MODE!r}; use 'polling' or 'webhook'")
+
+
 if __name__ == "__main__":
     # Basic logging setup
     if not logging.getLogger().handlers:
@@ -265,11 +725,21 @@ if __name__ == "__main__":
         ApplicationBuilder()
         .token(TOKEN)
         .defaults(defaults)  # 👈 sets MarkdownV2 globally
+        # different chats in parallel, one chat in order
+        .concurrent_updates(ChatOrderedUpdateProcessor())
+        # every outbound request: global + per-chat rate limits, RetryAfter backoff
+        .rate_limiter(OUTBOUND)
+        # bounded: back-pressure instead of an unbounded backlog under bursts
+        .update_queue(asyncio.Queue(maxsize=UPDATE_QUEUE_SIZE))
+        .post_init(_post_init)
+        .post_shutdown(_post_shutdown)
         .build()
     )
 
     app.add_handler(CommandHandler("start", start))
+    app.add_handler(CommandHandler("watchlist", watchlist_command))
+    app.add_handler(CommandHandler("stats", stats_command))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, echo_message))
 
     print("🚀 Bot is running with MarkdownV2 support...")
-    app.run_polling()
+    run(app)
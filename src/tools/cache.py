@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import threading
+from time import monotonic, time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from response_store import ReplayMiss
+
+LOGGER = logging.getLogger("stock_bot.cache")
+
+# Background refreshes for stale entries (stale-while-revalidate)
+_REFRESH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+
+class TTLCache:
+    """
+    Thread-safe cache with a TTL per kind of entry.
+    Keys are tuples whose first item is the kind, e.g. ("spy_quote",) or ("quote", "NVDA").
+
+    - fresh entries are returned as is
+    - stale entries (older than ttl, younger than ttl + stale) are returned immediately
+      while a single background refresh runs
+    - missing / expired entries are fetched once (single-flight); concurrent callers
+      for the same key wait for that one fetch instead of starting their own
+    Failed fetches are never cached.
+    With maxsize set, the least recently used entries are evicted first.
+    With a store (response_store.ResponseStore), fetched values are written through to disk and
+    a cold miss checks the store before fetching; in replay mode only the store is used.
+    """
+
+    def __init__(self, name, ttls, default_ttl=60, stale=None, maxsize=None, store=None):
+        self.name = name
+        self.ttls = dict(ttls)
+        self.default_ttl = default_ttl
+        # Extra seconds an expired entry may still be served while it refreshes
+        self.stale = dict(stale or {})
+        self.maxsize = maxsize
+        self.store = store
+        self._entries = OrderedDict()  # key -> (value, fetched_at), LRU order
+        self._inflight = {}            # key -> Future
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ttl_for(self, key):
+        return self.ttls.get(key[0], self.default_ttl)
+
+    def stale_for(self, key):
+        return self.stale.get(key[0], self.ttl_for(key))
+
+    @property
+    def replay(self):
+        return self.store is not None and self.store.replay
+
+    def _restore(self, key):
+        """Value from the persistent store (moved into memory with its original age), or None."""
+        if self.store is None:
+            return None
+        try:
+            found = self.store.get(self.name, key)
+        except Exception as e:
+            LOGGER.warning(f"{self.name} cache: store read for {key} failed: {e}")
+            return None
+        if found is None:
+            return None
+        value, stored_at = found
+        with self._lock:
+            self._entries[key] = (value, monotonic() - max(0.0, time() - stored_at))
+            self._entries.move_to_end(key)
+            self._evict()
+        return found
+
+    def _persist(self, key, value):
+        if self.store is not None and not self.store.replay:
+            try:
+                self.store.put(self.name, key, value, self.ttl_for(key) + self.stale_for(key))
+            except Exception as e:
+                LOGGER.warning(f"{self.name} cache: store write for {key} failed: {e}")
+
+    def get_or_fetch(self, key, fetch):
+        now = monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = now - fetched_at
+                ttl = self.ttl_for(key)
+                if age < ttl or self.replay:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return value
+                if age < ttl + self.stale_for(key):
+                    self.stale_hits += 1
+                    self._entries.move_to_end(key)
+                    if key not in self._inflight:
+                        future = Future()
+                        self._inflight[key] = future
+                        _REFRESH_POOL.submit(self._fetch, key, fetch, future)
+                    return value
+            self.misses += 1
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if owner:
+            self._fetch(key, fetch, future, cold=True)
+        return future.result()
+
+    def _fetch(self, key, fetch, future, cold=False):
+        try:
+            found = self._restore(key) if cold else None
+            if found is not None:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                future.set_result(found[0])
+                return
+            if self.replay:
+                raise ReplayMiss(f"no recorded {self.name} response for {key}")
+            value = fetch()
+        except Exception as e:
+            # a replay miss is an expected outcome, not a failure worth a warning
+            LOGGER.log(logging.DEBUG if isinstance(e, ReplayMiss) else logging.WARNING,
+                       f"{self.name} cache: fetch for {key} failed: {e}")
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            return
+        with self._lock:
+            self._entries[key] = (value, monotonic())
+            self._entries.move_to_end(key)
+            self._inflight.pop(key, None)
+            self._evict()
+        self._persist(key, value)
+        future.set_result(value)
+
+    def _peek_memory(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (monotonic() - entry[1] < self.ttl_for(key) or self.replay):
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[0]
+            self.misses += 1
+        return None
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, monotonic())
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def peek(self, key):
+        """Returns the fresh value for key or None, without fetching."""
+        value = self._peek_memory(key)
+        if value is not None:
+            return value
+        found = self._restore(key)
+        return found[0] if found is not None else None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        self._persist(key, value)
+
+    async def apeek(self, key):
+        """peek for the event loop: memory is checked in place, the store in a thread."""
+        value = self._peek_memory(key)
+        if value is not None or self.store is None:
+            return value
+        found = await asyncio.to_thread(self._restore, key)
+        return found[0] if found is not None else None
+
+    async def aput(self, key, value):
+        """put for the event loop: the store write (and its occasional eviction) runs in a thread."""
+        self._remember(key, value)
+        if self.store is not None:
+            await asyncio.to_thread(self._persist, key, value)
+
+    def _evict(self):
+        if self.maxsize is not None:
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,121 @@
+import os
+import logging
+import numpy as np
+
+LOGGER = logging.getLogger("stock_bot.candles")
+
+DAY = 24 * 60 * 60
+CANDLES_PER_SESSION = 78  # 5-minute candles in a regular session
+
+# One .npy file per symbol (memory-mapped on read), newest candle last
+CANDLE_STORE_DIR = os.getenv("CANDLE_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "candles"))
+# yfinance keeps 5-minute candles for 60 days; keep a bit less than that on disk
+RETENTION_SECONDS = 45 * DAY
+
+CANDLE_DTYPE = np.dtype([
+    ("ts", "<i8"),      # candle open time, unix seconds (UTC)
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+])
+
+
+def empty_candles():
+    return np.empty(0, dtype=CANDLE_DTYPE)
+
+
+def frame_to_candles(frame):
+    """Converts a single-symbol yfinance OHLCV DataFrame to a candle array (rows with NaN dropped)."""
+    if frame is None or frame.empty:
+        return empty_candles()
+    frame = frame.dropna(subset=["Open", "High", "Low", "Close"])
+    candles = np.empty(len(frame), dtype=CANDLE_DTYPE)
+    index = frame.index
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_convert(None)  # naive UTC
+    candles["ts"] = index.to_numpy().astype("datetime64[s]").astype("int64")
+    candles["open"] = frame["Open"].to_numpy(dtype="f8")
+    candles["high"] = frame["High"].to_numpy(dtype="f8")
+    candles["low"] = frame["Low"].to_numpy(dtype="f8")
+    candles["close"] = frame["Close"].to_numpy(dtype="f8")
+    candles["volume"] = frame["Volume"].fillna(0).to_numpy(dtype="f8") if "Volume" in frame else 0.0
+    return candles
+
+
+class CandleStore:
+    """Per-symbol candle arrays on disk; appends only keep candles newer than the stored ones."""
+
+    def __init__(self, directory=CANDLE_STORE_DIR, retention=RETENTION_SECONDS):
+        self.directory = directory
+        self.retention = retention
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, symbol):
+        return os.path.join(self.directory, f"{symbol.upper().replace('/', '_')}.npy")
+
+    def load(self, symbol, mmap=True):
+        path = self._path(symbol)
+        if not os.path.exists(path):
+            return empty_candles()
+        try:
+            return np.load(path, mmap_mode="r" if mmap else None)
+        except (OSError, ValueError) as e:
+            LOGGER.warning(f"Corrupt candle file for {symbol}, ignoring it: {e}")
+            return empty_candles()
+
+    def last_timestamp(self, symbol):
+        candles = self.load(symbol)
+        return int(candles["ts"][-1]) if len(candles) else None
+
+    def append(self, symbol, new_candles):
+        """Merges new candles into the stored ones; returns the number of candles added."""
+        if not len(new_candles):
+            return 0
+        stored = self.load(symbol, mmap=False)
+        previous_last = int(stored["ts"][-1]) if len(stored) else None
+        if len(stored):
+            # the last stored candle may have been incomplete; newer data replaces it
+            stored = stored[stored["ts"] < new_candles["ts"][0]]
+        merged = np.concatenate([stored, new_candles]) if len(stored) else np.asarray(new_candles, dtype=CANDLE_DTYPE)
+        if len(merged):
+            merged = merged[np.argsort(merged["ts"], kind="stable")]
+            keep = np.concatenate([merged["ts"][1:] != merged["ts"][:-1], [True]])
+            merged = merged[keep]
+            merged = merged[merged["ts"] >= merged["ts"][-1] - self.retention]
+        path = self._path(symbol)
+        tmp = path + ".tmp.npy"
+        np.save(tmp, merged)
+        os.replace(tmp, path)
+        if previous_last is None:
+            return len(merged)
+        return int((np.asarray(new_candles["ts"]) > previous_last).sum())
+
+    def window(self, symbol, seconds):
+        """Candles of the last `seconds` (relative to the newest stored candle)."""
+        candles = self.load(symbol)
+        if not len(candles):
+            return candles
+        start = np.searchsorted(candles["ts"], candles["ts"][-1] - seconds, side="left")
+        return candles[start:]
+
+
+# The one store the scanner writes and the rating payload's indicators read
+CANDLES = CandleStore()
+
+
+def candle_matrix(symbols, store, seconds):
+    """
+    Stacks the stored candles of every symbol into 2-D arrays (symbols x time), newest column last.
+    Shorter histories are left-padded with NaN so column -1 is each symbol's latest candle.
+    """
+    series = [store.window(sy, seconds) for sy in symbols]
+    width = max((len(c) for c in series), default=0)
+    matrix = {name: np.full((len(symbols), width), np.nan) for name in CANDLE_DTYPE.names}
+    for row, candles in enumerate(series):
+        if not len(candles):
+            continue
+        for name, values in matrix.items():
+            values[row, width - len(candles):] = candles[name]
+    return matrix
@@ -0,0 +1,176 @@
+import re
+import json
+from datetime import datetime, timezone
+
+# Token budgets per prompt type (estimated tokens of the user payload)
+SHORT_TOKEN_BUDGET = 1200
+DEEP_TOKEN_BUDGET = 3500
+
+SUMMARY_CHARS = 240
+MIN_SUMMARY_CHARS = 80
+NEWS_LIMITS = {"news": 8, "Market news": 5, "General_market_news": 6}
+INSIDER_MONTHS = 6
+NEAR_DUPLICATE_SIMILARITY = 0.7
+
+QUOTE_FIELDS = ("c", "d", "dp", "h", "l", "o", "pc")
+INSIDER_FIELDS = ("year", "month", "change", "mspr")
+# Order in which news sections are trimmed when the payload is over budget
+TRIM_ORDER = ("General_market_news", "Market news", "news")
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English / JSON; good enough for budgeting
+    return (len(text) + 3) // 4
+
+
+def encode(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _truncate(text, limit):
+    text = " ".join(str(text or "").split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + "…"
+
+
+def _words(headline):
+    return set(_WORD_RE.findall(headline.lower()))
+
+
+def _is_near_duplicate(words, seen):
+    for other in seen:
+        union = words | other
+        if union and len(words & other) / len(union) >= NEAR_DUPLICATE_SIMILARITY:
+            return True
+    return False
+
+
+def compact_news(items, limit, summary_chars=SUMMARY_CHARS):
+    if not isinstance(items, list):
+        return items
+    result, seen = [], []
+    for item in items:
+        if len(result) >= limit:
+            break
+        if not isinstance(item, dict):
+            continue
+        headline = " ".join(str(item.get("headline") or item.get("title") or "").split())
+        if not headline:
+            continue
+        words = _words(headline)
+        if _is_near_duplicate(words, seen):
+            continue
+        seen.append(words)
+        entry = {"headline": headline}
+        if item.get("datetime"):
+            try:
+                entry["date"] = datetime.fromtimestamp(int(item["datetime"]), tz=timezone.utc).date().isoformat()
+            except (TypeError, ValueError, OSError):
+                pass
+        summary = _truncate(item.get("summary"), summary_chars)
+        if summary and summary != headline:
+            entry["summary"] = summary
+        result.append(entry)
+    return result
+
+
+def compact_quote(quote):
+    if not isinstance(quote, dict):
+        return quote
+    return {k: quote[k] for k in QUOTE_FIELDS if k in quote}
+
+
+def compact_insider(insider):
+    if not isinstance(insider, dict):
+        return insider
+    rows = insider.get("data") or []
+    rows = sorted(rows, key=lambda r: (r.get("year", 0), r.get("month", 0)))[-INSIDER_MONTHS:]
+    return [{k: r[k] for k in INSIDER_FIELDS if k in r} for r in rows]
+
+
+def _compact(data, limits, summary_chars):
+    result = {
+        "symbol": data.get("symbol"),
+        "price": compact_quote(data.get("price")),
+        "news": compact_news(data.get("news"), limits["news"], summary_chars),
+        "insider_sentiment": compact_insider(data.get("insider_sentiment")),
+        "Market": compact_quote(data.get("Market")),
+        "Market news": compact_news(data.get("Market news"), limits["Market news"], summary_chars),
+        "insider_market": compact_insider(data.get("insider_market")),
+        "General_market_news": compact_news(data.get("General_market_news"), limits["General_market_news"], summary_chars),
+        "Market_fear_and_greed": data.get("Market_fear_and_greed"),
+    }
+    # keep extra sections added by later stages and partial markers
+    for key, value in data.items():
+        if key not in result and key != "date_range":
+            result[key] = value
+    return result
+
+
+def compact_payload(data, token_budget):
+    """
+    Shrinks a get_stock_data payload to the fields the prompts use and fits it into token_budget.
+    Returns (payload, stats) where stats holds the estimated tokens before and after.
+    Non-dict inputs (e.g. the invalid-ticker message) are returned unchanged.
+    """
+    tokens_before = estimate_tokens(encode(data)) if isinstance(data, (dict, list)) else estimate_tokens(str(data))
+    if not isinstance(data, dict):
+        return data, {"tokens_before": tokens_before, "tokens_after": tokens_before, "budget": token_budget}
+
+    limits = dict(NEWS_LIMITS)
+    summary_chars = SUMMARY_CHARS
+    result = _compact(data, limits, summary_chars)
+    tokens = estimate_tokens(encode(result))
+    # Over budget: shorten summaries first, then drop news items section by section
+    while tokens > token_budget:
+        if summary_chars > MIN_SUMMARY_CHARS:
+            summary_chars = max(MIN_SUMMARY_CHARS, summary_chars // 2)
+        else:
+            section = next((s for s in TRIM_ORDER if limits[s] > 0), None)
+            if section is None:
+                break
+            limits[section] -= 1
+        result = _compact(data, limits, summary_chars)
+        tokens = estimate_tokens(encode(result))
+    return result, {"tokens_before": tokens_before, "tokens_after": tokens, "budget": token_budget}
+
+
+# --- WATCHLIST BATCHES ---
+# Several tickers share one prompt, so each gets a smaller slice and the market context is sent once
+BATCH_NEWS_LIMIT = 3
+BATCH_MARKET_NEWS_LIMIT = 4
+BATCH_SUMMARY_CHARS = 120
+
+
+def compact_symbol(data, news_limit=BATCH_NEWS_LIMIT, summary_chars=BATCH_SUMMARY_CHARS):
+    """Symbol-specific sections of a payload, for prompts that carry the market context separately."""
+    result = {
+        "price": compact_quote(data.get("price")),
+        "news": compact_news(data.get("news"), news_limit, summary_chars),
+        "insider_sentiment": compact_insider(data.get("insider_sentiment")),
+    }
+    for key in ("indicators", "partial", "missing"):
+        if data.get(key):
+            result[key] = data[key]
+    return result
+
+
+def compact_market(market, news_limit=BATCH_MARKET_NEWS_LIMIT, summary_chars=BATCH_SUMMARY_CHARS):
+    return {
+        "Market": compact_quote(market.get("Market")),
+        "Market news": compact_news(market.get("Market news"), news_limit, summary_chars),
+        "insider_market": compact_insider(market.get("insider_market")),
+        "General_market_news": compact_news(market.get("General_market_news"), news_limit, summary_chars),
+        "Market_fear_and_greed": market.get("Market_fear_and_greed"),
+    }
+
+
+def compact_batch(market, symbols_data):
+    """One prompt payload for several tickers: {"market": ..., "stocks": {symbol: ...}}."""
+    return {
+        "market": compact_market(market),
+        "stocks": {symbol: compact_symbol(data) for symbol, data in symbols_data.items()},
+    }
@@ -0,0 +1,242 @@
+import os
+import asyncio
+import logging
+import contextlib
+from collections import deque
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from metrics import METRICS
+
+LOGGER = logging.getLogger("stock_bot.concurrency")
+
+# Updates processed at once across all chats (PTB's own semaphore)
+MAX_CONCURRENT_UPDATES = int(os.getenv("BOT_MAX_CONCURRENT_UPDATES", "256"))
+# Ratings / deep dives (fetch + LLM) running at once; the rest wait in the admission queue
+MAX_INFLIGHT_ANALYSES = int(os.getenv("BOT_MAX_INFLIGHT_ANALYSES", "4"))
+
+
+# --- CANCELLABLE WORK ---
+# Work that a newer message from the same chat should stop (e.g. a '!' chat answer).
+_CANCELLABLE = {}
+
+
+def register_cancellable(chat_id, task):
+    _CANCELLABLE[chat_id] = task
+
+
+def unregister_cancellable(chat_id, task):
+    if _CANCELLABLE.get(chat_id) is task:
+        _CANCELLABLE.pop(chat_id, None)
+
+
+def cancel_superseded(chat_id):
+    task = _CANCELLABLE.pop(chat_id, None)
+    if task is not None and not task.done():
+        task.cancel()
+
+
+# --- UPDATE PROCESSOR ---
+# Updates of one chat waiting behind its running update; the excess is dropped
+MAX_PENDING_PER_CHAT = int(os.getenv("BOT_MAX_PENDING_PER_CHAT", "20"))
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Processes updates from different chats concurrently while keeping the
+    updates of one chat strictly in arrival order.
+    The first update of a chat runs its chat's queue in the global slot it was given;
+    later updates of that chat join the queue and give their slot back, so a chat
+    flooding the bot holds one slot instead of starving the others.
+    A new message cancels the chat's superseded work before it waits for its turn.
+    """
+
+    def __init__(self, max_concurrent_updates=MAX_CONCURRENT_UPDATES, max_pending_per_chat=MAX_PENDING_PER_CHAT):
+        super().__init__(max_concurrent_updates)
+        self.max_pending_per_chat = max_pending_per_chat
+        self._chat_queues = {}   # chat_id -> deque of coroutines behind the running one
+        self.dropped = 0
+
+    async def do_process_update(self, update, coroutine):
+        chat_id = update.effective_chat.id if isinstance(update, Update) and update.effective_chat else None
+        if chat_id is None:
+            await coroutine
+            return
+        if update.message is not None:
+            cancel_superseded(chat_id)
+        pending = self._chat_queues.get(chat_id)
+        if pending is not None:
+            if len(pending) >= self.max_pending_per_chat:
+                coroutine.close()
+                self.dropped += 1
+                METRICS.increment("updates_dropped")
+                LOGGER.warning(f"Dropped an update from chat {chat_id}: {len(pending)} already pending")
+                return
+            pending.append(coroutine)
+            return
+        pending = self._chat_queues[chat_id] = deque([coroutine])
+        try:
+            # a failing update is logged and the chat's queue keeps draining
+            while pending:
+                try:
+                    await pending.popleft()
+                except Exception:
+                    LOGGER.exception(f"Update of chat {chat_id} failed")
+        finally:
+            self._chat_queues.pop(chat_id, None)
+            for left in pending:
+                left.close()
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        for pending in self._chat_queues.values():
+            for left in pending:
+                left.close()
+        self._chat_queues.clear()
+
+
+# --- ADMISSION QUEUE ---
+class _Ticket:
+    """A caller waiting in the admission queue; `moved` is set when callers ahead of it leave."""
+
+    def __init__(self):
+        self.moved = asyncio.Event()
+        self.position = None
+
+
+class AdmissionGate:
+    """
+    Bounds the number of in-flight analyses. When saturated, callers wait in FIFO
+    order and are told their position through the on_queued callback, again each time
+    the line moves up.
+    """
+
+    def __init__(self, limit=MAX_INFLIGHT_ANALYSES):
+        self.limit = limit
+        self.in_flight = 0
+        self._semaphore = asyncio.Semaphore(limit)
+        self._queue = deque()
+        self.admitted = 0
+        self.queued = 0
+
+    @property
+    def waiting(self):
+        return len(self._queue)
+
+    def saturated(self):
+        return self.in_flight >= self.limit or bool(self._queue)
+
+    async def _report_position(self, ticket, on_queued):
+        position = self._queue.index(ticket) + 1
+        if on_queued is None or position == ticket.position:
+            return
+        ticket.position = position
+        with contextlib.suppress(Exception):
+            await on_queued(position)
+
+    async def _wait_in_line(self, ticket, on_queued):
+        """Waits for a slot; the position is reported from the caller's own task, so it never lands after admission."""
+        acquire = asyncio.ensure_future(self._semaphore.acquire())
+        try:
+            await self._report_position(ticket, on_queued)
+            while not acquire.done():
+                ticket.moved.clear()
+                moved = asyncio.ensure_future(ticket.moved.wait())
+                try:
+                    await asyncio.wait({acquire, moved}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    moved.cancel()
+                if not acquire.done():
+                    await self._report_position(ticket, on_queued)
+            acquire.result()
+        except BaseException:
+            if acquire.done() and not acquire.cancelled() and acquire.exception() is None:
+                self._semaphore.release()
+            else:
+                acquire.cancel()
+            raise
+
+    def _leave_queue(self, ticket):
+        index = self._queue.index(ticket)
+        del self._queue[index]
+        for behind in list(self._queue)[index:]:
+            behind.moved.set()
+
+    @contextlib.asynccontextmanager
+    async def admit(self, on_queued=None):
+        if self.saturated():
+            ticket = _Ticket()
+            self._queue.append(ticket)
+            self.queued += 1
+            try:
+                await self._wait_in_line(ticket, on_queued)
+            finally:
+                self._leave_queue(ticket)
+        else:
+            await self._semaphore.acquire()
+        self.in_flight += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "queued": self.queued,
+        }
+
+
+ANALYSIS_GATE = AdmissionGate()
+
+
+# --- IN-FLIGHT COALESCING ---
+class InflightRegistry:
+    """
+    Single-flight for async work: callers asking for a key that is already running
+    attach to the running task instead of starting their own, and all of them get its result.
+    Attached callers are shielded, so one of them going away does not cancel the shared work.
+    """
+
+    def __init__(self, name="inflight"):
+        self.name = name
+        self._tasks = {}
+        self.started = 0
+        self.attached = 0
+        self.attached_by_kind = {}
+        METRICS.gauge(f"{name}_tasks", lambda: len(self._tasks))
+
+    async def run(self, key, factory):
+        task = self._tasks.get(key)
+        if task is None:
+            self.started += 1
+            METRICS.increment(f"{self.name}_started")
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _, key=key: self._tasks.pop(key, None))
+        else:
+            self.attached += 1
+            kind = key[-1] if isinstance(key, tuple) else key
+            self.attached_by_kind[kind] = self.attached_by_kind.get(kind, 0) + 1
+            METRICS.increment(f"{self.name}_attached", kind=kind)
+            LOGGER.info(f"Attached to in-flight request {key}")
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {
+            "in_flight": len(self._tasks),
+            "started": self.started,
+            "attached": self.attached,
+            "attached_by_kind": dict(self.attached_by_kind),
+        }
+
+
+INFLIGHT_RATINGS = InflightRegistry("inflight_ratings")
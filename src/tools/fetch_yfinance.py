@@ -1,64 +1,187 @@
 from math import e
 import yfinance as yf
 import pandas as pd
-import requests
+import asyncio
 import time
 import os
 import logging
-# Telegram bot info
-TOKEN = os.environ.get("TG_TOKEN")
-CHAT_ID = os.environ.get("TG_ALLOWED_IDS", "")
-symbols = ["NVDA","AMD","SPY","APPL","AMZN","RGTI","NIO","RBLX"]
+from datetime import datetime, timezone
+import numpy as np
+from candle_store import CANDLES, candle_matrix, frame_to_candles
+from notifier import AlertNotifier, AlertStateStore
+from rolling_extremes import ExtremesIndex
+from settings_loader import get_scan_rules
+from signals import SignalEngine
 
-def high_stock_scan(symbols):
+SCAN_WINDOW_DAYS = 14
+INTERVAL = "5m"
+INTERVAL_SECONDS = 5 * 60
+BATCH_SIZE = 100  # symbols per yf.download call
+# Signals from setting.scan_rules, evaluated for all symbols at once
+SIGNALS = SignalEngine(get_scan_rules())
+# Rolling highs / lows per symbol for the windows the new_high / new_low rules use, persisted next to the candles
+EXTREMES_PATH = os.path.join(CANDLES.directory, "extremes.json")
+EXTREMES = ExtremesIndex.load(EXTREMES_PATH, SIGNALS.extreme_windows())
+# Alerts already sent, so a symbol that keeps printing highs does not re-alert every cycle
+ALERT_STATE = AlertStateStore(os.path.join(CANDLES.directory, "alerts.json"))
+
+
+def _split_batch_frame(data, batch):
+    """Splits a yf.download result into one OHLCV frame per symbol."""
+    if not isinstance(data.columns, pd.MultiIndex):
+        return {batch[0]: data}
+    tickers = data.columns.get_level_values(0)
+    frames = {}
+    for sy in batch:
+        if sy in tickers:
+            frames[sy] = data[sy]
+        elif sy in data.columns.get_level_values(1):
+            # price-first column layout
+            frames[sy] = data.xs(sy, axis=1, level=1)
+    return frames
+
+
+def plan_downloads(symbols, store=CANDLES):
+    """
+    Groups symbols into batched yf.download calls: [(batch, window kwargs)].
+    Symbols with stored history only download candles newer than their last stored one;
+    new symbols get the full scan window.
+    """
+    now = int(datetime.now(timezone.utc).timestamp())
+    full, incremental = [], {}
     for sy in symbols:
-        print(f"Proccessing STOCK: {sy}")
-    # Download 14 days of 5-min interval data
-        try:
-            data = yf.download(sy, period="14d", interval="5m", prepost=False, progress=False)
-            time.sleep(1)
-            if data.empty is True: # check if dataframe is empty has API can send back empty result
-                print("Empty Data")
-                continue
-        except Exception as e:
-            logging.error(f"Data fetch for STOCK: {sy} has falied - Error details : {e} ")
-
-
-
-        # Flatten MultiIndex if needed
-        if isinstance(data.columns, pd.MultiIndex):
-            data.columns = [col[0] for col in data.columns]
-
-        # Find highest high
-        max_high = data["High"].max()
-        max_time = data["High"].idxmax()
-
-        # Check the last candle
-        last_high = data["High"].iloc[-1]
-        last_time = data.index[-1]
-
-        # Function to send Telegram message
-        def send_telegram(msg,chat):
-            url = f"https://api.telegram.org/bot{TOKEN}/sendMessage"
-            payload = {"chat_id": chat, "text": msg}
-            requests.post(url, data=payload)
-
-        # Notify if the last candle broke the high
-        if last_high >= max_high:
-            message = f"🚀 {sy} hit a new 14-day high!\nHigh: {last_high:.2f} at {last_time}"
-            for chat in CHAT_ID:
-                print(chat)
-                send_telegram(message,chat)
-                print("Notification sent!")
-                time.sleep(3)
+        last = store.last_timestamp(sy)
+        if last is None or now - last > SCAN_WINDOW_DAYS * 24 * 60 * 60:
+            full.append(sy)
         else:
-            print(f"Last candle high: {last_high:.2f}, 14 days max High: {max_high}, overall no new high.")
+            incremental[sy] = last
+
+    requests_to_run = [(full[i:i + BATCH_SIZE], {"period": f"{SCAN_WINDOW_DAYS}d"}) for i in range(0, len(full), BATCH_SIZE)]
+    if incremental:
+        # one start date for the whole batch: the oldest "last candle" (re-fetching it, it may have been partial)
+        ordered = sorted(incremental, key=incremental.get)
+        for i in range(0, len(ordered), BATCH_SIZE):
+            batch = ordered[i:i + BATCH_SIZE]
+            start = datetime.fromtimestamp(incremental[batch[0]], tz=timezone.utc)
+            requests_to_run.append((batch, {"start": start}))
+    return requests_to_run
+
+
+def download_batch(batch, window, store=CANDLES):
+    """Runs one batched download and appends the candles to the store; returns {symbol: candles added}."""
+    try:
+        data = yf.download(batch, interval=INTERVAL, prepost=False, progress=False,
+                           group_by="ticker", threads=True, **window)
+    except Exception as e:
+        logging.error(f"Data fetch for STOCKS: {batch} has falied - Error details : {e} ")
+        return {}
+    if data is None or data.empty:
+        return {}
+    return {sy: store.append(sy, frame_to_candles(frame)) for sy, frame in _split_batch_frame(data, batch).items()}
+
+
+def update_candles(symbols, store=CANDLES):
+    """Brings the local candle store up to date; returns {symbol: candles added}."""
+    added = {}
+    for batch, window in plan_downloads(symbols, store):
+        added.update(download_batch(batch, window, store))
+    return added
+
+
+def update_extremes(symbols, matrix, index=EXTREMES, store=CANDLES):
+    """
+    Feeds the rolling-extremes index the candles it has not seen yet and returns its state for the
+    newest candle as arrays with one entry per symbol: {window: {"new_high", "new_low", "high", "low"}}.
+    Which symbols have a newer candle is one comparison over the matrix's newest column; only those
+    touch the index, the others stay "not new". The index itself is per symbol (a pair of deques per
+    window, O(1) amortized per candle), so feeding it is the one step that still goes symbol by symbol.
+    """
+    rows = len(symbols)
+    extremes = {
+        window: {"new_high": np.zeros(rows, dtype=bool), "new_low": np.zeros(rows, dtype=bool),
+                 "high": np.full(rows, np.nan), "low": np.full(rows, np.nan)}
+        for window in index.windows
+    }
+    ts = matrix["ts"]
+    if not index.windows or not ts.shape[1]:
+        return extremes
+    seen = np.array([np.nan if (last := index.last_ts(sy)) is None else last for sy in symbols], dtype=float)
+    newest = ts[:, -1]
+    with np.errstate(invalid="ignore"):
+        fresh = np.isfinite(newest) & ~(newest <= seen)
+    for row in np.flatnonzero(fresh):
+        sy = symbols[row]
+        if np.isnan(seen[row]):
+            # first time (or after a window change): build from the longest window
+            candles = store.window(sy, max(index.windows.values()))
+        elif seen[row] >= ts[row, 0]:
+            # still inside the matrix (a padded row starts with NaN and never gets here); from the last
+            # seen candle on, it may still have been forming when it was fed
+            start = np.searchsorted(ts[row], seen[row], side="left")
+            candles = {name: values[row, start:] for name, values in matrix.items()}
+        else:
+            candles = store.load(sy)
+            candles = candles[np.searchsorted(candles["ts"], seen[row], side="left"):]
+        state = index.update(sy, candles)
+        for window, values in (state or {}).items():
+            for key in ("high", "low"):
+                if values[key] is not None:
+                    extremes[window][f"new_{key}"][row] = values[f"new_{key}"]
+                    extremes[window][key][row] = values[key][1]
+    return extremes
+
+
+def scan_signals(symbols):
+    """
+    Evaluates every scan rule for every symbol in one vectorized pass over the stored candles.
+    Returns ({symbol: newest candle ts}, alerts) where alerts are dicts for the notifier.
+    """
+    symbols = list(symbols)
+    matrix = candle_matrix(symbols, CANDLES, SIGNALS.lookback_seconds())
+    alerts = SIGNALS.evaluate(symbols, matrix, update_extremes(symbols, matrix))
+    last_ts = matrix["ts"][:, -1] if matrix["ts"].shape[1] else np.full(len(symbols), np.nan)
+    latest = {sy: int(ts) for sy, ts in zip(symbols, last_ts) if np.isfinite(ts)}
+    for sy in symbols:
+        if sy not in latest:
+            print(f"Empty Data for STOCK: {sy}")
+    return latest, alerts
+
+
+async def notify_alerts(alerts, notifier=None):
+    """
+    Drops repeat alerts, then sends the rest to every alert chat.
+    Only alerts that went out are recorded, so a failed send is retried next cycle. Returns their number.
+    """
+    alerts = ALERT_STATE.filter(alerts)
+    if not alerts:
+        return 0
+    if notifier is not None:
+        delivered = await notifier.send_alerts(alerts)
+    else:
+        async with AlertNotifier() as notifier:
+            delivered = await notifier.send_alerts(alerts)
+    ALERT_STATE.record_sent(delivered)
+    return len(delivered)
+
+
+def save_scan_state():
+    ALERT_STATE.save()
+    EXTREMES.save(EXTREMES_PATH)
+
+
+def high_stock_scan(symbols):
+    # Download only the 5-min candles we do not have yet, all symbols at once
+    started = time.monotonic()
+    added = update_candles(symbols)
+    print(f"Candles updated for {len(symbols)} symbols in {time.monotonic() - started:.1f}s ({sum(added.values())} new candles)")
+    _, alerts = scan_signals(symbols)
+    sent = asyncio.run(notify_alerts(alerts))
+    timings = ", ".join(f"{name} {ms}ms" for name, ms in SIGNALS.stats()["last_ms"].items())
+    print(f"{len(alerts)} alerts, {sent} sent; rule timings: {timings}")
+    save_scan_state()
 
 
 if __name__ == "__main__":
-    while True:
-        high_stock_scan(symbols)
-        print("Entering Sleep mode for 2 Hours")
-        # Sleep for 2 hours (2 hours  * 60 minutes/hour * 60 seconds/minute)
-        time.sleep(2 * 60 * 60)
-    
+    # Market-hours-aware scheduler over setting.watchlist
+    from scan_scheduler import main
+    main()
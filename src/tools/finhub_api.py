@@ -1,18 +1,27 @@
-import finnhub
 import os
-from time import sleep
+import contextvars
+from time import sleep, monotonic
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 from datetime import datetime, timedelta
-import pandas as pd
-from tabulate import tabulate
 import requests
-import fear_and_greed
+from cache import TTLCache
+from response_store import RESPONSE_STORE
+from finhub_client import get_client, INTERACTIVE, BULK, BACKGROUND
+from text_table import plain_table
+from ticker_index import TICKERS
+from lazy import lazy_import
+from metrics import span
+
+# pulls in aiohttp and requests_cache; only needed for the market payload
+fear_and_greed = lazy_import("fear_and_greed")
 #Finhub Sub Function's
-def get_finhub_client():
-    return finnhub.Client(api_key=os.getenv("FINHUB_API_KEY"))
+def get_finhub_client(lane=INTERACTIVE):
+    # Shared keep-alive session, global rate limit and 429 / 5xx retries (see finhub_client)
+    return get_client(lane)
 
 def check_stock_symbol(symbol):
     client = get_finhub_client()
-    return client.symbol_lookup(symbol)
+    return SYMBOL_CACHE.get_or_fetch(("lookup", symbol.upper()), lambda: client.symbol_lookup(symbol))
 
 def create_table_result_for_symbol_lookup(data):
     """
@@ -21,38 +30,48 @@ def create_table_result_for_symbol_lookup(data):
     """
     if not data.get('result'):
         return "Sorry, no similar tickers found."
-    df = pd.DataFrame(data['result'])
-    if df.empty:
-        return "Sorry, no similar tickers found."
     # Keep only necessary columns
-    df = df[['description', 'symbol']]
-    # Optional: reset index
-    df.index = range(1, len(df) + 1)
-    # Convert to plain table using tabulate
-    plain_table = tabulate(df, headers=['Description', 'Symbol'], tablefmt='plain', showindex=False)
+    rows = [[item.get('description'), item.get('symbol')] for item in data['result']]
+    table = plain_table(rows, headers=['Description', 'Symbol'])
     # Wrap in Telegram monospace for neat display
-    telegram_table = f"```\n{plain_table}\n```"
+    telegram_table = f"```\n{table}\n```"
     return telegram_table
 
+def suggest_similar_symbols(symbol):
+    """'Did you mean' table: from the local ticker index once it is loaded, else Finnhub's symbol search."""
+    if TICKERS.ready:
+        return create_table_result_for_symbol_lookup(
+            {"result": [{"description": name, "symbol": match} for match, name in TICKERS.suggest(symbol)]})
+    return create_table_result_for_symbol_lookup(check_stock_symbol(symbol))
+
+def unknown_symbol_message(symbol):
+    return f"Sorry, no stock with the name provided have found please see the bellow suggestion \n {suggest_similar_symbols(symbol)}."
+
 def get_stock_price(symbol):
-    client = get_finhub_client()
-    return client.quote(symbol)
+    return get_symbol_quote(get_finhub_client(), symbol)
 
 def get_stock_news_category(symbol, start_date, end_date):
-    client = get_finhub_client()
-    return client.company_news(symbol, _from=start_date, to=end_date)
+    return get_symbol_news(get_finhub_client(), symbol, start_date, end_date)
 
 def get_stock_insider_sentiment(symbol, start_date, end_date):
     client = get_finhub_client()
-    return client.stock_insider_sentiment(symbol, start_date, end_date)
+    return SYMBOL_CACHE.get_or_fetch(
+        # the raw window, unlike "insider" below which may hold the 90-day fallback
+        ("insider_raw", symbol.upper(), start_date, end_date),
+        lambda: client.stock_insider_sentiment(symbol, start_date, end_date),
+    )
 
 def get_general_market_news():
-    client = get_finhub_client()
-    client.general_news('general', min_id=0)
+    return get_general_news(get_finhub_client())
+
+def _fetch_fear_and_greed():
+    # not a Finnhub call, so it gets its own span next to finnhub_request_seconds
+    with span("fear_and_greed_seconds"):
+        return fear_and_greed.get().description
 
 def market_fear_and_greed():
     try:
-        fear_and_greed_data = fear_and_greed.get().description
+        fear_and_greed_data = MARKET_CACHE.get_or_fetch(("fear_and_greed",), _fetch_fear_and_greed)
     except Exception as e:
         return f"Error getting Fear and Greed Index: {e}"
     return f"Fear and Greed Index: {fear_and_greed_data}"
@@ -64,10 +83,179 @@ def is_empty_price(data):
 
 
 
-# Main function's
-def get_stock_data(symbol, start_date, end_date):
-        client = get_finhub_client()
+def is_empty_insider(insider):
+    return (
+        insider is None or
+        (isinstance(insider, dict) and not insider.get('data')) or
+        (isinstance(insider, list) and len(insider) == 0)
+    )
+
+
+def get_insider_sentiment_with_fallback(client, symbol, from_date, to_date):
+    """
+    Insider sentiment for the requested window; if empty, expand window to last 90 days.
+    """
+    insider = client.stock_insider_sentiment(symbol, from_date.isoformat(), to_date.isoformat())
+    if is_empty_insider(insider):
+        alt_from = (to_date - timedelta(days=90)).isoformat()
+        insider = client.stock_insider_sentiment(symbol, alt_from, to_date.isoformat())
+    return insider
+
+
+# Per-symbol cache
+# Keyed by (endpoint, symbol, ...). Quotes move every few seconds, news every few
+# minutes and insider sentiment is monthly data, so each gets its own TTL.
+SYMBOL_CACHE = TTLCache(
+    "symbol",
+    ttls={
+        "quote": 15,
+        "news": 5 * 60,
+        "insider": 6 * 60 * 60,
+        "insider_raw": 6 * 60 * 60,
+        "lookup": 24 * 60 * 60,
+    },
+    stale={"quote": 15},
+    maxsize=2000,
+    store=RESPONSE_STORE,
+)
+
+
+def get_symbol_quote(client, symbol):
+    return SYMBOL_CACHE.get_or_fetch(("quote", symbol.upper()), lambda: client.quote(symbol))
+
+
+def get_symbol_news(client, symbol, from_date, to_date):
+    return SYMBOL_CACHE.get_or_fetch(
+        ("news", symbol.upper(), from_date, to_date),
+        lambda: client.company_news(symbol, _from=from_date, to=to_date),
+    )
+
+
+def get_symbol_insider_sentiment(client, symbol, from_date, to_date):
+    return SYMBOL_CACHE.get_or_fetch(
+        ("insider", symbol.upper(), from_date.isoformat(), to_date.isoformat()),
+        lambda: get_insider_sentiment_with_fallback(client, symbol, from_date, to_date),
+    )
+
+
+# Market-wide context cache
+# SPY, general news and fear & greed are the same for every ticker, so they are
+# shared across requests: one fetch per item per TTL no matter how many users ask.
+MARKET_CACHE = TTLCache(
+    "market",
+    ttls={
+        "spy_quote": 30,
+        "spy_insider": 6 * 60 * 60,
+        "spy_news": 10 * 60,
+        "general_news": 5 * 60,
+        "fear_and_greed": 15 * 60,
+    },
+    store=RESPONSE_STORE,
+)
+
+
+def get_market_quote(client):
+    return MARKET_CACHE.get_or_fetch(("spy_quote",), lambda: client.quote("SPY"))
+
+
+def get_market_insider_sentiment(client, from_date, to_date):
+    return MARKET_CACHE.get_or_fetch(
+        ("spy_insider", from_date.isoformat(), to_date.isoformat()),
+        lambda: get_insider_sentiment_with_fallback(client, "SPY", from_date, to_date),
+    )
+
+
+def get_market_news(client, from_date, to_date):
+    return MARKET_CACHE.get_or_fetch(
+        ("spy_news", from_date.isoformat(), to_date.isoformat()),
+        lambda: client.company_news("SPY", _from=from_date.isoformat(), to=to_date.isoformat()),
+    )
+
+
+def get_general_news(client):
+    return MARKET_CACHE.get_or_fetch(("general_news",), lambda: client.general_news('general', min_id=0))
+
+
+# Concurrent fetch engine
+# Per-endpoint timeouts (seconds). An endpoint that misses its deadline is
+# left out of the payload and reported under "missing" instead of failing the request.
+ENDPOINT_TIMEOUTS = {
+    "price": 6,
+    "news": 8,
+    "insider_sentiment": 10,
+    "Market_fear_and_greed": 8,
+    "Market": 6,
+    "insider_market": 10,
+    "Market news": 8,
+    "General_market_news": 8,
+}
+DEFAULT_ENDPOINT_TIMEOUT = 8
+# One pool per lane: background work (prewarm) gets a few threads of its own and can never
+# queue ahead of a user's request in the FIFO pool
+_FETCH_POOLS = {
+    INTERACTIVE: ThreadPoolExecutor(max_workers=16, thread_name_prefix="finhub"),
+    BACKGROUND: ThreadPoolExecutor(max_workers=int(os.getenv("FETCH_BACKGROUND_WORKERS", "4")), thread_name_prefix="finhub-bg"),
+}
+# /watchlist submits every symbol's endpoints at once; its own pool keeps a long list from
+# filling the interactive pool ahead of single-ticker requests
+WATCHLIST_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("FETCH_WATCHLIST_WORKERS", "8")), thread_name_prefix="finhub-wl")
+QUEUE_POLL_SECONDS = 0.05
+
 
+def _run_job(run_started, context, fn):
+    run_started.append(monotonic())
+    return context.run(fn)
+
+
+def submit_jobs(jobs, lane=INTERACTIVE, pool=None):
+    """
+    Starts independent endpoint calls in parallel on the lane's pool (or on `pool`).
+    jobs: {name: callable}. Returns (started, futures) to be passed to collect_jobs.
+    """
+    pool = pool or _FETCH_POOLS[lane]
+    futures = {}
+    for name, fn in jobs.items():
+        run_started = []
+        # each job runs in a copy of the caller's context, so its spans land in the caller's request trace
+        futures[name] = pool.submit(_run_job, run_started, contextvars.copy_context(), fn)
+        futures[name].run_started = run_started
+    return monotonic(), futures
+
+
+def _job_result(future, started, timeout, from_run_start):
+    if not from_run_start:
+        return future.result(timeout=max(0.0, started + timeout - monotonic()))
+    # the deadline starts once a worker picks the job up; time queued behind the pool's other jobs is free
+    while not future.run_started:
+        try:
+            return future.result(timeout=QUEUE_POLL_SECONDS)
+        except FuturesTimeout:
+            continue
+    return future.result(timeout=max(0.0, future.run_started[0] + timeout - monotonic()))
+
+
+def collect_jobs(started, futures, timeouts=None, from_run_start=False):
+    """
+    Waits for submitted jobs, each against its own deadline measured from submission
+    (from_run_start: from when a worker started it, for pools a request fills on its own).
+    Returns (results, missing) where missing maps a job name to the reason it has no result.
+    """
+    timeouts = timeouts or ENDPOINT_TIMEOUTS
+    results, missing = {}, {}
+    for name, future in futures.items():
+        timeout = timeouts.get(name, DEFAULT_ENDPOINT_TIMEOUT)
+        try:
+            results[name] = _job_result(future, started, timeout, from_run_start)
+        except FuturesTimeout:
+            future.cancel()
+            missing[name] = f"timed out after {timeout}s"
+        except Exception as e:
+            missing[name] = f"failed: {e}"
+    return results, missing
+
+
+# Main function's
+def _date_range(start_date, end_date):
         # Honor provided date range; fallback to last 14 days on invalid input
         try:
             from_date = datetime.fromisoformat(start_date).date()
@@ -75,72 +263,132 @@ def get_stock_data(symbol, start_date, end_date):
         except Exception:
             to_date = datetime.utcnow().date()  # pyright: ignore[reportDeprecated]
             from_date = to_date - timedelta(days=14)
+        return from_date, to_date
+
+def symbol_jobs(client, symbol, from_date, to_date):
+        return {
+            "price": lambda: get_symbol_quote(client, symbol),
+            "news": lambda: get_symbol_news(client, symbol, from_date.isoformat(), to_date.isoformat()),
+            "insider_sentiment": lambda: get_symbol_insider_sentiment(client, symbol, from_date, to_date),
+        }
+
+def market_jobs(client, from_date, to_date):
+        # Same for every ticker (and cached in MARKET_CACHE)
+        return {
+            "Market_fear_and_greed": market_fear_and_greed,
+            "Market": lambda: get_market_quote(client),
+            "insider_market": lambda: get_market_insider_sentiment(client, from_date, to_date),
+            "Market news": lambda: get_market_news(client, from_date, to_date),
+            "General_market_news": lambda: get_general_news(client),
+        }
+
+def get_stock_data(symbol, start_date, end_date, lane=INTERACTIVE):
+        client = get_finhub_client(lane)
+        from_date, to_date = _date_range(start_date, end_date)
+
+        # not in the local symbol universe: answer without any Finnhub call
+        if TICKERS.is_known(symbol) is False:
+            return unknown_symbol_message(symbol)
+
+        print(f"Getting {symbol} data...")
+        # The quote decides whether the ticker is valid: the market context (shared by every
+        # ticker) starts with it, the other symbol endpoints only once the ticker checks out.
+        jobs = symbol_jobs(client, symbol, from_date, to_date)
+        started, futures = submit_jobs({"price": jobs.pop("price"), **market_jobs(client, from_date, to_date)}, lane)
+        price_result, missing = collect_jobs(started, {"price": futures.pop("price")})
+        price = price_result.get("price")
+        if price is None and RESPONSE_STORE is not None and RESPONSE_STORE.replay:
+            return f"No recorded data for {symbol} (replay mode)."
 
-        print(f"Getting {symbol} price...")
-        price = client.quote(symbol)
         # checking if the price is empty, and return correct message
-        if is_empty_price(price):
-            similar_stock = create_table_result_for_symbol_lookup(check_stock_symbol(symbol))
-            result = f"Sorry, no stock with the name provided have found please see the bellow suggestion \n {similar_stock}."
-            return result
-        print(price)
-        print(f"Getting {symbol} news...")
-        news = client.company_news(symbol, _from=from_date.isoformat(), to=to_date.isoformat())
-        # Optional: limit and simplify news
-        news = news[:10] if isinstance(news, list) else news
+        if price is not None and is_empty_price(price):
+            return unknown_symbol_message(symbol)
 
-        print(f"Getting {symbol} insider sentiment...")
-        insider = client.stock_insider_sentiment(symbol, from_date.isoformat(), to_date.isoformat())
-        print(insider)
-        # Fallback: if empty, expand window to last 90 days
-        try:
-            empty = (
-                insider is None or
-                (isinstance(insider, dict) and not insider.get('data')) or
-                (isinstance(insider, list) and len(insider) == 0)
-            )
-            if empty:
-                alt_from = (to_date - timedelta(days=90)).isoformat()
-                insider = client.stock_insider_sentiment(symbol, alt_from, to_date.isoformat())
-        except Exception:
-            pass
-        print(f"Getting Market Fear & Greed...")
-        market_fear_and_greed_var = market_fear_and_greed()
-        print(market_fear_and_greed_var)
-        print(f"Getting SPY price")
-        spy = client.quote("SPY")
-
-        print(f"Getting SPY Market sentiment...")
-        insider_market = client.stock_insider_sentiment("SPY", from_date.isoformat(), to_date.isoformat())
-        try:
-            empty_market = (
-                insider_market is None or
-                (isinstance(insider_market, dict) and not insider_market.get('data')) or
-                (isinstance(insider_market, list) and len(insider_market) == 0)
-            )
-            if empty_market:
-                alt_from_m = (to_date - timedelta(days=90)).isoformat()
-                insider_market = client.stock_insider_sentiment("SPY", alt_from_m, to_date.isoformat())
-        except Exception:
-            pass
+        symbol_started, symbol_futures = submit_jobs(jobs, lane)
+        results, missing_rest = collect_jobs(started, futures)
+        missing.update(missing_rest)
+        results_symbol, missing_symbol = collect_jobs(symbol_started, symbol_futures)
+        results.update(results_symbol)
+        missing.update(missing_symbol)
 
-        print(f"Getting SPY news...")
-        market_news = client.company_news("SPY", _from=from_date.isoformat(), to=to_date.isoformat())
+        news = results.get("news")
+        # Optional: limit and simplify news
+        news = news[:10] if isinstance(news, list) else news
+        print(f"Fetched {symbol} data in {monotonic() - started:.2f}s"
+              + (f" (partial, missing: {', '.join(missing)})" if missing else ""))
 
-        print("General Market news...")
-        general_news = client.general_news('general', min_id=0)
-        return {
+        data = {
             "symbol": symbol,
             "price": price,
             "news": news,
-            "insider_sentiment": insider,
+            "insider_sentiment": results.get("insider_sentiment"),
             "date_range": {"from": from_date.isoformat(), "to": to_date.isoformat()},
-            "Market": spy,
-            "Market news": market_news,
-            "insider_market": insider_market,
-            "General_market_news": general_news,
-            "Market_fear_and_greed": market_fear_and_greed_var
+            "Market": results.get("Market"),
+            "Market news": results.get("Market news"),
+            "insider_market": results.get("insider_market"),
+            "General_market_news": results.get("General_market_news"),
+            "Market_fear_and_greed": results.get("Market_fear_and_greed"),
         }
+        if missing:
+            # Partial payload: tell the model (and the logs) which sections are unavailable
+            data["partial"] = True
+            data["missing"] = missing
+        return data
+
+def get_watchlist_data(symbols, start_date, end_date):
+        """
+        Data for several symbols with one shared market context: all quotes and the market endpoints
+        are fetched at once (the market sections only once for the whole list), news and insider
+        sentiment then only for the symbols whose quote is not empty. Runs on WATCHLIST_POOL and the
+        limiter's BULK lane, so single-ticker requests are served first, with
+        deadlines counted from when each job starts, so the tail of a long list does not time out queued.
+        Returns {"market": {...}, "symbols": {symbol: payload}, "invalid": [symbols without a quote]}.
+        """
+        client = get_finhub_client(BULK)
+        from_date, to_date = _date_range(start_date, end_date)
+        symbols = [symbol.upper() for symbol in symbols]
+        # symbols the local ticker index doesn't list are reported invalid without fetching them
+        unknown = [symbol for symbol in symbols if TICKERS.is_known(symbol) is False]
+        symbols = [symbol for symbol in symbols if symbol not in unknown]
+        shared = market_jobs(client, from_date, to_date)
+        jobs, later = dict(shared), {}
+        timeouts = dict(ENDPOINT_TIMEOUTS)
+        for symbol in symbols:
+            for name, fn in symbol_jobs(client, symbol, from_date, to_date).items():
+                (jobs if name == "price" else later)[(symbol, name)] = fn
+                timeouts[(symbol, name)] = ENDPOINT_TIMEOUTS[name]
+        started, futures = submit_jobs(jobs, pool=WATCHLIST_POOL)
+        prices = {key: futures.pop(key) for key in list(futures) if isinstance(key, tuple)}
+        results, missing = collect_jobs(started, prices, timeouts, from_run_start=True)
+        valid = {key[0] for key in prices if not (results.get(key) is not None and is_empty_price(results[key]))}
+        later_started, later_futures = submit_jobs({key: fn for key, fn in later.items() if key[0] in valid}, pool=WATCHLIST_POOL)
+        for batch_started, batch in ((started, futures), (later_started, later_futures)):
+            batch_results, batch_missing = collect_jobs(batch_started, batch, timeouts, from_run_start=True)
+            results.update(batch_results)
+            missing.update(batch_missing)
+        print(f"Fetched {len(symbols)} watchlist symbols in {monotonic() - started:.2f}s"
+              + (f" ({len(missing)} endpoints missing)" if missing else ""))
+
+        market = {name: results.get(name) for name in shared}
+        data, invalid = {}, unknown
+        for symbol in symbols:
+            price = results.get((symbol, "price"))
+            if price is not None and is_empty_price(price):
+                invalid.append(symbol)
+                continue
+            news = results.get((symbol, "news"))
+            payload = {
+                "symbol": symbol,
+                "price": price,
+                "news": news[:10] if isinstance(news, list) else news,
+                "insider_sentiment": results.get((symbol, "insider_sentiment")),
+            }
+            symbol_missing = {key[1]: reason for key, reason in missing.items() if isinstance(key, tuple) and key[0] == symbol}
+            if symbol_missing:
+                payload["partial"] = True
+                payload["missing"] = symbol_missing
+            data[symbol] = payload
+        return {"market": market, "symbols": data, "invalid": invalid}
 
 def get_latest_company_news_last_two_weeks(symbol, limit=20):
         client = get_finhub_client()
@@ -148,7 +396,7 @@ def get_latest_company_news_last_two_weeks(symbol, limit=20):
         to_date = datetime.utcnow().date()
         from_date = to_date - timedelta(days=14)
 
-        news = client.company_news(symbol, _from=from_date.isoformat(), to=to_date.isoformat())
+        news = get_symbol_news(client, symbol, from_date.isoformat(), to_date.isoformat())
 
         if isinstance(news, list) and limit:
                 return news[:limit]
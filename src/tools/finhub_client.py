@@ -0,0 +1,162 @@
+import os
+import random
+import logging
+import threading
+from time import sleep
+
+import finnhub
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limit import TokenBucket, INTERACTIVE, BULK, BACKGROUND
+from metrics import METRICS, span
+from response_store import check_live
+
+LOGGER = logging.getLogger("stock_bot.finhub")
+
+# Plan quota, free plan assumed: 60 calls in any minute and at most 30 calls in any second.
+# The per-minute quota is a sliding 60 s window; the token bucket only caps bursts at BURST
+# calls per second, so a full bucket can never push a minute past CALLS_PER_MINUTE.
+CALLS_PER_MINUTE = int(os.getenv("FINHUB_CALLS_PER_MINUTE", "60"))
+BURST = int(os.getenv("FINHUB_BURST", "30"))
+# Shares of the per-minute quota /watchlist and background work (pre-warming) may use each;
+# together they leave at least a quarter of it to single-ticker requests
+BULK_SHARE = float(os.getenv("FINHUB_BULK_SHARE", "0.5"))
+BACKGROUND_SHARE = float(os.getenv("FINHUB_BACKGROUND_SHARE", "0.25"))
+POOL_SIZE = 32
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+_LIMITER = TokenBucket(
+    rate=BURST, capacity=BURST, window_limit=CALLS_PER_MINUTE, window=60.0,
+    lane_limits={
+        BULK: max(1, int(CALLS_PER_MINUTE * BULK_SHARE)),
+        BACKGROUND: max(1, int(CALLS_PER_MINUTE * BACKGROUND_SHARE)),
+    },
+)
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+_METRICS_LOCK = threading.Lock()
+_METRICS = {
+    "calls": 0,
+    "errors": 0,
+    "retries_429": 0,
+    "retries_5xx": 0,
+    "retries_network": 0,
+}
+LANE_NAMES = {INTERACTIVE: "interactive", BULK: "bulk", BACKGROUND: "background"}
+
+
+def _shared_client():
+    """One finnhub.Client (and HTTP session) for the whole process, with a keep-alive pool."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            client = finnhub.Client(api_key=os.getenv("FINHUB_API_KEY"))
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+            client._session.mount("https://", adapter)
+            client._session.mount("http://", adapter)
+            _CLIENT = client
+        return _CLIENT
+
+
+def _count(name):
+    with _METRICS_LOCK:
+        _METRICS[name] += 1
+    METRICS.increment(f"finnhub_{name}")
+
+
+def _backoff_delay(attempt, exc=None):
+    # Honor Retry-After when Finnhub sends it, otherwise exponential backoff with full jitter
+    response = getattr(exc, "response", None)
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return min(BACKOFF_CAP, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class PooledFinnhubClient:
+    """
+    Drop-in replacement for finnhub.Client.
+    Every endpoint method goes through the shared session, the global rate limiter
+    (in this client's priority lane) and retries 429 / 5xx / network errors.
+    """
+
+    def __init__(self, lane=INTERACTIVE):
+        self.lane = lane
+        self._client = _shared_client()
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+        if name.startswith("_") or not callable(method):
+            return method
+
+        def call(*args, **kwargs):
+            return self._call(method, *args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+    def _call(self, method, *args, **kwargs):
+        check_live(f"Finnhub {method.__name__}")
+        # timed end to end: limiter wait, retries and backoff included
+        with span("finnhub_request_seconds", endpoint=method.__name__):
+            return self._call_with_retries(method, *args, **kwargs)
+
+    def _call_with_retries(self, method, *args, **kwargs):
+        for attempt in range(MAX_RETRIES + 1):
+            waited = _LIMITER.acquire(self.lane)
+            lane = LANE_NAMES.get(self.lane, self.lane)
+            METRICS.observe("finnhub_limiter_wait_seconds", waited, lane=lane)
+            if waited > 0.001:
+                METRICS.increment("finnhub_throttled", lane=lane)
+            _count("calls")
+            try:
+                return method(*args, **kwargs)
+            except finnhub.FinnhubAPIException as e:
+                if e.status_code == 429:
+                    metric = "retries_429"
+                elif e.status_code >= 500:
+                    metric = "retries_5xx"
+                else:
+                    _count("errors")
+                    raise
+                error = e
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metric = "retries_network"
+                error = e
+            if attempt == MAX_RETRIES:
+                _count("errors")
+                raise error
+            _count(metric)
+            delay = _backoff_delay(attempt, error)
+            LOGGER.warning(f"Finnhub {method.__name__} failed ({error}); retry {attempt + 1}/{MAX_RETRIES} in {delay:.2f}s")
+            sleep(delay)
+
+
+def get_client(lane=INTERACTIVE):
+    return PooledFinnhubClient(lane)
+
+
+def get_background_client():
+    return PooledFinnhubClient(BACKGROUND)
+
+
+def limiter():
+    return _LIMITER
+
+
+# callers queued on the rate limiter right now, per lane (read at /stats and scrape time)
+for _lane, _name in LANE_NAMES.items():
+    METRICS.gauge("finnhub_limiter_waiting", lambda lane=_lane: _LIMITER.lane_waiting(lane), lane=_name)
+
+
+def stats():
+    with _METRICS_LOCK:
+        metrics = dict(_METRICS)
+    metrics["limiter"] = _LIMITER.stats()
+    return metrics
@@ -0,0 +1,181 @@
+import time
+import warnings
+
+import numpy as np
+
+from candle_store import CANDLES, CANDLES_PER_SESSION, DAY, candle_matrix
+
+# Indicators over the stored 5-minute candles; periods are in candles unless named in days
+RETURN_HORIZONS = {"1h": 12, "1d": CANDLES_PER_SESSION, "5d": 5 * CANDLES_PER_SESSION}
+SMA_PERIODS = (20, 50)
+EMA_PERIODS = (12, 26)
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+VOLATILITY_CANDLES = 5 * CANDLES_PER_SESSION
+RANGE_DAYS = 10
+VOLUME_LOOKBACK = CANDLES_PER_SESSION
+# Candles to load: the longest lookback plus a margin for non-session gaps
+LOOKBACK_SECONDS = 16 * DAY
+# Older candles describe a market the model should not be told about as "current"
+MAX_AGE_SECONDS = 7 * DAY
+DECIMALS = 2
+# Columns per EMA block; keeps decay ** -BLOCK far from overflowing for any period >= 2
+EMA_BLOCK = 64
+
+
+def _ema(values, period):
+    """
+    Exponential moving average per row, (rows x time); leading NaN padding starts each row later.
+    The recursion ema[t] = decay * ema[t-1] + alpha * x[t] is unrolled into a weighted cumulative sum,
+    a block of columns at a time, with each block seeded by the previous block's last value.
+    """
+    alpha = 2 / (period + 1)
+    decay = 1 - alpha
+    valid = np.isfinite(values)
+    seen = np.cumsum(valid, axis=1)
+    # each row's first candle seeds its average with weight 1, later candles get alpha
+    first = valid & (seen == 1)
+    terms = np.where(valid, values, 0.0) * np.where(first, 1.0, alpha)
+    out = np.empty(values.shape)
+    previous = np.zeros(values.shape[0])
+    for start in range(0, values.shape[1], EMA_BLOCK):
+        block = terms[:, start:start + EMA_BLOCK]
+        steps = np.arange(block.shape[1])
+        out[:, start:start + EMA_BLOCK] = (
+            decay ** steps * np.cumsum(block * decay ** -steps, axis=1) + previous[:, None] * decay ** (steps + 1)
+        )
+        previous = out[:, start + block.shape[1] - 1]
+    return np.where(seen > 0, out, np.nan)
+
+
+def _cross(fast_now, slow_now, fast_prev, slow_prev):
+    """+1 where fast crossed above slow on the newest candle, -1 below, 0 otherwise."""
+    up = (fast_prev <= slow_prev) & (fast_now > slow_now)
+    down = (fast_prev >= slow_prev) & (fast_now < slow_now)
+    return up.astype(int) - down.astype(int)
+
+
+def _last(values, offset=0):
+    """Value `offset` candles before each row's newest one (NaN where the history is shorter)."""
+    return values[:, -1 - offset] if values.shape[1] > offset else np.full(values.shape[0], np.nan)
+
+
+def _sma(values, period, offset=0):
+    end = values.shape[1] - offset
+    if end < period:
+        return np.full(values.shape[0], np.nan)
+    # NaN padding propagates, so rows with too short a history come out as NaN
+    return values[:, end - period:end].mean(axis=1)
+
+
+def compute_indicators(matrix):
+    """
+    Indicators for every symbol of a candle matrix (see candle_store.candle_matrix) in one pass.
+    Returns {name: array with one value per symbol}; NaN where a symbol's history is too short.
+    """
+    close, high, low = matrix["close"], matrix["high"], matrix["low"]
+    rows = close.shape[0]
+    last = _last(close)
+    result = {"ts": _last(matrix["ts"]), "close": last}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for name, candles in RETURN_HORIZONS.items():
+            result[f"return_{name}"] = (last / _last(close, candles) - 1) * 100
+
+        fast, slow = SMA_PERIODS
+        result["sma_fast"], result["sma_slow"] = _sma(close, fast), _sma(close, slow)
+        result["sma_cross"] = _cross(result["sma_fast"], result["sma_slow"], _sma(close, fast, 1), _sma(close, slow, 1))
+
+        fast, slow = EMA_PERIODS
+        # the EMA only needs a few periods of warm-up, not the whole loaded history
+        recent = close[:, -4 * slow:]
+        ema_fast, ema_slow = _ema(recent, fast), _ema(recent, slow)
+        if recent.shape[1] >= 2:
+            result["ema_cross"] = _cross(ema_fast[:, -1], ema_slow[:, -1], ema_fast[:, -2], ema_slow[:, -2])
+            result["ema_fast"], result["ema_slow"] = ema_fast[:, -1], ema_slow[:, -1]
+        else:
+            result["ema_cross"] = np.zeros(rows, dtype=int)
+            result["ema_fast"] = result["ema_slow"] = np.full(rows, np.nan)
+
+        change = np.diff(close[:, -(RSI_PERIOD + 1):], axis=1)
+        if change.shape[1] == RSI_PERIOD:
+            gain = np.clip(change, 0, None).mean(axis=1)
+            loss = np.clip(-change, 0, None).mean(axis=1)
+            result["rsi"] = np.where(loss == 0, 100.0, 100 - 100 / (1 + gain / loss))
+            result["rsi"] = np.where(np.isnan(gain + loss), np.nan, result["rsi"])
+        else:
+            result["rsi"] = np.full(rows, np.nan)
+
+        previous = close[:, -(ATR_PERIOD + 1):-1]
+        span = slice(-ATR_PERIOD, None)
+        if previous.shape[1] == ATR_PERIOD:
+            true_range = np.maximum(high[:, span] - low[:, span],
+                                    np.maximum(np.abs(high[:, span] - previous), np.abs(low[:, span] - previous)))
+            result["atr_pct"] = true_range.mean(axis=1) / last * 100
+        else:
+            result["atr_pct"] = np.full(rows, np.nan)
+
+        log_returns = np.diff(np.log(close[:, -(VOLATILITY_CANDLES + 1):]), axis=1)
+        # per-candle deviation scaled to one session
+        result["volatility_pct"] = np.nanstd(log_returns, axis=1) * np.sqrt(CANDLES_PER_SESSION) * 100
+        result["volatility_pct"] = np.where(np.isfinite(log_returns).sum(axis=1) >= 2, result["volatility_pct"], np.nan)
+
+        since = result["ts"] - RANGE_DAYS * DAY
+        in_range = matrix["ts"] >= since[:, None]
+        range_high = np.nanmax(np.where(in_range, high, np.nan), axis=1)
+        range_low = np.nanmin(np.where(in_range, low, np.nan), axis=1)
+        result["from_high_pct"] = (last / range_high - 1) * 100
+        result["from_low_pct"] = (last / range_low - 1) * 100
+
+        history = matrix["volume"][:, -(VOLUME_LOOKBACK + 1):-1]
+        if history.shape[1] >= 2:
+            result["volume_z"] = (_last(matrix["volume"]) - np.nanmean(history, axis=1)) / np.nanstd(history, axis=1)
+        else:
+            result["volume_z"] = np.full(rows, np.nan)
+    return result
+
+
+def _number(value):
+    return round(float(value), DECIMALS) if np.isfinite(value) else None
+
+
+def _trend(fast, slow, cross):
+    if not (np.isfinite(fast) and np.isfinite(slow)):
+        return None
+    trend = {"fast": _number(fast), "slow": _number(slow), "fast_above_slow": bool(fast > slow)}
+    if cross:
+        trend["crossed"] = "up" if cross > 0 else "down"
+    return trend
+
+
+def summarize(symbols, store=CANDLES, now=None):
+    """
+    Compact indicator summaries for the rating payload, {symbol: summary}, computed for all symbols
+    at once from the stored candles. Symbols without recent candles are left out.
+    """
+    symbols = [symbol.upper() for symbol in symbols]
+    if not symbols:
+        return {}
+    values = compute_indicators(candle_matrix(symbols, store, LOOKBACK_SECONDS))
+    now = time.time() if now is None else now
+    summaries = {}
+    for row, symbol in enumerate(symbols):
+        ts = values["ts"][row]
+        if not np.isfinite(ts) or now - ts > MAX_AGE_SECONDS:
+            continue
+        summary = {
+            "as_of": time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime(ts)),
+            "interval": "5m",
+            "return_pct": {name: _number(values[f"return_{name}"][row]) for name in RETURN_HORIZONS},
+            f"sma_{SMA_PERIODS[0]}_{SMA_PERIODS[1]}": _trend(values["sma_fast"][row], values["sma_slow"][row], values["sma_cross"][row]),
+            f"ema_{EMA_PERIODS[0]}_{EMA_PERIODS[1]}": _trend(values["ema_fast"][row], values["ema_slow"][row], values["ema_cross"][row]),
+            f"rsi_{RSI_PERIOD}": _number(values["rsi"][row]),
+            "atr_pct": _number(values["atr_pct"][row]),
+            "volatility_pct": _number(values["volatility_pct"][row]),
+            f"from_{RANGE_DAYS}d_high_pct": _number(values["from_high_pct"][row]),
+            f"from_{RANGE_DAYS}d_low_pct": _number(values["from_low_pct"][row]),
+            "volume_z": _number(values["volume_z"][row]),
+        }
+        summary["return_pct"] = {k: v for k, v in summary["return_pct"].items() if v is not None}
+        summaries[symbol] = {k: v for k, v in summary.items() if v not in (None, {})}
+    return summaries
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import importlib
+import threading
+from time import monotonic
+
+from metrics import METRICS
+
+LOGGER = logging.getLogger("stock_bot.lazy")
+
+_LAZY_MODULES = []
+
+
+class LazyModule:
+    """
+    Stands in for a heavy module: the real import happens on first attribute access
+    (or in warm_up), so importing the bot stays fast. Thread-safe; the import cost is
+    logged and recorded as import_seconds.
+    """
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    started = monotonic()
+                    module = importlib.import_module(self._name)
+                    seconds = monotonic() - started
+                    METRICS.observe("import_seconds", seconds, module=self._name)
+                    LOGGER.info(f"Imported {self._name} in {seconds:.2f}s")
+                    self.__dict__["_module"] = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self.load(), attr, value)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r} ({'loaded' if self.loaded else 'not loaded'})>"
+
+
+def lazy_import(name):
+    module = LazyModule(name)
+    _LAZY_MODULES.append(module)
+    return module
+
+
+def warm_up():
+    """Imports every lazy module that is still pending; failures are left for first use to report."""
+    for module in _LAZY_MODULES:
+        try:
+            module.load()
+        except Exception as e:
+            LOGGER.warning(f"Background import of {module._name} failed: {e}")
+
+
+async def warm_up_in_background():
+    # imports hold the GIL for most of their time, but the loop still gets slices to serve updates
+    await asyncio.to_thread(warm_up)
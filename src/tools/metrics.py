@@ -0,0 +1,234 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+import contextlib
+import contextvars
+from time import monotonic, time
+from collections import deque
+
+LOGGER = logging.getLogger("stock_bot.metrics")
+TRACE_LOGGER = logging.getLogger("stock_bot.trace")
+
+# Optional Prometheus text endpoint on localhost (0 = off)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+# Recent samples kept per series for the percentiles
+SAMPLE_WINDOW = 2048
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """Count / sum / cumulative buckets (for Prometheus) plus a window of recent samples for p50/p95/p99."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def percentile(self, q):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "avg": self.sum / self.count if self.count else None,
+        }
+
+
+class Metrics:
+    """In-process histograms, counters and gauges, keyed by name and labels."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+        trace = _TRACE.get()
+        if trace is not None:
+            trace.add(name, value, labels)
+
+    def increment(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        trace = _TRACE.get()
+        if trace is not None:
+            trace.count(name, value)
+
+    def gauge(self, name, read, **labels):
+        """Registers a current value (queue depth, tasks in flight) that is read at snapshot / scrape time."""
+        with self._lock:
+            self._gauges[self._key(name, labels)] = read
+
+    def _read_gauges(self):
+        with self._lock:
+            gauges = list(self._gauges.items())
+        values = {}
+        for key, read in gauges:
+            try:
+                values[key] = read()
+            except Exception as e:
+                LOGGER.debug(f"Gauge {key[0]} failed: {e}")
+        return values
+
+    def snapshot(self):
+        gauges = self._read_gauges()
+        with self._lock:
+            return {
+                "histograms": {key: histogram.summary() for key, histogram in self._histograms.items()},
+                "counters": dict(self._counters),
+                "gauges": gauges,
+            }
+
+    def render_prometheus(self):
+        lines = []
+        typed = set()
+
+        def _type(family, kind):
+            # one TYPE line per metric family, ahead of its first series
+            if family not in typed:
+                typed.add(family)
+                lines.append(f"# TYPE stock_bot_{family} {kind}")
+
+        gauges = self._read_gauges()
+        with self._lock:
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                _type(name, "histogram")
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f"stock_bot_{name}_bucket{_labels(labels, le=bound)} {count}")
+                lines.append(f"stock_bot_{name}_bucket{_labels(labels, le='+Inf')} {histogram.count}")
+                lines.append(f"stock_bot_{name}_sum{_labels(labels)} {histogram.sum}")
+                lines.append(f"stock_bot_{name}_count{_labels(labels)} {histogram.count}")
+            for (name, labels), value in sorted(self._counters.items()):
+                _type(f"{name}_total", "counter")
+                lines.append(f"stock_bot_{name}_total{_labels(labels)} {value}")
+        for (name, labels), value in sorted(gauges.items()):
+            _type(name, "gauge")
+            lines.append(f"stock_bot_{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(pairs, **extra):
+    pairs = list(pairs) + [(k, str(v)) for k, v in extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+METRICS = Metrics()
+
+
+# --- SPANS AND REQUEST TRACES ---
+class RequestTrace:
+    """Every span recorded while handling one request, logged as one JSON line when it ends."""
+
+    def __init__(self, kind, fields):
+        self.kind = kind
+        self.fields = fields
+        self.started = monotonic()
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, labels):
+        with self._lock:
+            self.spans.append({"span": name, **labels, "ms": round(seconds * 1000, 1)})
+
+    def count(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self):
+        return {
+            "ts": round(time(), 3),
+            "request": self.kind,
+            **self.fields,
+            "total_ms": round((monotonic() - self.started) * 1000, 1),
+            "spans": self.spans,
+            **self.counters,
+        }
+
+
+_TRACE = contextvars.ContextVar("stock_bot_trace", default=None)
+
+
+@contextlib.contextmanager
+def span(name, **labels):
+    """Times a stage into the `name` histogram (and the current request trace)."""
+    started = monotonic()
+    try:
+        yield
+    finally:
+        METRICS.observe(name, monotonic() - started, **labels)
+
+
+@contextlib.contextmanager
+def request_trace(kind, **fields):
+    """
+    Collects the spans of one request. Threads started with asyncio.to_thread and tasks created
+    inside inherit it (contextvars); the trace is logged as JSON on exit.
+    """
+    trace = RequestTrace(kind, fields)
+    token = _TRACE.set(trace)
+    try:
+        yield trace
+    finally:
+        _TRACE.reset(token)
+        METRICS.observe("request_seconds", monotonic() - trace.started, request=kind)
+        TRACE_LOGGER.info(json.dumps(trace.as_dict(), ensure_ascii=False, default=str))
+
+
+# --- PROMETHEUS ENDPOINT ---
+async def _handle_scrape(reader, writer):
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        body = METRICS.render_prometheus().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+            + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    """Serves /metrics (any path) in Prometheus text format on the running loop; None if disabled."""
+    if not port:
+        return None
+    server = await asyncio.start_server(_handle_scrape, host, port)
+    LOGGER.info(f"Prometheus metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import asyncio
+import logging
+
+import httpx
+
+from rate_limit import AsyncTokenBucket
+
+LOGGER = logging.getLogger("stock_bot.notifier")
+
+TOKEN = os.environ.get("TG_TOKEN")
+# Same comma-separated list the bot uses for its ACL
+ALERT_CHAT_IDS = os.environ.get("TG_ALERT_CHAT_IDS") or os.environ.get("TG_ALLOWED_IDS", "")
+# No repeat alert for the same symbol / window / kind within the cooldown...
+ALERT_COOLDOWN_SECONDS = int(os.getenv("ALERT_COOLDOWN_SECONDS", str(4 * 60 * 60)))
+# ...unless the level moved further than this (e.g. a higher high); rules whose level is a % or a
+# z-score set their own absolute step instead
+ALERT_MIN_STEP_PCT = float(os.getenv("ALERT_MIN_STEP_PCT", "0.25"))
+# Telegram: ~30 messages/second overall, ~1/second per chat
+ALERT_GLOBAL_RATE = float(os.getenv("ALERT_GLOBAL_RATE", "25"))
+ALERT_CHAT_RATE = float(os.getenv("ALERT_CHAT_RATE", "1"))
+MAX_RETRIES = 3
+MAX_MESSAGE_CHARS = 4000  # Telegram's limit is 4096
+
+
+def parse_chat_ids(raw):
+    """'123, -100456,@channel' -> [123, -100456, '@channel']"""
+    chat_ids = []
+    for part in str(raw or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            chat_ids.append(int(part))
+        except ValueError:
+            chat_ids.append(part)
+    return chat_ids
+
+
+def retry_after_seconds(response):
+    """Wait asked for by a 429: Telegram's JSON parameters, else the Retry-After header, else 1 s."""
+    try:
+        return float(response.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return 1.0
+
+
+class AlertStateStore:
+    """
+    Last alert per (symbol, window, kind), persisted as JSON.
+    An alert is suppressed while its cooldown runs unless the level moved past the previous one
+    by more than min_step_pct (a higher high, or a lower low), or by more than the alert's own
+    absolute min_step (e.g. 1 percentage point of gap, 1 std of volume z-score).
+    """
+
+    def __init__(self, path, cooldown=ALERT_COOLDOWN_SECONDS, min_step_pct=ALERT_MIN_STEP_PCT):
+        self.path = path
+        self.cooldown = cooldown
+        self.min_step_pct = min_step_pct
+        self.suppressed = 0
+        self._state = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError) as e:
+                LOGGER.warning(f"Could not restore alert state from {path}: {e}")
+
+    @staticmethod
+    def _key(symbol, window, kind):
+        return f"{symbol}|{window}|{kind}"
+
+    def should_alert(self, symbol, window, kind, level, now=None, min_step=None):
+        now = time.time() if now is None else now
+        previous = self._state.get(self._key(symbol, window, kind))
+        if previous is None or now - previous["at"] >= self.cooldown:
+            return True
+        if min_step is not None:
+            step, threshold = level - previous["level"], min_step
+        else:
+            step = (level / previous["level"] - 1) * 100 if previous["level"] else float("inf")
+            threshold = self.min_step_pct
+        if kind == "low":
+            step = -step
+        if step > threshold:
+            return True
+        self.suppressed += 1
+        return False
+
+    def record(self, symbol, window, kind, level, now=None):
+        self._state[self._key(symbol, window, kind)] = {"level": level, "at": time.time() if now is None else now}
+
+    def filter(self, alerts):
+        """Keeps the alerts that are not repeats; call record_sent once they went out."""
+        return [
+            a for a in alerts
+            if self.should_alert(a["symbol"], a["window"], a["kind"], a["level"], min_step=a.get("min_step"))
+        ]
+
+    def record_sent(self, alerts):
+        for alert in alerts:
+            self.record(alert["symbol"], alert["window"], alert["kind"], alert["level"])
+
+    def save(self):
+        expired = [k for k, v in self._state.items() if time.time() - v["at"] >= self.cooldown]
+        for key in expired:
+            del self._state[key]
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._state, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+
+class AlertNotifier:
+    """
+    Sends alert messages to every chat over one pooled HTTP/1.1 keep-alive client.
+    Chats are served concurrently; global and per-chat token buckets keep it within Telegram limits
+    and a 429 pauses the chat for the retry_after Telegram asks for.
+    Use as `async with AlertNotifier() as notifier:` so the connection pool is closed.
+    """
+
+    def __init__(self, token=TOKEN, chat_ids=None, max_retries=MAX_RETRIES, transport=None):
+        self.token = token
+        self.transport = transport
+        self.chat_ids = parse_chat_ids(ALERT_CHAT_IDS) if chat_ids is None else list(chat_ids)
+        self.max_retries = max_retries
+        self._client = None
+        self._global = AsyncTokenBucket(ALERT_GLOBAL_RATE, int(ALERT_GLOBAL_RATE))
+        self._chats = {}
+        self.sent = 0
+        self.failed = 0
+
+    async def __aenter__(self):
+        self._client = httpx.AsyncClient(
+            base_url=f"https://api.telegram.org/bot{self.token}/",
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            transport=self.transport,
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.aclose()
+        self._client = None
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = AsyncTokenBucket(ALERT_CHAT_RATE, 1)
+        return bucket
+
+    async def _send(self, chat_id, text):
+        bucket = self._chat_bucket(chat_id)
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            await self._global.acquire()
+            try:
+                response = await self._client.post("sendMessage", data={"chat_id": chat_id, "text": text})
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    LOGGER.error(f"Alert to {chat_id} failed after {attempt + 1} attempts: {e}")
+                    break
+                LOGGER.warning(f"Alert to {chat_id} failed ({e}), retry {attempt + 1}/{self.max_retries}")
+                await asyncio.sleep(min(8.0, 0.5 * 2 ** attempt))
+                continue
+            if response.status_code == 429:
+                if attempt == self.max_retries:
+                    LOGGER.error(f"Alert to {chat_id} still rate limited after {attempt + 1} attempts")
+                    break
+                # a proxy or an overloaded edge may answer with a non-JSON body
+                retry_after = retry_after_seconds(response)
+                LOGGER.warning(f"Alert to {chat_id} rate limited, retrying in {retry_after}s")
+                await asyncio.sleep(retry_after)
+                continue
+            if response.is_success:
+                self.sent += 1
+                return True
+            LOGGER.error(f"Alert to {chat_id} rejected: {response.status_code} {response.text[:200]}")
+            break
+        self.failed += 1
+        return False
+
+    async def broadcast(self, text):
+        """Sends text to every chat at once; returns the number of chats reached."""
+        if not self.token or not self.chat_ids:
+            LOGGER.warning("Alert not sent: TG_TOKEN or chat ids are not configured")
+            return 0
+        results = await asyncio.gather(*(self._send(chat_id, text) for chat_id in self.chat_ids))
+        return sum(results)
+
+    async def send_alerts(self, alerts):
+        """
+        Broadcasts the alerts of one scan, packed into as few messages as fit Telegram's size limit
+        (each chat only takes ~1 message/second); chats are served concurrently.
+        Returns the alerts that reached at least one chat.
+        """
+        chunks, current, members = [], "", []
+        for alert in alerts:
+            text = alert["message"]
+            if current and len(current) + len(text) + 2 > MAX_MESSAGE_CHARS:
+                chunks.append((current, members))
+                current, members = "", []
+            current = f"{current}\n\n{text}" if current else text
+            members.append(alert)
+        if current:
+            chunks.append((current, members))
+        delivered = []
+        for text, members in chunks:
+            if await self.broadcast(text):
+                delivered.extend(members)
+        return delivered
@@ -0,0 +1,183 @@
+import os
+import random
+import asyncio
+import logging
+import contextlib
+from time import monotonic
+
+from telegram.constants import ChatAction
+from telegram.error import BadRequest, RetryAfter, TimedOut, NetworkError, TelegramError
+from telegram.ext import BaseRateLimiter
+
+from rate_limit import AsyncTokenBucket
+from metrics import METRICS, span
+
+LOGGER = logging.getLogger("stock_bot.outbound")
+
+# Telegram limits: ~30 messages/second overall, ~1 message/second per chat, 20/minute per group
+GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "25"))
+CHAT_RATE = float(os.getenv("TG_CHAT_RATE", "1"))
+CHAT_BURST = int(os.getenv("TG_CHAT_BURST", "3"))
+GROUP_RATE = 20 / 60
+MAX_RETRIES = 3
+TYPING_INTERVAL = 4.5  # a typing action is shown for ~5 seconds
+# Requests that are safe to repeat after a network error (no duplicate messages)
+IDEMPOTENT_ENDPOINTS = {"editMessageText", "sendChatAction", "deleteMessage", "editMessageReplyMarkup"}
+# Endpoints that do not count against the per-chat message limit
+UNLIMITED_CHAT_ENDPOINTS = {"sendChatAction"}
+
+
+class OutboundScheduler(BaseRateLimiter):
+    """
+    Central scheduler for every Bot API request (plugged in with ApplicationBuilder.rate_limiter).
+    - global and per-chat token buckets
+    - RetryAfter pauses the affected chat (or everything) for the requested time, then retries
+    - network errors are retried with jittered backoff for idempotent requests only
+    - queue depth and retry metrics through stats() and the METRICS gauges below
+    """
+
+    def __init__(self, max_retries=MAX_RETRIES):
+        self.max_retries = max_retries
+        self._global = AsyncTokenBucket(GLOBAL_RATE, int(GLOBAL_RATE))
+        self._chats = {}
+        self._paused_until = {}  # chat_id (None = global) -> monotonic deadline
+        self.queued = 0
+        self.max_queued = 0
+        self.sent = 0
+        self.retry_after_hits = 0
+        self.retry_after_seconds = 0.0
+        self.network_retries = 0
+        self.wait_seconds = 0.0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        self._chats.clear()
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if isinstance(chat_id, str) or chat_id < 0:
+                bucket = AsyncTokenBucket(GROUP_RATE, 3)
+            else:
+                bucket = AsyncTokenBucket(CHAT_RATE, CHAT_BURST)
+            self._chats[chat_id] = bucket
+        # Drop buckets of chats that went quiet so the map does not grow forever
+        if len(self._chats) > 1000:
+            for other in [c for c, b in self._chats.items() if c != chat_id and b.idle()]:
+                del self._chats[other]
+        return bucket
+
+    async def _wait_if_paused(self, chat_id):
+        while True:
+            deadline = max(self._paused_until.get(None, 0), self._paused_until.get(chat_id, 0))
+            delay = deadline - monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id")
+        with contextlib.suppress(ValueError, TypeError):
+            chat_id = int(chat_id)
+        # per-request override, e.g. edit_message_text(..., rate_limit_args={"max_retries": 0})
+        max_retries = (rate_limit_args or {}).get("max_retries", self.max_retries)
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            for attempt in range(max_retries + 1):
+                started = monotonic()
+                await self._wait_if_paused(chat_id)
+                if chat_id is not None and endpoint not in UNLIMITED_CHAT_ENDPOINTS:
+                    await self._chat_bucket(chat_id).acquire()
+                await self._global.acquire()
+                waited = monotonic() - started
+                self.wait_seconds += waited
+                METRICS.observe("telegram_queue_seconds", waited, endpoint=endpoint)
+                try:
+                    with span("telegram_request_seconds", endpoint=endpoint):
+                        result = await callback(*args, **kwargs)
+                    self.sent += 1
+                    return result
+                except RetryAfter as e:
+                    retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else float(e.retry_after)
+                    self.retry_after_hits += 1
+                    self.retry_after_seconds += retry_after
+                    # later requests for this chat wait too, instead of hitting the limit again
+                    self._paused_until[chat_id] = monotonic() + retry_after + 0.1
+                    if attempt == max_retries:
+                        raise
+                    LOGGER.warning(f"RetryAfter {retry_after}s on {endpoint} (chat {chat_id}), retry {attempt + 1}/{max_retries}")
+                except BadRequest:
+                    raise
+                except (TimedOut, NetworkError) as e:
+                    if endpoint not in IDEMPOTENT_ENDPOINTS or attempt == max_retries:
+                        raise
+                    self.network_retries += 1
+                    delay = random.uniform(0, min(8.0, 0.5 * 2 ** attempt))
+                    LOGGER.warning(f"{endpoint} failed ({e}); retry {attempt + 1}/{max_retries} in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+        finally:
+            self.queued -= 1
+
+    @property
+    def chat_queue_depths(self):
+        return {chat_id: bucket.waiting for chat_id, bucket in self._chats.items() if bucket.waiting}
+
+    def stats(self):
+        return {
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "global_waiting": self._global.waiting,
+            "chat_queue_depths": self.chat_queue_depths,
+            "sent": self.sent,
+            "retry_after_hits": self.retry_after_hits,
+            "retry_after_seconds": round(self.retry_after_seconds, 2),
+            "network_retries": self.network_retries,
+            "wait_seconds_total": round(self.wait_seconds, 3),
+        }
+
+
+# --- TYPING HEARTBEAT ---
+class TypingHeartbeat:
+    """One typing indicator per chat, shared by every request running in that chat."""
+
+    def __init__(self):
+        self._chats = {}  # chat_id -> [task, users]
+
+    @contextlib.asynccontextmanager
+    async def typing(self, bot, chat_id):
+        entry = self._chats.get(chat_id)
+        if entry is None:
+            entry = [asyncio.create_task(self._beat(bot, chat_id)), 0]
+            self._chats[chat_id] = entry
+        entry[1] += 1
+        try:
+            yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._chats.pop(chat_id, None)
+                entry[0].cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await entry[0]
+
+    async def _beat(self, bot, chat_id):
+        while True:
+            with contextlib.suppress(TelegramError):
+                await bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
+            await asyncio.sleep(TYPING_INTERVAL)
+
+    def active_chats(self):
+        return len(self._chats)
+
+
+OUTBOUND = OutboundScheduler()
+TYPING = TypingHeartbeat()
+
+# queue depth of the Telegram scheduler, read at /stats and scrape time
+METRICS.gauge("telegram_queued", lambda: OUTBOUND.queued)
+METRICS.gauge("telegram_queue_waiting", lambda: OUTBOUND._global.waiting, bucket="global")
+METRICS.gauge("telegram_queue_waiting", lambda: sum(OUTBOUND.chat_queue_depths.values()), bucket="chat")
+METRICS.gauge("telegram_typing_chats", TYPING.active_chats)
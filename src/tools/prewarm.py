@@ -0,0 +1,201 @@
+import os
+import asyncio
+import logging
+import threading
+from time import time
+from collections import Counter, deque
+from datetime import timedelta
+
+from ai import prepare_stock_data, analyze_from_data, short_system_prompt
+from concurrency import ANALYSIS_GATE
+from finhub_client import limiter
+from market_hours import in_session, next_session_open, market_now
+from rate_limit import INTERACTIVE, BULK, BACKGROUND
+from settings_loader import get_watchlist
+
+LOGGER = logging.getLogger("stock_bot.prewarm")
+
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "1") == "1"
+# Refresh every N minutes during the session, plus one round shortly before the open
+PREWARM_INTERVAL = int(os.getenv("PREWARM_INTERVAL_MINUTES", "15")) * 60
+PREWARM_BEFORE_OPEN = int(os.getenv("PREWARM_BEFORE_OPEN_MINUTES", "20")) * 60
+# Also warm the most requested tickers of the last day
+PREWARM_TOP_REQUESTED = int(os.getenv("PREWARM_TOP_REQUESTED", "5"))
+REQUEST_HISTORY_SECONDS = 24 * 60 * 60
+# A warmed rating is served instead of a new one while it is younger than this (the reply states its age)
+PREWARM_MAX_AGE = int(os.getenv("PREWARM_MAX_AGE", str(PREWARM_INTERVAL + 5 * 60)))
+# Back off when this many interactive analyses are running (or anyone is queued)
+PREWARM_MAX_INTERACTIVE = int(os.getenv("PREWARM_MAX_INTERACTIVE", str(max(1, ANALYSIS_GATE.limit // 2))))
+PREWARM_BUSY_RETRY = 30
+# Delay before a crashed pre-warm job is started again
+PREWARM_RESTART_DELAY = 60
+
+
+class RequestHistory:
+    """Tickers requested by users over the last day, for picking extra symbols to warm."""
+
+    def __init__(self, window=REQUEST_HISTORY_SECONDS):
+        self.window = window
+        self._requests = deque()  # (timestamp, symbol)
+        self._lock = threading.Lock()
+
+    def record(self, symbol):
+        with self._lock:
+            self._requests.append((time(), symbol.upper()))
+            self._trim()
+
+    def _trim(self):
+        cutoff = time() - self.window
+        while self._requests and self._requests[0][0] < cutoff:
+            self._requests.popleft()
+
+    def most_requested(self, n):
+        with self._lock:
+            self._trim()
+            return [symbol for symbol, _ in Counter(symbol for _, symbol in self._requests).most_common(n)]
+
+
+class Prewarmer:
+    """
+    Background job inside the bot process: fetches data and the quick rating for the watchlist
+    (and the most requested tickers) on a schedule, with the background Finnhub lane.
+    It yields to users: a round stops as soon as interactive load is high.
+    """
+
+    def __init__(self, history=None):
+        self.history = history or RequestHistory()
+        self._results = {}  # symbol -> {"data", "answer", "at"}
+        self._task = None
+        self._restart = None
+        self.rounds = 0
+        self.warmed = 0
+        self.hits = 0
+        self.interrupted = 0
+        self.evicted = 0
+        self.restarts = 0
+
+    def get_fresh(self, symbol, max_age=PREWARM_MAX_AGE):
+        result = self._results.get(symbol.upper())
+        if result is None or time() - result["at"] > max_age:
+            return None
+        self.hits += 1
+        return result
+
+    def busy(self):
+        return (
+            ANALYSIS_GATE.in_flight >= PREWARM_MAX_INTERACTIVE
+            or ANALYSIS_GATE.waiting > 0
+            or limiter().lane_waiting(INTERACTIVE) > 0
+            or limiter().lane_waiting(BULK) > 0
+        )
+
+    def symbols(self):
+        symbols = get_watchlist()
+        for symbol in self.history.most_requested(PREWARM_TOP_REQUESTED):
+            if symbol not in symbols:
+                symbols.append(symbol)
+        return symbols
+
+    async def warm_symbol(self, symbol):
+        data = await asyncio.to_thread(prepare_stock_data, symbol, BACKGROUND)
+        if not isinstance(data, dict) or data.get("partial"):
+            return False
+        answer = await asyncio.to_thread(analyze_from_data, data, short_system_prompt)
+        self._results[symbol] = {"data": data, "answer": answer, "at": time()}
+        self.warmed += 1
+        return True
+
+    def _is_fresh(self, symbol, max_age):
+        result = self._results.get(symbol)
+        return result is not None and time() - result["at"] <= max_age
+
+    def evict(self, symbols):
+        """Drops results older than PREWARM_MAX_AGE and those of symbols no longer warmed; returns how many."""
+        keep = set(symbols)
+        now = time()
+        stale = [symbol for symbol, result in self._results.items() if symbol not in keep or now - result["at"] > PREWARM_MAX_AGE]
+        for symbol in stale:
+            del self._results[symbol]
+        self.evicted += len(stale)
+        return len(stale)
+
+    async def warm_round(self):
+        """Warms every symbol unless users need the capacity; returns False if the round was cut short."""
+        self.rounds += 1
+        warmed = 0
+        symbols = self.symbols()
+        self.evict(symbols)
+        for symbol in symbols:
+            if self.busy():
+                self.interrupted += 1
+                LOGGER.info(f"Pre-warm round paused after {warmed} symbols: interactive load is high")
+                return False
+            if self._is_fresh(symbol, PREWARM_INTERVAL / 2):
+                continue
+            try:
+                warmed += await self.warm_symbol(symbol)
+            except Exception as e:
+                LOGGER.warning(f"Pre-warm of {symbol} failed: {e}")
+        LOGGER.info(f"Pre-warm round done: {warmed} symbols refreshed")
+        return True
+
+    def due(self, now=None):
+        """During the session, or in the pre-open window."""
+        now = now or market_now()
+        return in_session(now) or now >= next_session_open(now) - timedelta(seconds=PREWARM_BEFORE_OPEN)
+
+    def seconds_until_next_round(self, now=None):
+        now = now or market_now()
+        if in_session(now):
+            return PREWARM_INTERVAL
+        session_open = next_session_open(now)
+        before_open = session_open - timedelta(seconds=PREWARM_BEFORE_OPEN)
+        # in the pre-open window the next round runs at the open
+        return max(1.0, ((before_open if now < before_open else session_open) - now).total_seconds())
+
+    async def run(self):
+        while True:
+            if self.due() and not await self.warm_round():
+                # users come first; try again shortly instead of waiting a full interval
+                await asyncio.sleep(PREWARM_BUSY_RETRY)
+                continue
+            await asyncio.sleep(self.seconds_until_next_round())
+
+    def start(self):
+        if PREWARM_ENABLED and self._task is None:
+            self._restart = None
+            self._task = asyncio.create_task(self.run())
+            self._task.add_done_callback(self._on_done)
+            LOGGER.info("Pre-warm job started")
+
+    def _on_done(self, task):
+        # run() only ends by stop() or a crash; a crash must not silently end pre-warming
+        if task.cancelled() or task is not self._task:
+            return
+        LOGGER.error(f"Pre-warm job failed, restarting in {PREWARM_RESTART_DELAY}s", exc_info=task.exception())
+        self._task = None
+        self.restarts += 1
+        self._restart = asyncio.get_running_loop().call_later(PREWARM_RESTART_DELAY, self.start)
+
+    async def stop(self):
+        if self._restart is not None:
+            self._restart.cancel()
+            self._restart = None
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self):
+        return {
+            "rounds": self.rounds,
+            "warmed": self.warmed,
+            "hits": self.hits,
+            "interrupted": self.interrupted,
+            "evicted": self.evicted,
+            "restarts": self.restarts,
+            "symbols_ready": sum(1 for r in self._results.values() if time() - r["at"] <= PREWARM_MAX_AGE),
+        }
+
+
+PREWARM = Prewarmer()
@@ -0,0 +1,145 @@
+import asyncio
+import threading
+from collections import deque
+from time import monotonic
+
+# Priority lanes, lower value is served first
+INTERACTIVE = 0
+BULK = 1        # multi-symbol user requests (/watchlist): behind single ratings, ahead of background work
+BACKGROUND = 2
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with priority lanes.
+    A caller in a lower-priority lane only gets a token when no higher-priority
+    caller is waiting, so background jobs never delay interactive requests.
+    With window_limit set, at most that many tokens are handed out in any `window` seconds
+    (a sliding window on top of the bucket, for quotas like "60 calls per minute").
+    lane_limits caps single lanes within that window ({BACKGROUND: 30}), so background work
+    can never use up the share of the window that interactive requests rely on.
+    """
+
+    def __init__(self, rate, capacity, window_limit=None, window=60.0, lane_limits=None):
+        self.rate = rate            # tokens per second
+        self.capacity = capacity
+        self.window_limit = window_limit
+        self.window = window
+        self.lane_limits = dict(lane_limits or {})
+        self._tokens = float(capacity)
+        self._updated = monotonic()
+        self._recent = deque()      # (hand-out time, lane) within the sliding window
+        self._recent_by_lane = {}   # lane -> tokens it holds in the sliding window
+        self._waiting = {}          # lane -> number of waiting callers
+        self._cond = threading.Condition()
+        self.acquired = 0
+        self.throttled = 0          # acquisitions that had to wait
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _refill(self):
+        now = monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _window_delay(self, now, lane):
+        """Seconds until the sliding window has room for another token of the lane (0 if it has room now)."""
+        if self.window_limit is None:
+            return 0.0
+        while self._recent and self._recent[0][0] <= now - self.window:
+            _, old_lane = self._recent.popleft()
+            self._recent_by_lane[old_lane] -= 1
+        delay = 0.0
+        if len(self._recent) >= self.window_limit:
+            delay = self._recent[0][0] + self.window - now
+        lane_limit = self.lane_limits.get(lane)
+        if lane_limit is not None and self._recent_by_lane.get(lane, 0) >= lane_limit:
+            oldest = next(at for at, other in self._recent if other == lane)
+            delay = max(delay, oldest + self.window - now)
+        return delay
+
+    def _blocked_by_higher_lane(self, lane):
+        return any(count for other, count in self._waiting.items() if other < lane)
+
+    def acquire(self, lane=INTERACTIVE):
+        """Blocks until a token is available for the lane; returns seconds waited."""
+        started = monotonic()
+        with self._cond:
+            self._waiting[lane] = self._waiting.get(lane, 0) + 1
+            try:
+                while True:
+                    self._refill()
+                    window_delay = self._window_delay(self._updated, lane)
+                    if self._tokens >= 1 and not window_delay and not self._blocked_by_higher_lane(lane):
+                        self._tokens -= 1
+                        if self.window_limit is not None:
+                            self._recent.append((self._updated, lane))
+                            self._recent_by_lane[lane] = self._recent_by_lane.get(lane, 0) + 1
+                        break
+                    missing = max(0.0, 1 - self._tokens)
+                    self._cond.wait(timeout=max(missing / self.rate, window_delay, 0.01))
+            finally:
+                self._waiting[lane] -= 1
+                self._cond.notify_all()
+            waited = monotonic() - started
+            self.acquired += 1
+            self.wait_seconds += waited
+            if waited > 0.001:
+                self.throttled += 1
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return waited
+
+    def lane_waiting(self, lane):
+        with self._cond:
+            return self._waiting.get(lane, 0)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "rate_per_sec": self.rate,
+                "capacity": self.capacity,
+                "window_limit": self.window_limit,
+                "lane_limits": dict(self.lane_limits),
+                "acquired": self.acquired,
+                "throttled": self.throttled,
+                "wait_seconds_total": round(self.wait_seconds, 3),
+                "wait_seconds_max": round(self.max_wait_seconds, 3),
+                "waiting": dict(self._waiting),
+            }
+
+
+class AsyncTokenBucket:
+    """Token bucket for coroutines; waiting callers are served in FIFO order."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = monotonic()
+        self._lock = asyncio.Lock()
+        self.waiting = 0
+
+    def _refill(self):
+        now = monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Waits for a token; returns seconds waited."""
+        started = monotonic()
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    self._refill()
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+        return monotonic() - started
+
+    def idle(self):
+        self._refill()
+        return self.waiting == 0 and self._tokens >= self.capacity
@@ -0,0 +1,167 @@
+import os
+import re
+import json
+import sqlite3
+import logging
+import threading
+from time import time
+
+LOGGER = logging.getLogger("stock_bot.responses")
+
+# Finnhub responses, fear & greed readings and LLM answers survive restarts in one SQLite file
+# (candles already persist in the candle store). RESPONSE_STORE=0 keeps the caches memory-only.
+RESPONSE_STORE_ENABLED = os.getenv("RESPONSE_STORE", "1") == "1"
+RESPONSE_STORE_PATH = os.getenv("RESPONSE_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "responses.sqlite3"))
+RESPONSE_STORE_MAX_MB = float(os.getenv("RESPONSE_STORE_MAX_MB", "256"))
+# Replay: serve only what the store has recorded (any age) and never call Finnhub or the LLM
+REPLAY_MODE = os.getenv("REPLAY_MODE", "0") == "1"
+# Size is checked every N writes; eviction trims to this share of the limit
+EVICT_EVERY = 200
+EVICT_TARGET = 0.9
+
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    family TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS responses_family ON responses (namespace, family, stored_at);
+CREATE INDEX IF NOT EXISTS responses_age ON responses (expires_at, stored_at);
+"""
+
+
+class ReplayMiss(LookupError):
+    """Replay mode has no recorded response for a request (or it would need the network)."""
+
+
+def signature(key):
+    return json.dumps(list(key), ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def family(key):
+    """The signature without date parts: a replay on another day still finds e.g. ("news", "AMD")."""
+    return signature([part for part in key if not _DATE.fullmatch(str(part))])
+
+
+class ResponseStore:
+    """
+    JSON values keyed by (namespace, request signature) in SQLite with WAL, one connection per thread.
+    Entries carry the TTL of their type (expires_at); reads in live mode only return unexpired ones.
+    When the file grows past max_bytes, expired entries go first, then the oldest.
+    """
+
+    def __init__(self, path=RESPONSE_STORE_PATH, max_bytes=RESPONSE_STORE_MAX_MB * 2 ** 20, replay=REPLAY_MODE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.replay_fallbacks = 0
+        self.evictions = 0
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(_SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace, key):
+        """(value, stored_at) or None. Replay ignores expiry and falls back to the newest entry of the key's family."""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, stored_at, expires_at FROM responses WHERE namespace = ? AND key = ?",
+            (namespace, signature(key)),
+        ).fetchone()
+        if row is None and self.replay:
+            row = conn.execute(
+                "SELECT value, stored_at, expires_at FROM responses WHERE namespace = ? AND family = ? "
+                "ORDER BY stored_at DESC LIMIT 1",
+                (namespace, family(key)),
+            ).fetchone()
+            self.replay_fallbacks += row is not None
+        if row is None or (not self.replay and row[2] <= time()):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0]), row[1]
+
+    def put(self, namespace, key, value, ttl):
+        try:
+            encoded = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        except (TypeError, ValueError) as e:
+            LOGGER.debug(f"Not storing {namespace} {key}: {e}")
+            return
+        now = time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO responses (namespace, key, family, value, size, stored_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (namespace, signature(key), family(key), encoded, len(encoded), now, now + ttl),
+        )
+        self._writes += 1
+        if self._writes % EVICT_EVERY == 0:
+            self.evict()
+
+    def size(self):
+        return self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def evict(self):
+        """Trims the store below max_bytes: expired entries first, then the oldest."""
+        conn = self._conn()
+        size = self.size()
+        if size <= self.max_bytes:
+            return 0
+        excess = size - self.max_bytes * EVICT_TARGET
+        rows = conn.execute(
+            "SELECT rowid, size FROM responses ORDER BY expires_at > ?, stored_at", (time(),)
+        ).fetchall()
+        doomed = []
+        for rowid, size in rows:
+            if excess <= 0:
+                break
+            doomed.append((rowid,))
+            excess -= size
+        conn.executemany("DELETE FROM responses WHERE rowid = ?", doomed)
+        removed = len(doomed)
+        self.evictions += removed
+        LOGGER.info(f"Response store over {self.max_bytes / 2 ** 20:.0f} MB: evicted {removed} entries")
+        return removed
+
+    def stats(self):
+        conn = self._conn()
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {
+            "entries": entries,
+            "mb": round(size / 2 ** 20, 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "replay": self.replay,
+            "replay_fallbacks": self.replay_fallbacks,
+            "evictions": self.evictions,
+        }
+
+
+RESPONSE_STORE = ResponseStore() if RESPONSE_STORE_ENABLED or REPLAY_MODE else None
+
+
+def check_live(what):
+    """Raises ReplayMiss in replay mode, where nothing may leave the process."""
+    if RESPONSE_STORE is not None and RESPONSE_STORE.replay:
+        raise ReplayMiss(f"{what} is not available in replay mode")
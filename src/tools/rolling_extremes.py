@@ -0,0 +1,137 @@
+import os
+import json
+import logging
+from collections import deque
+
+LOGGER = logging.getLogger("stock_bot.extremes")
+
+DAY = 24 * 60 * 60
+
+
+class RollingExtremes:
+    """
+    Max of highs / min of lows over a sliding time window, kept in monotonic deques.
+    Each candle is pushed and popped at most once, so updates are O(1) amortized.
+    Re-pushing the newest candle (same ts, live candle still forming) is supported.
+    """
+
+    def __init__(self, window_seconds):
+        self.window = window_seconds
+        self._highs = deque()  # (ts, high), highs strictly decreasing
+        self._lows = deque()   # (ts, low), lows strictly increasing
+        self.last_ts = None
+
+    def push(self, ts, high, low):
+        """Adds a candle; returns (is_new_high, is_new_low) for it within the window."""
+        while self._highs and self._highs[-1][1] <= high:
+            self._highs.pop()
+        self._highs.append((ts, high))
+        while self._lows and self._lows[-1][1] >= low:
+            self._lows.pop()
+        self._lows.append((ts, low))
+        cutoff = ts - self.window
+        while self._highs[0][0] <= cutoff:
+            self._highs.popleft()
+        while self._lows[0][0] <= cutoff:
+            self._lows.popleft()
+        self.last_ts = ts
+        return self._highs[0][0] == ts, self._lows[0][0] == ts
+
+    @property
+    def high(self):
+        return self._highs[0] if self._highs else None
+
+    @property
+    def low(self):
+        return self._lows[0] if self._lows else None
+
+    def state(self):
+        return {"window": self.window, "last_ts": self.last_ts, "highs": list(self._highs), "lows": list(self._lows)}
+
+    @classmethod
+    def from_state(cls, state):
+        extremes = cls(state["window"])
+        extremes._highs = deque(tuple(item) for item in state["highs"])
+        extremes._lows = deque(tuple(item) for item in state["lows"])
+        extremes.last_ts = state["last_ts"]
+        return extremes
+
+
+class ExtremesIndex:
+    """RollingExtremes for every symbol and window (e.g. {"5d": 5 * DAY, "14d": 14 * DAY})."""
+
+    def __init__(self, windows):
+        self.windows = dict(windows)
+        self._symbols = {}  # symbol -> {window name: RollingExtremes}
+
+    def _for(self, symbol):
+        per_window = self._symbols.get(symbol)
+        if per_window is None:
+            per_window = {name: RollingExtremes(seconds) for name, seconds in self.windows.items()}
+            self._symbols[symbol] = per_window
+        return per_window
+
+    def last_ts(self, symbol):
+        per_window = self._symbols.get(symbol)
+        if not per_window:
+            return None
+        return min((e.last_ts for e in per_window.values() if e.last_ts is not None), default=None)
+
+    def update(self, symbol, candles):
+        """
+        Feeds candles (structured array with ts/high/low, oldest first) newer than or equal to
+        the last one seen. Returns {window: {"new_high", "new_low", "high", "low"}} for the
+        newest candle, or None if nothing new was pushed.
+        """
+        per_window = self._for(symbol)
+        result = None
+        last = self.last_ts(symbol)
+        for ts, high, low in zip(candles["ts"], candles["high"], candles["low"]):
+            ts = int(ts)
+            if last is not None and ts < last:
+                continue
+            flags = {name: e.push(ts, float(high), float(low)) for name, e in per_window.items()}
+            result = flags
+        if result is None:
+            return None
+        return {
+            name: {
+                "new_high": flags[0],
+                "new_low": flags[1],
+                "high": per_window[name].high,
+                "low": per_window[name].low,
+            }
+            for name, flags in result.items()
+        }
+
+    def save(self, path):
+        state = {
+            "windows": self.windows,
+            "symbols": {sy: {name: e.state() for name, e in per_window.items()} for sy, per_window in self._symbols.items()},
+        }
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, windows):
+        """Restores a saved index; windows that changed since the save start empty."""
+        index = cls(windows)
+        if not os.path.exists(path):
+            return index
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            LOGGER.warning(f"Could not restore extremes index from {path}: {e}")
+            return index
+        for symbol, per_window in state.get("symbols", {}).items():
+            restored = {}
+            for name, seconds in index.windows.items():
+                saved = per_window.get(name)
+                if saved is not None and saved["window"] == seconds:
+                    restored[name] = RollingExtremes.from_state(saved)
+            if len(restored) == len(index.windows):
+                index._symbols[symbol] = restored
+        return index
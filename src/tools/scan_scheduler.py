@@ -0,0 +1,96 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+import fetch_yfinance as scanner
+from market_hours import MARKET_TZ, in_session, next_session_open, market_now
+from notifier import AlertNotifier
+from settings_loader import get_watchlist
+
+LOGGER = logging.getLogger("stock_bot.scan_scheduler")
+
+# Run once per closed candle; the grace delay lets the data provider publish it
+SCAN_INTERVAL = int(os.getenv("SCAN_INTERVAL_SECONDS", str(scanner.INTERVAL_SECONDS)))
+SCAN_GRACE_SECONDS = int(os.getenv("SCAN_GRACE_SECONDS", "30"))
+
+
+def scan_due(now=None):
+    """
+    In session, or the first run after the close: the session's last candle (15:55) closes
+    at 16:00 and is only scanned by the run one grace period later.
+    """
+    now = (now or market_now()).astimezone(MARKET_TZ)
+    return in_session(now) or in_session(now - timedelta(seconds=SCAN_INTERVAL + SCAN_GRACE_SECONDS))
+
+
+def seconds_until_next_run(now=None):
+    """Seconds until the next candle boundary (plus grace) if a scan is due then, else until the next session open."""
+    now = (now or market_now()).astimezone(MARKET_TZ)
+    epoch = now.timestamp()
+    boundary = (epoch // SCAN_INTERVAL + 1) * SCAN_INTERVAL + SCAN_GRACE_SECONDS
+    if scan_due(datetime.fromtimestamp(boundary, MARKET_TZ)):
+        return boundary - epoch
+    return (next_session_open(now) - now).total_seconds() + SCAN_GRACE_SECONDS
+
+
+async def run_cycle(symbols, notifier=None):
+    """
+    One scan: multi-ticker batch downloads, one batch at a time (yfinance is not thread-safe), then one vectorized rule pass.
+    Downloads are sequential, so a cycle takes about one yf.download round trip per BATCH_SIZE symbols: it grows
+    linearly with the watchlist and must stay well under SCAN_INTERVAL (the "total" in the cycle log line).
+    """
+    started = time.monotonic()
+    added = {}
+    for batch, window in scanner.plan_downloads(symbols):
+        added.update(await asyncio.to_thread(scanner.download_batch, batch, window))
+    downloaded = time.monotonic()
+
+    latest, alerts = await asyncio.to_thread(scanner.scan_signals, symbols)
+    checked = time.monotonic()
+    sent = await scanner.notify_alerts(alerts, notifier)
+    await asyncio.to_thread(scanner.save_scan_state)
+    last_candles = list(latest.values())
+
+    finished = time.monotonic()
+    # Lag: how long after the last closed candle the scan finished (the newest one may still be forming)
+    lag = None
+    if last_candles:
+        now = time.time()
+        closed_at = max(last_candles) + scanner.INTERVAL_SECONDS
+        lag = now - (closed_at if closed_at <= now else max(last_candles))
+    LOGGER.info(
+        f"Scan cycle: {len(symbols)} symbols, {sum(added.values())} new candles, {len(alerts)} alerts ({sent} sent), "
+        f"download {downloaded - started:.1f}s, rules {(checked - downloaded) * 1000:.1f}ms, "
+        f"notify {finished - checked:.1f}s, total {finished - started:.1f}s, "
+        f"lag {f'{lag:.0f}s' if lag is not None else 'n/a'}"
+    )
+    LOGGER.info("Rule timings (ms): " + ", ".join(f"{name} {ms}" for name, ms in scanner.SIGNALS.stats()["last_ms"].items()))
+    return {"duration": finished - started, "lag": lag, "symbols": len(symbols), "rules_ms": scanner.SIGNALS.stats()["last_ms"]}
+
+
+async def run_forever():
+    async with AlertNotifier() as notifier:
+        while True:
+            symbols = get_watchlist()
+            if not symbols:
+                LOGGER.warning("Watchlist is empty, nothing to scan")
+            elif scan_due():
+                try:
+                    await run_cycle(symbols, notifier)
+                except Exception:
+                    # one failed cycle (a download or the alert state) must not end the scanner
+                    LOGGER.exception("Scan cycle failed")
+            delay = seconds_until_next_run()
+            LOGGER.info(f"Next scan in {delay:.0f}s")
+            await asyncio.sleep(delay)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    asyncio.run(run_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import os
+import json
+import logging
+import threading
+from time import time
+from collections import OrderedDict
+
+# How long a user's last payload may be reused by the Deep Dive / news buttons
+SNAPSHOT_MAX_AGE = int(os.getenv("SESSION_SNAPSHOT_MAX_AGE", "300"))
+# Memory cap across all users; least recently used snapshots are evicted first
+SESSION_STORE_MAX_BYTES = int(os.getenv("SESSION_STORE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Fresh snapshots are saved here at shutdown and restored at the next start
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sessions.json"))
+
+LOGGER = logging.getLogger("stock_bot.sessions")
+
+
+def _estimate_size(data):
+    try:
+        return len(json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return len(str(data))
+
+
+class SessionStore:
+    """
+    Last fetched payload per user, with its fetch time, under a global byte cap (LRU).
+    With a path, save() writes the still-fresh snapshots as JSON and a new instance restores them,
+    so a restart does not make the Deep Dive / news buttons refetch.
+    """
+
+    def __init__(self, max_bytes=SESSION_STORE_MAX_BYTES, max_age=SNAPSHOT_MAX_AGE, path=None):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.path = path
+        self._snapshots = OrderedDict()  # user_id -> {"symbol", "data", "fetched_at", "size"}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    saved = json.load(f)
+            except (OSError, ValueError) as e:
+                LOGGER.warning(f"Could not restore session snapshots from {path}: {e}")
+                saved = []
+            for user_id, snapshot in saved:
+                if time() - snapshot["fetched_at"] <= self.max_age:
+                    self.put(user_id, snapshot["symbol"], snapshot["data"], snapshot["fetched_at"])
+
+    def put(self, user_id, symbol, data, fetched_at=None):
+        size = _estimate_size(data)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._snapshots.pop(user_id, None)
+            if old is not None:
+                self._bytes -= old["size"]
+            self._snapshots[user_id] = {
+                "symbol": symbol.upper(),
+                "data": data,
+                "fetched_at": fetched_at if fetched_at is not None else time(),
+                "size": size,
+            }
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._snapshots:
+                _, evicted = self._snapshots.popitem(last=False)
+                self._bytes -= evicted["size"]
+                self.evictions += 1
+
+    def get_fresh(self, user_id, symbol, max_age=None):
+        """Returns the user's snapshot for symbol if it is younger than max_age, else None."""
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            snapshot = self._snapshots.get(user_id)
+            if (
+                snapshot is None
+                or snapshot["symbol"] != symbol.upper()
+                or time() - snapshot["fetched_at"] > max_age
+            ):
+                self.misses += 1
+                return None
+            self._snapshots.move_to_end(user_id)
+            self.hits += 1
+            return snapshot
+
+    def last_symbol(self, user_id):
+        """Symbol of the user's snapshot while it is fresh, else None."""
+        with self._lock:
+            snapshot = self._snapshots.get(user_id)
+            if snapshot is None or time() - snapshot["fetched_at"] > self.max_age:
+                return None
+            return snapshot["symbol"]
+
+    def save(self):
+        """Writes the fresh snapshots to path, least recently used first (the order they are restored in)."""
+        if not self.path:
+            return
+        now = time()
+        with self._lock:
+            fresh = [
+                [user_id, {k: v for k, v in snapshot.items() if k != "size"}]
+                for user_id, snapshot in self._snapshots.items()
+                if now - snapshot["fetched_at"] <= self.max_age
+            ]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(fresh, f, ensure_ascii=False, separators=(",", ":"), default=str)
+        os.replace(tmp, self.path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "users": len(self._snapshots),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+SESSION_STORE = SessionStore(path=SESSION_STORE_PATH)
@@ -0,0 +1,18 @@
+import os
+import sys
+
+# setting.py lives in src/, the tools run from src/tools
+_SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _SRC_DIR not in sys.path:
+    sys.path.append(_SRC_DIR)
+
+import setting
+
+
+def get_watchlist():
+    return [symbol.upper() for symbol in getattr(setting, "watchlist", [])]
+
+
+def get_scan_rules():
+    """Scanner rules from setting.scan_rules, or None to use the scanner defaults."""
+    return getattr(setting, "scan_rules", None)
@@ -0,0 +1,238 @@
+import time
+import inspect
+import warnings
+from functools import cached_property
+
+import numpy as np
+
+from candle_store import CANDLES_PER_SESSION, DAY
+
+# Used when setting.scan_rules is not defined: the original 14-day breakout alert
+DEFAULT_RULES = [
+    {"name": "new_high_14d", "type": "new_high", "days": 14},
+]
+
+RULE_TYPES = {}
+
+
+def rule(type_name, kind="high", message=None, extremes=False, min_step=None):
+    """
+    Registers a vectorized rule. The function gets a CandleContext and the rule params and returns
+    (hits, levels): boolean and float arrays with one entry per symbol.
+    kind tells the alert dedup which direction counts as "further" ("low": smaller levels).
+    min_step is the absolute level change that re-alerts within the cooldown, for rules whose level
+    already is a percentage or a z-score; None uses the dedup's relative step (for price levels).
+    extremes rules read the rolling-extremes index for their `days` window instead of the candle matrix.
+    """
+    def register(func):
+        defaults = {name: p.default for name, p in list(inspect.signature(func).parameters.items())[1:]}
+        RULE_TYPES[type_name] = {
+            "func": func, "kind": kind, "message": message, "defaults": defaults,
+            "extremes": extremes, "min_step": min_step,
+        }
+        return func
+    return register
+
+
+def extreme_window(days):
+    """Name of the rolling-extremes window for a rule's `days`."""
+    return f"{days}d"
+
+
+class CandleContext:
+    """
+    A candle matrix (symbols x time, newest column last) plus lazily shared intermediate arrays.
+    extremes is the rolling-extremes index state for each symbol's newest candle, as arrays with one
+    entry per symbol: {window: {"new_high", "new_low", "high", "low"}}.
+    """
+
+    def __init__(self, matrix, extremes=None):
+        self.matrix = matrix
+        self.rows = matrix["close"].shape[0]
+        self.width = matrix["close"].shape[1]
+        self.extremes = extremes or {}
+
+    def __getitem__(self, name):
+        return self.matrix[name]
+
+    def last(self, name, offset=0):
+        values = self.matrix[name]
+        return values[:, -1 - offset] if self.width > offset else np.full(self.rows, np.nan)
+
+    @cached_property
+    def has_data(self):
+        return np.isfinite(self.last("close"))
+
+    @cached_property
+    def session_start(self):
+        """Column of the first candle of each symbol's latest session (US sessions fit in one UTC day)."""
+        if not self.width:
+            return np.zeros(self.rows, dtype=int)
+        day = self.matrix["ts"] // DAY
+        today = day == day[:, -1:]
+        return np.argmax(today, axis=1)
+
+    def at(self, name, columns):
+        values = self.matrix[name]
+        if not self.width:
+            return np.full(self.rows, np.nan)
+        valid = (columns >= 0) & (columns < self.width)
+        picked = values[np.arange(self.rows), np.clip(columns, 0, max(self.width - 1, 0))]
+        return np.where(valid, picked, np.nan)
+
+    def extreme(self, window, key):
+        """
+        (is_new, level) per symbol from the extremes index, key "high" or "low".
+        Symbols without new candles since the last update are never new.
+        """
+        state = self.extremes.get(window)
+        if state is None:
+            return np.zeros(self.rows, dtype=bool), np.full(self.rows, np.nan)
+        return state[f"new_{key}"], state[key]
+
+    def sma(self, name, period, offset=0):
+        values = self.matrix[name]
+        end = self.width - offset
+        if end < period:
+            return np.full(self.rows, np.nan)
+        # NaN padding propagates, so symbols with too short a history come out as NaN
+        return values[:, end - period:end].mean(axis=1)
+
+
+def _pct_change(new, old):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (new / old - 1) * 100
+
+
+@rule("new_high", kind="high", extremes=True, message="🚀 {symbol} hit a new {days}-day high!\nHigh: {level:.2f} at {time}")
+def new_high(ctx, days=14):
+    return ctx.extreme(extreme_window(days), "high")
+
+
+@rule("new_low", kind="low", extremes=True, message="🔻 {symbol} hit a new {days}-day low!\nLow: {level:.2f} at {time}")
+def new_low(ctx, days=14):
+    return ctx.extreme(extreme_window(days), "low")
+
+
+@rule("gap", min_step=1.0, message="↕️ {symbol} gapped {direction} {level:.2f}% at the open ({time})")
+def gap(ctx, min_pct=2.0, direction="up"):
+    start = ctx.session_start
+    change = _pct_change(ctx.at("open", start), ctx.at("close", start - 1))
+    hits = change >= min_pct if direction == "up" else change <= -min_pct
+    return hits, np.abs(change)
+
+
+@rule("volume_spike", min_step=1.0, message="📊 {symbol} volume spike: {level:.1f} std above the last {lookback} candles ({time})")
+def volume_spike(ctx, z=3.0, lookback=78):
+    history = ctx["volume"][:, -(lookback + 1):-1]
+    if history.shape[1] < 2:
+        return np.zeros(ctx.rows, dtype=bool), np.full(ctx.rows, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        score = (ctx.last("volume") - np.nanmean(history, axis=1)) / np.nanstd(history, axis=1)
+    return score >= z, score
+
+
+@rule("ma_cross", message="✖️ {symbol} SMA{fast} crossed {direction} SMA{slow} at {level:.2f} ({time})")
+def ma_cross(ctx, fast=20, slow=50, direction="up"):
+    fast_now, slow_now = ctx.sma("close", fast), ctx.sma("close", slow)
+    fast_prev, slow_prev = ctx.sma("close", fast, 1), ctx.sma("close", slow, 1)
+    if direction == "up":
+        hits = (fast_prev <= slow_prev) & (fast_now > slow_now)
+    else:
+        hits = (fast_prev >= slow_prev) & (fast_now < slow_now)
+    return hits, ctx.last("close")
+
+
+@rule("move_since_open", min_step=1.0, message="📈 {symbol} is {direction} {level:.2f}% since the open ({time})")
+def move_since_open(ctx, min_pct=3.0, direction="up"):
+    change = _pct_change(ctx.last("close"), ctx.at("open", ctx.session_start))
+    hits = change >= min_pct if direction == "up" else change <= -min_pct
+    return hits, np.abs(change)
+
+
+class SignalEngine:
+    """
+    Evaluates the configured rules over a candle matrix, one vectorized call per rule for all symbols.
+    Rules are dicts: {"name", "type", **params, optional "message" and "min_step"}; see RULE_TYPES for the types.
+    Per-rule evaluation time is kept for the last run and in total.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = []
+        self.min_steps = {}
+        for config in rules or DEFAULT_RULES:
+            config = dict(config)
+            rule_type = RULE_TYPES.get(config.get("type"))
+            if rule_type is None:
+                raise ValueError(f"Unknown scan rule type {config.get('type')!r}; known: {', '.join(RULE_TYPES)}")
+            name = config.pop("name", None) or config["type"]
+            config.pop("type")
+            message = config.pop("message", None) or rule_type["message"]
+            min_step = config.pop("min_step", rule_type["min_step"])
+            unknown = set(config) - set(rule_type["defaults"])
+            if unknown:
+                raise ValueError(f"Scan rule {name!r}: unknown parameters {', '.join(sorted(unknown))}")
+            self.rules.append((name, rule_type, message, {**rule_type["defaults"], **config}))
+            self.min_steps[name] = min_step
+        self.last_timings = {}
+        self.total_timings = {name: 0.0 for name, *_ in self.rules}
+        self.runs = 0
+
+    def lookback_seconds(self):
+        """History the rules need in the candle matrix (extremes rules keep theirs in the index)."""
+        days = 1
+        for _, rule_type, _, params in self.rules:
+            if rule_type["extremes"]:
+                continue
+            candles = max(params.get("lookback", 0), params.get("slow", 0)) + 1
+            days = max(days, -(-candles // CANDLES_PER_SESSION))
+        return (days + 1) * DAY
+
+    def extreme_windows(self):
+        """Rolling-extremes windows the rules read: {name: seconds}."""
+        return {
+            extreme_window(params["days"]): params["days"] * DAY
+            for _, rule_type, _, params in self.rules if rule_type["extremes"]
+        }
+
+    def evaluate(self, symbols, matrix, extremes=None):
+        """
+        Returns alert dicts (symbol, window, kind, level, min_step, message) for every rule hit.
+        extremes: per-window index arrays (see CandleContext) for the rules that read the index.
+        """
+        ctx = CandleContext(matrix, extremes)
+        alerts = []
+        timings = {}
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            for name, rule_type, message, params in self.rules:
+                started = time.perf_counter()
+                hits, levels = rule_type["func"](ctx, **params)
+                hits = hits & ctx.has_data
+                timings[name] = time.perf_counter() - started
+                for row in np.flatnonzero(hits):
+                    alerts.append({
+                        "symbol": symbols[row],
+                        "window": name,
+                        "kind": rule_type["kind"],
+                        "level": float(levels[row]),
+                        "min_step": self.min_steps[name],
+                        "message": message.format(
+                            symbol=symbols[row],
+                            level=float(levels[row]),
+                            time=time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime(ctx.last("ts")[row])),
+                            **params,
+                        ),
+                    })
+        self.last_timings = timings
+        for name, seconds in timings.items():
+            self.total_timings[name] += seconds
+        self.runs += 1
+        return alerts
+
+    def stats(self):
+        return {
+            "runs": self.runs,
+            "last_ms": {name: round(seconds * 1000, 3) for name, seconds in self.last_timings.items()},
+            "avg_ms": {name: round(seconds * 1000 / max(self.runs, 1), 3) for name, seconds in self.total_timings.items()},
+        }
@@ -0,0 +1,11 @@
+def plain_table(rows, headers):
+    """Fixed-width plain text table (columns separated by two spaces), for Telegram monospace blocks."""
+    rows = [["" if cell is None else str(cell) for cell in row] for row in rows]
+    widths = [len(str(h)) for h in headers]
+    for row in rows:
+        for i, cell in enumerate(row):
+            widths[i] = max(widths[i], len(cell))
+    lines = ["  ".join(str(h).ljust(widths[i]) for i, h in enumerate(headers)).rstrip()]
+    for row in rows:
+        lines.append("  ".join(cell.ljust(widths[i]) for i, cell in enumerate(row)).rstrip())
+    return "\n".join(lines)
@@ -0,0 +1,198 @@
+import os
+import re
+import gzip
+import bisect
+import asyncio
+import logging
+from time import time
+
+from finhub_client import get_client
+from rate_limit import BACKGROUND
+
+LOGGER = logging.getLogger("stock_bot.tickers")
+
+# Symbol universe from Finnhub's stock_symbols, kept on disk as a gzipped "SYMBOL<TAB>NAME" list
+TICKER_INDEX_PATH = os.getenv("TICKER_INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tickers.tsv.gz"))
+TICKER_INDEX_EXCHANGES = [x.strip() for x in os.getenv("TICKER_INDEX_EXCHANGES", "US").split(",") if x.strip()]
+TICKER_INDEX_REFRESH = int(os.getenv("TICKER_INDEX_REFRESH_HOURS", "24")) * 60 * 60
+TICKER_INDEX_RETRY = 15 * 60
+MAX_SUGGESTIONS = 5
+
+# What users type as a ticker: AMD, BRK.B (or BRK-B, BRK/B)
+TICKER_PATTERN = re.compile(r"[A-Z]{1,5}(?:[./-][A-Z]{1,2})?")
+
+
+def normalize_ticker(text):
+    """The symbol in Finnhub's form (share class after a dot), or None if text can't be a ticker."""
+    text = (text or "").strip().upper()
+    if not TICKER_PATTERN.fullmatch(text):
+        return None
+    return text.replace("-", ".").replace("/", ".")
+
+
+def _deletions(symbol):
+    return {symbol[:i] + symbol[i + 1:] for i in range(len(symbol))}
+
+
+def _distance(a, b):
+    """Edit distance with adjacent transpositions (optimal string alignment); symbols are short."""
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+    return current[-1]
+
+
+class _Index:
+    """Lookup structures built once per refresh and swapped in as a whole."""
+
+    def __init__(self, names):
+        self.names = names                    # symbol -> company name
+        self.symbols = sorted(names)          # for prefix search
+        self.deletions = {}                   # symbol minus one character -> symbols (typo candidates)
+        self.words = {}                       # first word of the company name -> symbols
+        for symbol, name in names.items():
+            for variant in _deletions(symbol):
+                self.deletions.setdefault(variant, []).append(symbol)
+            word = name.split(" ", 1)[0].upper()
+            if len(word) >= 3:
+                self.words.setdefault(word, []).append(symbol)
+
+
+class TickerIndex:
+    """
+    Local symbol universe for validating tickers and "did you mean" suggestions without a network call.
+    Loaded from disk and refreshed from Finnhub in the background; until the first load every
+    lookup answers "unknown" (is_known returns None) and callers fall back to Finnhub.
+    """
+
+    def __init__(self, path=TICKER_INDEX_PATH, exchanges=TICKER_INDEX_EXCHANGES, refresh_seconds=TICKER_INDEX_REFRESH):
+        self.path = path
+        self.exchanges = exchanges
+        self.refresh_seconds = refresh_seconds
+        self._index = None
+        self.updated_at = None
+        self._task = None
+
+    @property
+    def ready(self):
+        return self._index is not None
+
+    def __len__(self):
+        return len(self._index.names) if self._index else 0
+
+    def is_known(self, symbol):
+        """True / False, or None while no index is loaded."""
+        index = self._index
+        if index is None:
+            return None
+        return symbol.upper() in index.names
+
+    def name(self, symbol):
+        index = self._index
+        return index.names.get(symbol.upper()) if index else None
+
+    def prefix(self, prefix, limit=MAX_SUGGESTIONS):
+        index = self._index
+        if index is None:
+            return []
+        prefix = prefix.upper()
+        start = bisect.bisect_left(index.symbols, prefix)
+        found = []
+        for symbol in index.symbols[start:start + limit]:
+            if not symbol.startswith(prefix):
+                break
+            found.append(symbol)
+        return found
+
+    def suggest(self, text, limit=MAX_SUGGESTIONS):
+        """[(symbol, name)] closest to text: typos (one edit), longer symbols starting with it, company names."""
+        index = self._index
+        if index is None:
+            return []
+        query = (normalize_ticker(text) or text.strip()).upper()
+        candidates = set(index.deletions.get(query, ()))             # a character missing from the query
+        for variant in _deletions(query):
+            if variant in index.names:                               # one character too many
+                candidates.add(variant)
+            candidates.update(index.deletions.get(variant, ()))      # substituted / swapped character
+        candidates.update(self.prefix(query, limit))
+        by_name = set(index.words.get(query, ()))
+        candidates |= by_name
+        candidates.discard(query)
+        ranked = sorted(candidates, key=lambda s: (
+            0 if s in by_name else _distance(query, s), not s.startswith(query), len(s), s))
+        return [(symbol, index.names[symbol]) for symbol in ranked[:limit]]
+
+    # --- STORAGE ---
+    def load(self):
+        """Loads the on-disk index; False if there is none yet."""
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                names = dict(line.rstrip("\n").split("\t", 1) for line in f if "\t" in line)
+        except FileNotFoundError:
+            return False
+        self._index = _Index(names)
+        self.updated_at = os.path.getmtime(self.path)
+        LOGGER.info(f"Loaded ticker index: {len(names)} symbols")
+        return True
+
+    def save(self, names):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            for symbol in sorted(names):
+                f.write(f"{symbol}\t{names[symbol]}\n")
+        os.replace(tmp, self.path)
+
+    def refresh(self):
+        """Downloads the symbol lists, then swaps in and saves the new index."""
+        client = get_client(BACKGROUND)
+        names = {}
+        for exchange in self.exchanges:
+            for item in client.stock_symbols(exchange) or []:
+                symbol = str(item.get("symbol") or "").upper()
+                if symbol and "\t" not in symbol:
+                    names[symbol] = " ".join(str(item.get("description") or "").split())
+        if not names:
+            raise ValueError("Finnhub returned no symbols")
+        self.save(names)
+        self._index = _Index(names)
+        self.updated_at = time()
+        LOGGER.info(f"Refreshed ticker index: {len(names)} symbols")
+
+    def stale(self):
+        return self.updated_at is None or time() - self.updated_at >= self.refresh_seconds
+
+    # --- BACKGROUND REFRESH ---
+    async def run(self):
+        if not self.ready:
+            await asyncio.to_thread(self.load)
+        while True:
+            delay = self.refresh_seconds
+            if self.stale():
+                try:
+                    await asyncio.to_thread(self.refresh)
+                except Exception as e:
+                    LOGGER.warning(f"Ticker index refresh failed: {e}")
+                    delay = TICKER_INDEX_RETRY
+            else:
+                delay = self.refresh_seconds - (time() - self.updated_at)
+            await asyncio.sleep(delay)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+TICKERS = TickerIndex()
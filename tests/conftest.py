@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# Keep the suite away from the bot's data directory: no response store, candles, the ticker
+# index and session snapshots in a throwaway directory. Set before the modules read them at import.
+_DATA_DIR = tempfile.mkdtemp(prefix="stock-bot-tests-")
+os.environ.setdefault("RESPONSE_STORE", "0")
+os.environ.setdefault("CANDLE_STORE_DIR", os.path.join(_DATA_DIR, "candles"))
+os.environ.setdefault("TICKER_INDEX_PATH", os.path.join(_DATA_DIR, "tickers.tsv.gz"))
+os.environ.setdefault("SESSION_STORE_PATH", os.path.join(_DATA_DIR, "sessions.json"))
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from concurrency import AdmissionGate
+
+
+async def _holder(gate, release):
+    async with gate.admit():
+        await release.wait()
+
+
+def test_waiters_are_told_when_the_line_moves():
+    async def scenario():
+        gate = AdmissionGate(limit=1)
+        positions = {name: [] for name in "abc"}
+        admitted = []
+        releases = {name: asyncio.Event() for name in "abc"}
+
+        async def waiter(name):
+            async def on_queued(position):
+                positions[name].append(position)
+            async with gate.admit(on_queued):
+                admitted.append(name)
+                await releases[name].wait()
+
+        first = asyncio.Event()
+        holder = asyncio.create_task(_holder(gate, first))
+        await asyncio.sleep(0)
+        tasks = []
+        for name in "abc":
+            tasks.append(asyncio.create_task(waiter(name)))
+            await asyncio.sleep(0)
+        assert gate.waiting == 3
+        first.set()
+        await asyncio.sleep(0.01)
+        assert admitted == ["a"]
+        releases["a"].set()
+        await asyncio.sleep(0.01)
+        assert admitted == ["a", "b"]
+        releases["b"].set()
+        releases["c"].set()
+        await asyncio.gather(holder, *tasks)
+        return positions, admitted
+
+    positions, admitted = asyncio.run(scenario())
+    assert admitted == ["a", "b", "c"]
+    assert positions == {"a": [1], "b": [2, 1], "c": [3, 2, 1]}
+
+
+def test_a_cancelled_waiter_moves_the_line_and_frees_nothing():
+    async def scenario():
+        gate = AdmissionGate(limit=1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_holder(gate, release))
+        await asyncio.sleep(0)
+        positions = []
+
+        async def on_queued(position):
+            positions.append(position)
+
+        async def wait():
+            async with gate.admit(on_queued):
+                pass
+
+        dropped = asyncio.create_task(_holder(gate, asyncio.Event()))
+        await asyncio.sleep(0)
+        behind = asyncio.create_task(wait())
+        await asyncio.sleep(0)
+        dropped.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await dropped
+        await asyncio.sleep(0.01)
+        assert gate.waiting == 1 and gate.in_flight == 1
+        release.set()
+        await asyncio.gather(holder, behind)
+        return gate, positions
+
+    gate, positions = asyncio.run(scenario())
+    assert positions == [2, 1]
+    assert gate.in_flight == 0 and gate.waiting == 0
@@ -0,0 +1,25 @@
+import asyncio
+import threading
+
+import ai
+from ai import LLM_CACHE, astream_analysis, llm_cache_key, short_system_prompt
+
+
+def test_cached_answer_is_prepared_off_the_event_loop(monkeypatch):
+    data = {"symbol": "AMD", "price": {"c": 150.0, "dp": 1.2}, "news": [{"headline": "Chip maker beats estimates"}]}
+    # cached under the key of the compacted payload, as astream_analysis looks it up
+    LLM_CACHE.put(llm_cache_key(ai.compact_for_prompt(data, short_system_prompt), short_system_prompt), "Rating: 7/10")
+    threads = []
+    compact = ai.compact_for_prompt
+
+    def recording_compact(user_input, system_prompt):
+        threads.append(threading.current_thread())
+        return compact(user_input, system_prompt)
+
+    monkeypatch.setattr(ai, "compact_for_prompt", recording_compact)
+
+    async def collect():
+        return [text async for text in astream_analysis(data, short_system_prompt)]
+
+    assert asyncio.run(collect()) == ["Rating: 7/10"]
+    assert threads and threading.main_thread() not in threads
@@ -0,0 +1,50 @@
+from ai import parse_batch_ratings
+
+
+def test_json_array_answer():
+    text = """Here you go:
+```json
+[
+  {"symbol": "AMD", "rating": 4, "reason": "Strong data center demand 🚀"},
+  {"symbol": "nvda", "rating": "5", "reason": " Record guidance "},
+  {"symbol": "XYZ", "rating": 3, "reason": "not requested"}
+]
+```"""
+    assert parse_batch_ratings(text, ["AMD", "NVDA"]) == {
+        "AMD": {"rating": 4, "reason": "Strong data center demand 🚀"},
+        "NVDA": {"rating": 5, "reason": "Record guidance"},
+    }
+
+
+def test_zero_or_unreadable_rating_means_no_rating():
+    text = '[{"symbol": "AMD", "rating": 0, "reason": "not enough data"}, {"symbol": "INTC", "rating": "n/a"}]'
+    assert parse_batch_ratings(text, ["AMD", "INTC"]) == {
+        "AMD": {"rating": None, "reason": "not enough data"},
+        "INTC": {"rating": None, "reason": ""},
+    }
+
+
+def test_line_fallback_when_the_model_ignores_the_format():
+    text = """**AMD**: 4/5 – solid earnings momentum
+- NVDA - rating: 5 AI demand keeps growing
+• BRK.B: 3 steady
+TSLA: 2 not requested"""
+    assert parse_batch_ratings(text, ["AMD", "NVDA", "BRK.B"]) == {
+        "AMD": {"rating": 4, "reason": "solid earnings momentum"},
+        "NVDA": {"rating": 5, "reason": "AI demand keeps growing"},
+        "BRK.B": {"rating": 3, "reason": "steady"},
+    }
+
+
+def test_broken_json_falls_back_to_lines():
+    text = '[{"symbol": "AMD", "rating": 4, "reason": "cut off\nAMD: 4 cut off'
+    assert parse_batch_ratings(text, ["AMD"]) == {"AMD": {"rating": 4, "reason": "cut off"}}
+
+
+def test_missing_symbols_and_empty_answers():
+    assert parse_batch_ratings('[{"symbol": "AMD", "rating": 4, "reason": "ok"}]', ["AMD", "NVDA"]) == {
+        "AMD": {"rating": 4, "reason": "ok"},
+    }
+    assert parse_batch_ratings("", ["AMD"]) == {}
+    assert parse_batch_ratings(None, ["AMD"]) == {}
+    assert parse_batch_ratings('{"symbol": "AMD"}', ["AMD"]) == {}
@@ -0,0 +1,57 @@
+import pytest
+
+import bot
+
+
+class FakeApp:
+    def __init__(self):
+        self.calls = []
+
+    def run_webhook(self, **kwargs):
+        self.calls.append(("webhook", kwargs))
+
+    def run_polling(self, **kwargs):
+        self.calls.append(("polling", kwargs))
+
+
+def test_polling_mode(monkeypatch):
+    monkeypatch.setattr(bot, "BOT_MODE", "polling")
+    app = FakeApp()
+    bot.run(app)
+    assert app.calls == [("polling", {"allowed_updates": bot.ALLOWED_UPDATES, "bootstrap_retries": 3})]
+
+
+def test_webhook_mode_registers_the_public_url_with_a_secret(monkeypatch):
+    monkeypatch.setattr(bot, "BOT_MODE", "webhook")
+    monkeypatch.setattr(bot, "WEBHOOK_URL", "https://bot.example.com/")
+    monkeypatch.setattr(bot, "WEBHOOK_PATH", "telegram")
+    monkeypatch.setattr(bot, "WEBHOOK_SECRET", "")
+    app = FakeApp()
+    bot.run(app)
+    (mode, kwargs), = app.calls
+    assert mode == "webhook"
+    assert kwargs["webhook_url"] == "https://bot.example.com/telegram"
+    assert kwargs["url_path"] == "telegram"
+    assert kwargs["listen"] == bot.WEBHOOK_LISTEN and kwargs["port"] == bot.WEBHOOK_PORT
+    # a random secret per start when none is configured
+    assert len(kwargs["secret_token"]) >= 32
+    assert kwargs["allowed_updates"] == bot.ALLOWED_UPDATES
+
+
+def test_webhook_mode_needs_a_url_and_a_valid_secret(monkeypatch):
+    monkeypatch.setattr(bot, "BOT_MODE", "webhook")
+    monkeypatch.setattr(bot, "WEBHOOK_URL", "")
+    with pytest.raises(ValueError, match="WEBHOOK_URL"):
+        bot.run(FakeApp())
+    monkeypatch.setattr(bot, "WEBHOOK_URL", "https://bot.example.com")
+    monkeypatch.setattr(bot, "WEBHOOK_SECRET", "not a valid secret!")
+    with pytest.raises(ValueError, match="WEBHOOK_SECRET"):
+        bot.run(FakeApp())
+
+
+def test_unknown_mode_is_rejected(monkeypatch):
+    monkeypatch.setattr(bot, "BOT_MODE", "webhooks")
+    app = FakeApp()
+    with pytest.raises(ValueError, match="Unknown BOT_MODE"):
+        bot.run(app)
+    assert app.calls == []
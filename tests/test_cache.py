@@ -0,0 +1,129 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import cache
+from cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, "monotonic", lambda: now[0])
+    return now
+
+
+def counting(value="v"):
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return value
+    return fetch, calls
+
+
+def test_fresh_entry_is_served_from_memory(clock):
+    c = TTLCache("t", ttls={"quote": 10})
+    fetch, calls = counting()
+    assert c.get_or_fetch(("quote", "AMD"), fetch) == "v"
+    clock[0] += 9
+    assert c.get_or_fetch(("quote", "AMD"), fetch) == "v"
+    assert len(calls) == 1
+    assert c.stats()["hits"] == 1
+
+
+def test_expired_entry_is_fetched_again(clock):
+    c = TTLCache("t", ttls={"quote": 10}, stale={"quote": 0})
+    fetch, calls = counting()
+    c.get_or_fetch(("quote", "AMD"), fetch)
+    clock[0] += 11
+    c.get_or_fetch(("quote", "AMD"), fetch)
+    assert len(calls) == 2
+
+
+def test_ttl_is_per_kind(clock):
+    c = TTLCache("t", ttls={"quote": 10, "insider": 100}, stale={"quote": 0, "insider": 0})
+    fetch, calls = counting()
+    c.get_or_fetch(("quote", "AMD"), fetch)
+    c.get_or_fetch(("insider", "AMD"), fetch)
+    clock[0] += 50
+    c.get_or_fetch(("quote", "AMD"), fetch)
+    c.get_or_fetch(("insider", "AMD"), fetch)
+    assert len(calls) == 3
+
+
+def test_stale_entry_is_served_while_one_refresh_runs(clock, monkeypatch):
+    c = TTLCache("t", ttls={"quote": 10}, stale={"quote": 10})
+    c.get_or_fetch(("quote", "AMD"), lambda: "old")
+    clock[0] += 15
+    refreshes = []
+    # run the background refresh inline, after the stale value was handed out
+    monkeypatch.setattr(cache._REFRESH_POOL, "submit", lambda fn, *args: refreshes.append((fn, args)))
+    assert c.get_or_fetch(("quote", "AMD"), lambda: "new") == "old"
+    assert c.get_or_fetch(("quote", "AMD"), lambda: "newer") == "old"
+    assert len(refreshes) == 1
+    fn, args = refreshes[0]
+    fn(*args)
+    assert c.get_or_fetch(("quote", "AMD"), lambda: "unused") == "new"
+
+
+def test_concurrent_misses_share_one_fetch():
+    c = TTLCache("t", ttls={"quote": 10})
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return 42
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(c.get_or_fetch, ("quote", "AMD"), fetch) for _ in range(8)]
+        # every caller is either the owner or waiting on its future before the fetch returns
+        while c.stats()["misses"] < 8:
+            threading.Event().wait(0.01)
+        release.set()
+        results = [f.result(timeout=5) for f in futures]
+    assert results == [42] * 8
+    assert len(calls) == 1
+
+
+def test_failed_fetch_reaches_every_waiter_and_is_not_cached():
+    c = TTLCache("t", ttls={"quote": 10})
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise RuntimeError("finnhub down")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(c.get_or_fetch, ("quote", "AMD"), failing) for _ in range(4)]
+        while c.stats()["misses"] < 4:
+            threading.Event().wait(0.01)
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError, match="finnhub down"):
+                future.result(timeout=5)
+    assert c.get_or_fetch(("quote", "AMD"), lambda: "recovered") == "recovered"
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    c = TTLCache("t", ttls={"quote": 10}, maxsize=2)
+    fetch, calls = counting()
+    c.get_or_fetch(("quote", "A"), fetch)
+    c.get_or_fetch(("quote", "B"), fetch)
+    c.get_or_fetch(("quote", "A"), fetch)   # A is now the most recently used
+    c.get_or_fetch(("quote", "C"), fetch)   # evicts B
+    assert c.peek(("quote", "A")) == "v"
+    assert c.peek(("quote", "B")) is None
+    assert c.stats()["evictions"] == 1
+    assert len(calls) == 3
+
+
+def test_peek_ignores_expired_entries(clock):
+    c = TTLCache("t", ttls={"quote": 10})
+    c.put(("quote", "AMD"), 1)
+    assert c.peek(("quote", "AMD")) == 1
+    clock[0] += 11
+    assert c.peek(("quote", "AMD")) is None
@@ -0,0 +1,100 @@
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import fetch_yfinance
+from candle_store import CANDLE_DTYPE, DAY, CandleStore, frame_to_candles
+from fetch_yfinance import SCAN_WINDOW_DAYS, plan_downloads
+
+STEP = 300
+
+
+def candles(start, count, close=100.0):
+    result = np.zeros(count, dtype=CANDLE_DTYPE)
+    result["ts"] = start + np.arange(count) * STEP
+    result["open"] = result["high"] = result["low"] = close
+    result["close"] = close + np.arange(count)
+    result["volume"] = 1000
+    return result
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CandleStore(str(tmp_path))
+
+
+def test_append_keeps_only_newer_candles_and_replaces_the_forming_one(store):
+    assert store.append("AMD", candles(1_000_000, 5)) == 5
+    # overlaps the last two stored candles; the last stored one was still forming
+    update = candles(1_000_000 + 3 * STEP, 4, close=200.0)
+    assert store.append("AMD", update) == 2
+    stored = store.load("AMD")
+    assert list(stored["ts"]) == [1_000_000 + i * STEP for i in range(7)]
+    assert list(stored["close"][:3]) == [100.0, 101.0, 102.0]
+    assert list(stored["close"][3:]) == [200.0, 201.0, 202.0, 203.0]
+    assert store.last_timestamp("AMD") == 1_000_000 + 6 * STEP
+
+
+def test_append_nothing_or_older_candles(store):
+    store.append("AMD", candles(1_000_000, 3))
+    assert store.append("AMD", candles(0, 0)) == 0
+    assert len(store.load("AMD")) == 3
+
+
+def test_retention_drops_old_candles(tmp_path):
+    store = CandleStore(str(tmp_path), retention=10 * STEP)
+    store.append("AMD", candles(1_000_000, 5))
+    store.append("AMD", candles(1_000_000 + 20 * STEP, 3))
+    assert store.load("AMD")["ts"][0] >= 1_000_000 + 12 * STEP
+
+
+def test_candles_survive_a_restart_memory_mapped(store):
+    store.append("BRK/B", candles(1_000_000, 4))
+    reopened = CandleStore(store.directory)
+    loaded = reopened.load("brk/b")
+    assert isinstance(loaded, np.memmap)
+    assert list(loaded["ts"]) == list(candles(1_000_000, 4)["ts"])
+    assert len(reopened.window("BRK/B", STEP)) == 2
+
+
+def test_corrupt_or_missing_files_read_as_empty(store):
+    with open(store._path("BAD"), "wb") as f:
+        f.write(b"not numpy")
+    assert len(store.load("BAD")) == 0
+    assert store.last_timestamp("NONE") is None
+
+
+def test_frame_to_candles_drops_incomplete_rows():
+    index = pd.date_range("2026-10-15 13:30", periods=3, freq="5min", tz="UTC")
+    frame = pd.DataFrame({
+        "Open": [1.0, np.nan, 3.0], "High": [1.5, 2.5, 3.5], "Low": [0.5, 1.5, 2.5],
+        "Close": [1.2, 2.2, 3.2], "Volume": [100, 200, np.nan],
+    }, index=index.tz_convert("America/New_York"))
+    result = frame_to_candles(frame)
+    assert list(result["ts"]) == [int(index[0].timestamp()), int(index[2].timestamp())]
+    assert list(result["volume"]) == [100.0, 0.0]
+
+
+def test_plan_downloads_only_fetches_missing_ranges(store, monkeypatch):
+    monkeypatch.setattr(fetch_yfinance, "BATCH_SIZE", 2)
+    now = int(time.time())
+    store.append("AMD", candles(now - 3 * DAY, 3))
+    store.append("NVDA", candles(now - DAY, 3))
+    store.append("TSLA", candles(now - 2 * DAY, 3))
+    store.append("OLD", candles(now - (SCAN_WINDOW_DAYS + 2) * DAY, 3))
+    plan = plan_downloads(["AMD", "NEW", "NVDA", "OLD", "TSLA"], store)
+    full = [(batch, window) for batch, window in plan if "period" in window]
+    incremental = [(batch, window) for batch, window in plan if "start" in window]
+    assert full == [(["NEW", "OLD"], {"period": f"{SCAN_WINDOW_DAYS}d"})]
+    # oldest last candle first, one start per batch: the batch's oldest last candle (re-fetched)
+    assert [batch for batch, _ in incremental] == [["AMD", "TSLA"], ["NVDA"]]
+    assert incremental[0][1]["start"] == datetime.fromtimestamp(store.last_timestamp("AMD"), tz=timezone.utc)
+    assert incremental[1][1]["start"] == datetime.fromtimestamp(store.last_timestamp("NVDA"), tz=timezone.utc)
+
+
+def test_plan_downloads_with_nothing_stored(store):
+    assert plan_downloads(["AMD"], store) == [(["AMD"], {"period": f"{SCAN_WINDOW_DAYS}d"})]
+    assert plan_downloads([], store) == []
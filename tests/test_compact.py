@@ -0,0 +1,125 @@
+from compact import (
+    DEEP_TOKEN_BUDGET,
+    NEWS_LIMITS,
+    SHORT_TOKEN_BUDGET,
+    TRIM_ORDER,
+    compact_batch,
+    compact_news,
+    compact_payload,
+    encode,
+    estimate_tokens,
+)
+
+
+def news(count, prefix="Story", summary_words=60):
+    return [
+        {
+            "headline": f"{prefix} {i} about chips, {'abcdefghij'[i % 10]} edition number {i * 7}",
+            "summary": " ".join(f"word{j}" for j in range(summary_words)),
+            "datetime": 1_760_000_000 + i * 3600,
+            "image": "https://example.com/image.png",
+            "url": "https://example.com/story",
+            "source": "Wire",
+            "id": i,
+        }
+        for i in range(count)
+    ]
+
+
+def payload(news_count=20):
+    quote = {"c": 101.5, "d": 1.2, "dp": 1.19, "h": 102, "l": 99, "o": 100, "pc": 100.3, "t": 1_760_000_000}
+    insider = {"data": [{"year": 2025, "month": m, "change": m * 10, "mspr": -5.5, "symbol": "AMD"} for m in range(1, 13)]}
+    return {
+        "symbol": "AMD",
+        "price": quote,
+        "news": news(news_count),
+        "insider_sentiment": insider,
+        "date_range": {"from": "2025-10-01", "to": "2025-10-15"},
+        "Market": dict(quote),
+        "Market news": news(news_count, "Market"),
+        "insider_market": insider,
+        "General_market_news": news(news_count, "General"),
+        "Market_fear_and_greed": "Fear and Greed Index: Greed",
+    }
+
+
+def test_payload_fits_the_budget_and_keeps_the_prompt_fields():
+    data = payload()
+    for budget in (SHORT_TOKEN_BUDGET, DEEP_TOKEN_BUDGET):
+        compacted, stats = compact_payload(data, budget)
+        assert stats["tokens_before"] > budget
+        assert stats["tokens_after"] <= budget
+        assert stats["tokens_after"] == estimate_tokens(encode(compacted))
+        assert compacted["price"] == {k: data["price"][k] for k in ("c", "d", "dp", "h", "l", "o", "pc")}
+        assert compacted["Market_fear_and_greed"] == data["Market_fear_and_greed"]
+        assert "date_range" not in compacted
+
+
+def test_news_sections_are_trimmed_in_order():
+    # a tight budget: shorter summaries alone are not enough
+    compacted, stats = compact_payload(payload(), 700)
+    assert stats["tokens_after"] <= 700
+    counts = [len(compacted[section]) for section in TRIM_ORDER]
+    full = [NEWS_LIMITS[section] for section in TRIM_ORDER]
+    assert counts != full
+    trimmed = next(i for i, count in enumerate(counts) if count)
+    # sections before the one being trimmed are empty, the ones after it untouched
+    assert counts[trimmed + 1:] == full[trimmed + 1:]
+    assert compacted["news"]
+
+
+def test_small_payload_is_only_reduced_to_the_used_fields():
+    data = payload(news_count=2)
+    compacted, stats = compact_payload(data, 10_000)
+    assert [item["headline"] for item in compacted["news"]] == [item["headline"] for item in data["news"]]
+    assert set(compacted["news"][0]) == {"headline", "date", "summary"}
+    assert compacted["insider_sentiment"][-1] == {"year": 2025, "month": 12, "change": 120, "mspr": -5.5}
+    assert len(compacted["insider_sentiment"]) == 6
+    assert stats["tokens_after"] < stats["tokens_before"]
+
+
+def test_partial_markers_are_kept():
+    data = payload(news_count=1)
+    data.update(partial=True, missing={"news": "timed out after 8s"})
+    compacted, _ = compact_payload(data, SHORT_TOKEN_BUDGET)
+    assert compacted["partial"] is True
+    assert compacted["missing"] == {"news": "timed out after 8s"}
+
+
+def test_non_dict_payload_is_returned_unchanged():
+    message = "Sorry, no stock with the name provided have found"
+    compacted, stats = compact_payload(message, SHORT_TOKEN_BUDGET)
+    assert compacted == message
+    assert stats["tokens_before"] == stats["tokens_after"]
+
+
+def test_near_duplicate_headlines_are_dropped():
+    items = [
+        {"headline": "AMD shares jump after strong data center earnings"},
+        {"headline": "AMD shares jump after strong data-center earnings!"},
+        {"headline": "Nvidia unveils new GPU"},
+    ]
+    assert [item["headline"] for item in compact_news(items, 10)] == [
+        "AMD shares jump after strong data center earnings",
+        "Nvidia unveils new GPU",
+    ]
+
+
+def test_batch_sends_the_market_context_once():
+    data = payload()
+    market = {key: data[key] for key in ("Market", "Market news", "insider_market", "General_market_news", "Market_fear_and_greed")}
+    symbols = {"AMD": {"price": data["price"], "news": data["news"], "insider_sentiment": data["insider_sentiment"]}}
+    batch = compact_batch(market, symbols)
+    assert set(batch) == {"market", "stocks"}
+    assert set(batch["stocks"]["AMD"]) == {"price", "news", "insider_sentiment"}
+    assert len(batch["stocks"]["AMD"]["news"]) == 3
+
+
+def test_indicator_summaries_are_kept():
+    summary = {"as_of": "2025-10-15 19:55 UTC", "rsi_14": 61.2}
+    data = payload(news_count=1)
+    data["indicators"] = summary
+    compacted, _ = compact_payload(data, SHORT_TOKEN_BUDGET)
+    assert compacted["indicators"] == summary
+    batch = compact_batch({}, {"AMD": {"price": data["price"], "indicators": summary}})
+    assert batch["stocks"]["AMD"]["indicators"] == summary
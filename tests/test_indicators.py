@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+import indicators
+import candle_store
+from candle_store import CANDLE_DTYPE, CANDLES_PER_SESSION, DAY, CandleStore, candle_matrix
+
+SESSION_OPEN = 1_760_016_600  # 2025-10-09 13:30 UTC
+STEP = 300
+
+
+def sessions(closes_per_day, volume=1000.0):
+    days = []
+    for day, closes in enumerate(closes_per_day):
+        closes = np.asarray(closes, dtype=float)
+        candles = np.zeros(len(closes), dtype=CANDLE_DTYPE)
+        candles["ts"] = SESSION_OPEN + day * DAY + np.arange(len(closes)) * STEP
+        candles["open"] = candles["close"] = closes
+        candles["high"] = closes + 0.5
+        candles["low"] = closes - 0.5
+        candles["volume"] = volume
+        days.append(candles)
+    return np.concatenate(days)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CandleStore(str(tmp_path))
+
+
+def test_indicators_for_a_steady_uptrend(store):
+    closes = 100 + np.arange(6 * CANDLES_PER_SESSION) * 0.01
+    candles = sessions(np.split(closes, 6))
+    candles["volume"][-1] = 5000.0
+    candles["volume"][-CANDLES_PER_SESSION - 1:-1:2] = 2000.0
+    store.append("UP", candles)
+    values = indicators.compute_indicators(candle_matrix(["UP"], store, indicators.LOOKBACK_SECONDS))
+    last = closes[-1]
+    assert values["return_1h"][0] == pytest.approx((last / closes[-13] - 1) * 100)
+    assert values["return_5d"][0] == pytest.approx((last / closes[-1 - 5 * CANDLES_PER_SESSION] - 1) * 100)
+    assert values["sma_fast"][0] > values["sma_slow"][0]
+    assert values["ema_fast"][0] > values["ema_slow"][0]
+    assert values["rsi"][0] == 100.0
+    # high - low is 1.0 on every candle and dominates the gaps between closes
+    assert values["atr_pct"][0] == pytest.approx(1.0 / last * 100)
+    assert values["from_high_pct"][0] == pytest.approx((last / (last + 0.5) - 1) * 100)
+    assert values["from_low_pct"][0] > 0
+    assert values["volume_z"][0] > 2
+
+
+def test_a_short_history_is_nan_not_wrong(store):
+    store.append("LONG", sessions(np.split(100 + np.arange(2 * CANDLES_PER_SESSION) * 0.01, 2)))
+    store.append("NEW", sessions([[50.0, 50.5, 51.0]])[-3:])
+    values = indicators.compute_indicators(candle_matrix(["LONG", "NEW"], store, indicators.LOOKBACK_SECONDS))
+    assert np.isfinite(values["sma_slow"][0]) and np.isnan(values["sma_slow"][1])
+    assert np.isnan(values["rsi"][1]) and np.isnan(values["return_1d"][1])
+    assert values["close"][1] == 51.0
+
+
+def test_sma_cross_on_the_newest_candle(store):
+    closes = np.r_[np.full(60, 100.0), np.full(8, 90.0), [200.0]]
+    store.append("X", sessions([closes]))
+    values = indicators.compute_indicators(candle_matrix(["X"], store, indicators.LOOKBACK_SECONDS))
+    assert values["sma_cross"][0] == 1
+
+
+def test_ema_matches_the_recursion_across_blocks():
+    rng = np.random.default_rng(7)
+    values = 100 + rng.standard_normal((3, 3 * indicators.EMA_BLOCK + 5)).cumsum(axis=1)
+    values[1, :100] = np.nan  # a shorter history starts later
+    values[2] = np.nan
+    alpha = 2 / (12 + 1)
+    expected = np.full(values.shape, np.nan)
+    for row in range(2):
+        current = np.nan
+        for column, value in enumerate(values[row]):
+            current = value if np.isnan(current) else current + alpha * (value - current)
+            expected[row, column] = current
+    np.testing.assert_allclose(indicators._ema(values, 12), expected, rtol=1e-10)
+
+
+def test_indicators_read_the_scanner_store():
+    assert indicators.summarize.__defaults__[0] is candle_store.CANDLES
+
+
+def test_summary_is_compact_and_skips_missing_and_stale(store):
+    store.append("UP", sessions(np.split(100 + np.arange(2 * CANDLES_PER_SESSION) * 0.01, 2)))
+    store.append("OLD", sessions([[10.0, 11.0]]))
+    newest = SESSION_OPEN + DAY + (CANDLES_PER_SESSION - 1) * STEP
+    summaries = indicators.summarize(["up", "OLD", "NONE"], store, now=newest + 60)
+    assert set(summaries) == {"UP", "OLD"}
+    up = summaries["UP"]
+    assert up["as_of"].endswith("UTC") and up["interval"] == "5m"
+    assert set(up["return_pct"]) == {"1h", "1d"}  # no 5-day history yet
+    assert up["sma_20_50"]["fast_above_slow"] is True
+    assert "rsi_14" in up and "from_10d_high_pct" in up
+    # two candles are too few for most indicators; those are left out rather than sent as null
+    assert "rsi_14" not in summaries["OLD"] and None not in summaries["OLD"].values()
+    assert indicators.summarize(["UP"], store, now=newest + indicators.MAX_AGE_SECONDS + 1) == {}
@@ -0,0 +1,66 @@
+import asyncio
+
+from concurrency import InflightRegistry
+
+
+def test_identical_requests_share_one_run():
+    async def scenario():
+        registry = InflightRegistry()
+        release = asyncio.Event()
+        runs = []
+
+        async def rate(symbol):
+            runs.append(symbol)
+            await release.wait()
+            return f"{symbol} 7/10"
+
+        callers = [asyncio.create_task(registry.run(("AMD", "short"), lambda: rate("AMD"))) for _ in range(3)]
+        other = asyncio.create_task(registry.run(("AMD", "deep"), lambda: rate("AMD deep")))
+        await asyncio.sleep(0.01)
+        in_flight = registry.stats()["in_flight"]
+        release.set()
+        return await asyncio.gather(*callers, other), runs, in_flight, registry.stats()
+
+    results, runs, in_flight, stats = asyncio.run(scenario())
+    assert results == ["AMD 7/10"] * 3 + ["AMD deep 7/10"]
+    assert runs == ["AMD", "AMD deep"]
+    assert in_flight == 2
+    assert stats == {"in_flight": 0, "started": 2, "attached": 2, "attached_by_kind": {"short": 2}}
+
+
+def test_a_caller_leaving_does_not_cancel_the_shared_run():
+    async def scenario():
+        registry = InflightRegistry()
+        release = asyncio.Event()
+
+        async def rate():
+            await release.wait()
+            return "done"
+
+        first = asyncio.create_task(registry.run("AMD", rate))
+        second = asyncio.create_task(registry.run("AMD", rate))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        release.set()
+        return await second, first
+
+    result, first = asyncio.run(scenario())
+    assert result == "done" and first.cancelled()
+
+
+def test_a_failure_reaches_every_caller_and_is_not_kept():
+    async def scenario():
+        registry = InflightRegistry()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("LLM down")
+
+        results = await asyncio.gather(registry.run("AMD", fail), registry.run("AMD", fail), return_exceptions=True)
+        # the next request starts a new run
+        retried = await registry.run("AMD", lambda: asyncio.sleep(0, result="ok"))
+        return results, retried
+
+    results, retried = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert retried == "ok"
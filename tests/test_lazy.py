@@ -0,0 +1,45 @@
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+
+import lazy
+from lazy import lazy_import, warm_up
+
+HEAVY_MODULES = ("langchain_nvidia_ai_endpoints", "langchain_core", "fear_and_greed")
+
+
+@pytest.fixture
+def probe(tmp_path, monkeypatch):
+    monkeypatch.setattr(lazy, "_LAZY_MODULES", [])
+    monkeypatch.syspath_prepend(str(tmp_path))
+    (tmp_path / "lazy_probe.py").write_text("VALUE = 42\n")
+    yield "lazy_probe"
+    sys.modules.pop("lazy_probe", None)
+
+
+def test_import_is_deferred_until_first_use(probe):
+    module = lazy_import(probe)
+    assert not module.loaded and probe not in sys.modules
+    assert module.VALUE == 42
+    assert module.loaded and sys.modules[probe] is module.load()
+
+
+def test_warm_up_imports_pending_modules_and_reports_failures(probe, caplog):
+    module = lazy_import(probe)
+    lazy_import("lazy_probe_missing")
+    with caplog.at_level(logging.WARNING, logger="stock_bot.lazy"):
+        warm_up()
+    assert module.loaded
+    assert "Background import of lazy_probe_missing failed" in caplog.text
+
+
+def test_importing_the_bot_leaves_the_heavy_modules_for_later():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([os.path.join(root, "src", "tools"), os.path.join(root, "src")])}
+    code = f"import sys, bot; print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,44 @@
+import ai
+from ai import llm_cache_key, short_system_prompt
+
+
+def payload(c=150.0, dp=1.2, t=1700000000, date_to="2026-10-16", news="Chip maker beats estimates"):
+    return {
+        "symbol": "AMD",
+        "price": {"c": c, "d": round(c * dp / 100, 2), "dp": dp, "h": c + 1, "l": c - 1, "o": c - 0.5, "pc": 148.2, "t": t},
+        "news": [{"headline": news}],
+        "Market": {"c": 580.1, "d": 1.0, "dp": 0.17, "h": 581, "l": 578, "o": 579, "pc": 579.1, "t": t},
+        "date_range": {"from": "2026-07-18", "to": date_to},
+    }
+
+
+def key(data):
+    return llm_cache_key(data, short_system_prompt)
+
+
+def test_price_ticks_and_fetch_times_share_a_key():
+    base = key(payload())
+    assert key(payload(c=150.01, dp=1.21)) == base
+    assert key(payload(t=1700000030)) == base
+    assert key(payload(date_to="2026-10-17")) == base
+
+
+def test_material_changes_make_a_new_key():
+    base = key(payload())
+    assert key(payload(c=156.0, dp=5.3)) != base
+    assert key(payload(news="Chip maker misses estimates")) != base
+    assert llm_cache_key(payload(), ai.system_prompt) != base
+
+
+def test_other_floats_are_only_rounded():
+    assert ai.normalize_payload({"x": 1.234}) == {"x": 1.23}
+
+
+def test_payloads_with_a_partial_symbol_are_not_cached():
+    assert ai.is_cacheable(payload())
+    assert not ai.is_cacheable({**payload(), "partial": True})
+    complete = {"price": {"c": 10.0}, "news": []}
+    batch = {"market": {"Market": {"c": 580.1}}, "stocks": {"AMD": complete, "NVDA": complete}}
+    assert ai.is_cacheable(batch)
+    batch["stocks"]["NVDA"] = {**complete, "partial": True, "missing": {"news": "timeout"}}
+    assert not ai.is_cacheable(batch)
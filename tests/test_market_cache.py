@@ -0,0 +1,67 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+import cache
+from finhub_api import MARKET_CACHE, get_market_news, get_market_quote
+
+
+class FakeClient:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def quote(self, symbol):
+        with self._lock:
+            self.calls.append(("quote", symbol))
+        time.sleep(self.delay)
+        return {"c": 580.0 + len(self.calls)}
+
+    def company_news(self, symbol, _from=None, to=None):
+        with self._lock:
+            self.calls.append(("company_news", symbol))
+        return [{"headline": "Markets rally"}]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, "monotonic", lambda: now[0])
+    MARKET_CACHE.invalidate()
+    yield now
+    MARKET_CACHE.invalidate()
+
+
+def test_market_context_is_shared_until_its_ttl(clock, monkeypatch):
+    client = FakeClient()
+    first = get_market_quote(client)
+    news = get_market_news(client, date(2026, 10, 1), date(2026, 10, 15))
+    # other requests (any ticker) within the TTL reuse both
+    clock[0] += 29
+    assert get_market_quote(client) == first
+    assert get_market_news(client, date(2026, 10, 1), date(2026, 10, 15)) == news
+    assert len(client.calls) == 2
+    # the SPY quote expires after 30 s and is served stale while one refresh runs
+    refreshes = []
+    monkeypatch.setattr(cache._REFRESH_POOL, "submit", lambda fn, *args: refreshes.append((fn, args)))
+    clock[0] += 2
+    assert get_market_quote(client) == first
+    fn, args = refreshes.pop()
+    fn(*args)
+    assert get_market_quote(client) != first
+    # SPY news only expires after 10 minutes
+    get_market_news(client, date(2026, 10, 1), date(2026, 10, 15))
+    assert refreshes == []
+    assert client.calls == [("quote", "SPY"), ("company_news", "SPY"), ("quote", "SPY")]
+
+
+def test_concurrent_requests_fetch_the_market_quote_once(clock):
+    client = FakeClient(delay=0.1)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        quotes = list(pool.map(lambda _: get_market_quote(client), range(8)))
+    assert len(client.calls) == 1
+    assert all(quote == quotes[0] for quote in quotes)
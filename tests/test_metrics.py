@@ -0,0 +1,120 @@
+import asyncio
+import json
+import logging
+import re
+
+import bot
+import finhub_api
+import metrics
+from finhub_api import MARKET_CACHE
+from metrics import METRICS, Metrics, request_trace, span, start_metrics_server
+
+# name{labels} value, per the Prometheus text exposition format
+SAMPLE = re.compile(r'^stock_bot_[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? [0-9.e+-]+$')
+
+
+def test_prometheus_text_format():
+    registry = Metrics()
+    for value in (0.003, 0.2, 0.2, 45):
+        registry.observe("llm_seconds", value, kind="rating")
+    registry.observe("llm_seconds", 0.04, kind="chat")
+    registry.increment("cache_hits", 2, cache="symbol")
+    registry.gauge("queued", lambda: 3)
+    registry.gauge("broken", lambda: 1 / 0)
+
+    lines = registry.render_prometheus().splitlines()
+    assert lines.count("# TYPE stock_bot_llm_seconds histogram") == 1
+    assert "# TYPE stock_bot_cache_hits_total counter" in lines
+    assert "# TYPE stock_bot_queued gauge" in lines
+    assert all(SAMPLE.match(line) for line in lines if not line.startswith("#")), lines
+    # buckets are cumulative and +Inf holds every sample
+    assert 'stock_bot_llm_seconds_bucket{kind="rating",le="0.005"} 1' in lines
+    assert 'stock_bot_llm_seconds_bucket{kind="rating",le="0.25"} 3' in lines
+    assert 'stock_bot_llm_seconds_bucket{kind="rating",le="60"} 4' in lines
+    assert 'stock_bot_llm_seconds_bucket{kind="rating",le="+Inf"} 4' in lines
+    assert 'stock_bot_llm_seconds_count{kind="rating"} 4' in lines
+    assert 'stock_bot_cache_hits_total{cache="symbol"} 2' in lines
+    assert "stock_bot_queued 3" in lines
+    # a failing gauge is left out rather than breaking the scrape
+    assert not any("broken" in line for line in lines)
+
+
+def test_prometheus_endpoint_serves_the_registry():
+    async def scrape():
+        # port 0 means disabled, so bind an ephemeral port with the same handler
+        assert await start_metrics_server(port=0) is None
+        server = await asyncio.start_server(metrics._handle_scrape, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            response = await reader.read()
+            writer.close()
+            return response.decode()
+
+    METRICS.increment("scrape_test")
+    response = asyncio.run(scrape())
+    head, body = response.split("\r\n\r\n", 1)
+    assert head.startswith("HTTP/1.1 200 OK")
+    assert "text/plain; version=0.0.4" in head
+    assert "stock_bot_scrape_test_total 1" in body.splitlines()
+
+
+def test_nested_spans_land_in_the_request_trace(caplog):
+    async def handle():
+        with request_trace("rating", symbol="AAPL") as trace:
+            with span("payload_seconds"):
+                with span("finnhub_request_seconds", endpoint="quote"):
+                    await asyncio.sleep(0.01)
+                # tasks and threads inherit the trace
+                await asyncio.gather(asyncio.to_thread(METRICS.observe, "thread_seconds", 0.5),
+                                     asyncio.create_task(asyncio.sleep(0)))
+            METRICS.increment("llm_cache_hits")
+        return trace
+
+    with caplog.at_level(logging.INFO, logger="stock_bot.trace"):
+        trace = asyncio.run(handle())
+    names = [s["span"] for s in trace.spans]
+    # inner spans close first
+    assert names == ["finnhub_request_seconds", "thread_seconds", "payload_seconds"]
+    inner, _, outer = trace.spans
+    assert inner["endpoint"] == "quote" and inner["ms"] >= 10
+    assert outer["ms"] >= inner["ms"]
+    logged = json.loads(caplog.records[-1].getMessage())
+    assert logged["request"] == "rating" and logged["symbol"] == "AAPL"
+    assert logged["llm_cache_hits"] == 1
+    assert logged["total_ms"] >= outer["ms"]
+    assert METRICS.snapshot()["histograms"][("request_seconds", (("request", "rating"),))]["count"] >= 1
+
+
+def test_spans_outside_a_request_only_feed_the_histograms():
+    before = METRICS.snapshot()["histograms"].get(("orphan_seconds", ()), {"count": 0})["count"]
+    with span("orphan_seconds"):
+        pass
+    assert METRICS.snapshot()["histograms"][("orphan_seconds", ())]["count"] == before + 1
+
+
+def test_fear_and_greed_fetch_is_timed(monkeypatch):
+    class Index:
+        description = "greed"
+
+    monkeypatch.setattr(finhub_api, "fear_and_greed", type("Module", (), {"get": staticmethod(Index)}))
+    MARKET_CACHE.invalidate(("fear_and_greed",))
+    with request_trace("market") as trace:
+        assert finhub_api.market_fear_and_greed() == "Fear and Greed Index: greed"
+        # the second call is a cache hit and is not timed again
+        finhub_api.market_fear_and_greed()
+    MARKET_CACHE.invalidate(("fear_and_greed",))
+    assert [s["span"] for s in trace.spans] == ["fear_and_greed_seconds"]
+
+
+def test_stats_message_is_one_escaped_pre_block():
+    METRICS.observe("llm_seconds", 1.5, kind="<rating>")
+    METRICS.increment("alerts_sent")
+    text = bot._format_stats({"rows": 3})
+    assert text.startswith("📈 Latency (ms)\n<pre>") and text.endswith("</pre>")
+    body = text[text.index("<pre>") + 5:-6]
+    assert "<" not in body and "&lt;rating&gt;" in body
+    assert "Stage" in body and "p95" in body
+    assert "alerts_sent: " in body
+    assert "response store: {'rows': 3}" in body
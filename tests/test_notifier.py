@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from time import monotonic
+
+import httpx
+
+import notifier as notifier_module
+from notifier import AlertNotifier, AlertStateStore, parse_chat_ids, retry_after_seconds
+
+
+def alert(symbol="AMD", level=100.0, kind="high", window="new_high_14d", min_step=None, message=None):
+    return {
+        "symbol": symbol, "window": window, "kind": kind, "level": level,
+        "min_step": min_step, "message": message or f"{symbol} {window} {level}",
+    }
+
+
+def store(tmp_path, **kwargs):
+    return AlertStateStore(str(tmp_path / "alerts.json"), cooldown=3600, min_step_pct=0.25, **kwargs)
+
+
+def test_repeat_is_suppressed_until_the_level_moves_further(tmp_path):
+    state = store(tmp_path)
+    state.record("AMD", "new_high_14d", "high", 100.0, now=0)
+    assert not state.should_alert("AMD", "new_high_14d", "high", 100.2, now=60)
+    assert state.should_alert("AMD", "new_high_14d", "high", 100.3, now=60)
+    assert state.should_alert("AMD", "new_high_14d", "high", 100.0, now=3600)
+    assert state.suppressed == 1
+
+
+def test_lows_must_move_lower(tmp_path):
+    state = store(tmp_path)
+    state.record("AMD", "new_low_14d", "low", 100.0, now=0)
+    assert not state.should_alert("AMD", "new_low_14d", "low", 101.0, now=60)
+    assert state.should_alert("AMD", "new_low_14d", "low", 99.0, now=60)
+
+
+def test_percent_and_z_levels_use_an_absolute_step(tmp_path):
+    state = store(tmp_path)
+    state.record("AMD", "move_up_since_open", "high", 4.0, now=0)
+    # +0.5% relative to 4.0 would pass the 0.25% step, but it is only 0.02 percentage points
+    assert not state.should_alert("AMD", "move_up_since_open", "high", 4.02, now=60, min_step=1.0)
+    assert state.should_alert("AMD", "move_up_since_open", "high", 5.1, now=60, min_step=1.0)
+
+
+def test_filter_does_not_record(tmp_path):
+    state = store(tmp_path)
+    alerts = [alert("AMD"), alert("NVDA")]
+    assert state.filter(alerts) == alerts
+    assert state.filter(alerts) == alerts
+    state.record_sent(alerts[:1])
+    assert state.filter(alerts) == alerts[1:]
+
+
+def test_state_survives_a_restart_without_expired_entries(tmp_path):
+    state = store(tmp_path)
+    state.record("AMD", "w", "high", 100.0)
+    state.record("OLD", "w", "high", 100.0, now=0)
+    state.save()
+    restored = store(tmp_path)
+    assert not restored.should_alert("AMD", "w", "high", 100.0)
+    assert restored.should_alert("OLD", "w", "high", 100.0)
+    assert "OLD|w|high" not in restored._state
+
+
+def test_parse_chat_ids():
+    assert parse_chat_ids("123, -100456,@channel,,") == [123, -100456, "@channel"]
+    assert parse_chat_ids(None) == []
+
+
+def send(alerts, handler, chat_ids=(1,)):
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with AlertNotifier(token="t", chat_ids=chat_ids, max_retries=0, transport=transport) as notifier:
+            return await notifier.send_alerts(alerts), notifier
+    return asyncio.run(run())
+
+
+def test_alerts_are_packed_and_only_delivered_ones_returned():
+    alerts = [alert("AMD", message="a" * 3000), alert("NVDA", message="b" * 3000), alert("INTC", message="c" * 10)]
+    texts = []
+
+    def handler(request):
+        text = httpx.QueryParams(request.content.decode())["text"]
+        texts.append(text)
+        return httpx.Response(400 if text.startswith("a") else 200, json={"ok": True})
+
+    delivered, notifier = send(alerts, handler)
+    # NVDA and INTC fit into one message; the AMD message was rejected
+    assert len(texts) == 2
+    assert [a["symbol"] for a in delivered] == ["NVDA", "INTC"]
+    assert (notifier.sent, notifier.failed) == (1, 1)
+
+
+def test_an_alert_counts_as_delivered_if_one_chat_got_it():
+    def handler(request):
+        chat_id = httpx.QueryParams(request.content.decode())["chat_id"]
+        return httpx.Response(200 if chat_id == "2" else 500, json={"ok": True})
+
+    delivered, _ = send([alert()], handler, chat_ids=(1, 2))
+    assert len(delivered) == 1
+
+
+def test_last_transport_error_gives_up_without_a_retry(monkeypatch, caplog):
+    monkeypatch.setattr(notifier_module, "ALERT_CHAT_RATE", 1000.0)
+
+    def handler(request):
+        raise httpx.ConnectError("connection refused")
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with AlertNotifier(token="t", chat_ids=(1,), max_retries=1, transport=transport) as notifier:
+            started = monotonic()
+            return await notifier._send(1, "hi"), notifier, monotonic() - started
+
+    with caplog.at_level(logging.WARNING, logger="stock_bot.notifier"):
+        sent, notifier, elapsed = asyncio.run(run())
+    assert sent is False and notifier.failed == 1
+    # one 0.5 s backoff between the two attempts, none after the last
+    assert 0.5 <= elapsed < 0.9
+    messages = [record.getMessage() for record in caplog.records]
+    assert [m for m in messages if "retry" in m] == ["Alert to 1 failed (connection refused), retry 1/1"]
+    assert messages[-1] == "Alert to 1 failed after 2 attempts: connection refused"
+
+
+def test_retry_after_falls_back_to_the_header_then_one_second():
+    assert retry_after_seconds(httpx.Response(429, json={"ok": False, "parameters": {"retry_after": 3}})) == 3.0
+    assert retry_after_seconds(httpx.Response(429, text="Too Many Requests", headers={"Retry-After": "2"})) == 2.0
+    assert retry_after_seconds(httpx.Response(429, json={"ok": False})) == 1.0
+    assert retry_after_seconds(httpx.Response(429, text="<html>busy</html>")) == 1.0
+
+
+def test_a_non_json_429_is_retried(monkeypatch):
+    monkeypatch.setattr(notifier_module, "ALERT_CHAT_RATE", 1000.0)
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        if len(calls) == 1:
+            return httpx.Response(429, text="Too Many Requests", headers={"Retry-After": "0.2"})
+        return httpx.Response(200, json={"ok": True})
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with AlertNotifier(token="t", chat_ids=(1,), max_retries=1, transport=transport) as notifier:
+            started = monotonic()
+            return await notifier._send(1, "hi"), monotonic() - started
+
+    sent, elapsed = asyncio.run(run())
+    assert sent is True and len(calls) == 2
+    assert elapsed >= 0.2
@@ -0,0 +1,233 @@
+import asyncio
+from time import monotonic
+
+import json
+
+import pytest
+from telegram.error import NetworkError, RetryAfter
+from telegram.ext import ExtBot
+from telegram.request import BaseRequest
+
+import outbound
+from metrics import METRICS
+from outbound import OutboundScheduler, TypingHeartbeat
+
+
+@pytest.fixture
+def fast(monkeypatch):
+    monkeypatch.setattr(outbound, "GLOBAL_RATE", 1000.0)
+    monkeypatch.setattr(outbound, "CHAT_RATE", 20.0)
+    monkeypatch.setattr(outbound, "CHAT_BURST", 1)
+    monkeypatch.setattr(outbound.random, "uniform", lambda low, high: 0.0)
+
+
+def post(scheduler, chat_id, endpoint="sendMessage", callback=None, retries=None):
+    async def ok():
+        return chat_id
+    rate_limit_args = None if retries is None else {"max_retries": retries}
+    return scheduler.process_request(callback or ok, (), {}, endpoint, {"chat_id": chat_id}, rate_limit_args)
+
+
+def test_per_chat_bucket_does_not_hold_up_other_chats(fast):
+    async def scenario():
+        scheduler = OutboundScheduler()
+        sent_at = {}
+
+        async def send(chat_id, n):
+            await post(scheduler, chat_id)
+            sent_at[(chat_id, n)] = monotonic()
+
+        started = monotonic()
+        await asyncio.gather(*(send(1, n) for n in range(4)), send(2, 0))
+        return {key: at - started for key, at in sent_at.items()}, scheduler
+
+    sent_at, scheduler = asyncio.run(scenario())
+    # chat 1: one at once, then 20/s
+    assert sent_at[(1, 3)] >= 0.14
+    assert sent_at[(2, 0)] < 0.05
+    assert scheduler.stats()["sent"] == 5
+
+
+def test_global_bucket_caps_all_chats(fast, monkeypatch):
+    monkeypatch.setattr(outbound, "GLOBAL_RATE", 20.0)
+
+    async def scenario():
+        scheduler = OutboundScheduler()
+        started = monotonic()
+        await asyncio.gather(*(post(scheduler, chat_id) for chat_id in range(1, 26)))
+        return monotonic() - started
+
+    # 20 from the full bucket, 5 more at 20/s
+    assert asyncio.run(scenario()) >= 0.2
+
+
+def test_retry_after_pauses_the_chat_and_retries(fast):
+    async def scenario():
+        scheduler = OutboundScheduler()
+        calls = []
+
+        async def flooded():
+            calls.append(monotonic())
+            if len(calls) == 1:
+                raise RetryAfter(0.2)
+            return "ok"
+
+        started = monotonic()
+        first = asyncio.create_task(post(scheduler, 1, callback=flooded))
+        await asyncio.sleep(0.05)
+        # queued behind the pause, not sent into the limit again
+        second_sent = []
+
+        async def later():
+            second_sent.append(monotonic())
+            return "later"
+        second = await post(scheduler, 1, endpoint="sendChatAction", callback=later)
+        return await first, second, calls, second_sent[0] - started, scheduler.stats()
+
+    result, second, calls, second_at, stats = asyncio.run(scenario())
+    assert result == "ok" and second == "later"
+    assert calls[1] - calls[0] >= 0.2
+    assert second_at >= 0.2
+    assert stats["retry_after_hits"] == 1
+
+
+def test_retry_after_only_pauses_the_flooded_chat(fast):
+    async def scenario():
+        scheduler = OutboundScheduler()
+        calls = []
+
+        async def flooded():
+            calls.append(monotonic())
+            if len(calls) == 1:
+                raise RetryAfter(0.3)
+            return "ok"
+
+        started = monotonic()
+        first = asyncio.create_task(post(scheduler, 1, callback=flooded))
+        await asyncio.sleep(0.05)
+        other = await post(scheduler, 2)
+        other_at = monotonic() - started
+        return await first, other, other_at
+
+    result, other, other_at = asyncio.run(scenario())
+    assert result == "ok" and other == 2
+    assert other_at < 0.2
+
+
+def test_retry_after_gives_up_after_max_retries(fast):
+    async def flooded():
+        raise RetryAfter(0.01)
+
+    scheduler = OutboundScheduler(max_retries=1)
+    with pytest.raises(RetryAfter):
+        asyncio.run(post(scheduler, 1, callback=flooded))
+    assert scheduler.stats()["retry_after_hits"] == 2
+
+    # a per-request override of zero never retries
+    with pytest.raises(RetryAfter):
+        asyncio.run(post(scheduler, 1, callback=flooded, retries=0))
+    assert scheduler.stats()["retry_after_hits"] == 3
+
+
+class FloodedRequest(BaseRequest):
+    """Bot API transport that answers every request with a 429."""
+
+    def __init__(self):
+        self.endpoints = []
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, **timeouts):
+        self.endpoints.append(url.rsplit("/", 1)[-1])
+        body = {"ok": False, "error_code": 429, "description": "Too Many Requests", "parameters": {"retry_after": 1}}
+        return 429, json.dumps(body).encode()
+
+
+def test_stream_edits_through_ext_bot_are_not_retried(fast):
+    # rate_limit_args must reach the scheduler: ExtBot drops falsy values such as a bare 0
+    async def scenario():
+        request = FloodedRequest()
+        bot = ExtBot("123:abc", request=request, get_updates_request=FloodedRequest(), rate_limiter=OutboundScheduler())
+        with pytest.raises(RetryAfter):
+            await bot.edit_message_text("partial answer", chat_id=1, message_id=2, rate_limit_args={"max_retries": 0})
+        return request.endpoints, bot.rate_limiter.stats()
+
+    endpoints, stats = asyncio.run(scenario())
+    assert endpoints == ["editMessageText"]
+    assert stats["retry_after_hits"] == 1
+
+
+def test_network_errors_are_only_retried_for_idempotent_requests(fast):
+    def flaky(failures):
+        calls = []
+
+        async def callback():
+            calls.append(1)
+            if len(calls) <= failures:
+                raise NetworkError("connection reset")
+            return "ok"
+        return callback, calls
+
+    scheduler = OutboundScheduler()
+    edit, edit_calls = flaky(2)
+    assert asyncio.run(post(scheduler, 1, endpoint="editMessageText", callback=edit)) == "ok"
+    assert len(edit_calls) == 3
+
+    send, send_calls = flaky(1)
+    with pytest.raises(NetworkError):
+        asyncio.run(post(scheduler, 1, endpoint="sendMessage", callback=send))
+    assert len(send_calls) == 1
+    assert scheduler.stats()["network_retries"] == 2
+
+
+def test_queue_depth_is_exported_as_gauges():
+    gauges = METRICS.snapshot()["gauges"]
+    assert gauges[("telegram_queued", ())] == outbound.OUTBOUND.queued
+    assert ("telegram_queue_waiting", (("bucket", "chat"),)) in gauges
+    assert ("telegram_queue_waiting", (("bucket", "global"),)) in gauges
+
+
+class FakeBot:
+    def __init__(self):
+        self.actions = []
+
+    async def send_chat_action(self, chat_id, action):
+        self.actions.append(chat_id)
+
+
+def test_typing_heartbeat_is_shared_until_the_last_user_leaves(monkeypatch):
+    monkeypatch.setattr(outbound, "TYPING_INTERVAL", 0.05)
+
+    async def scenario():
+        heartbeat, bot = TypingHeartbeat(), FakeBot()
+        first_done, second_done = asyncio.Event(), asyncio.Event()
+
+        async def user(done):
+            async with heartbeat.typing(bot, 1):
+                await done.wait()
+
+        first = asyncio.create_task(user(first_done))
+        second = asyncio.create_task(user(second_done))
+        await asyncio.sleep(0.12)
+        shared = len(heartbeat._chats), heartbeat._chats[1][1]
+        first_done.set()
+        await first
+        still_typing = heartbeat.active_chats()
+        sent = len(bot.actions)
+        await asyncio.sleep(0.06)
+        # one heartbeat for both users, still beating after the first left
+        assert len(bot.actions) > sent
+        second_done.set()
+        await second
+        stopped_at = len(bot.actions)
+        await asyncio.sleep(0.12)
+        return shared, still_typing, heartbeat.active_chats(), stopped_at, len(bot.actions)
+
+    shared, still_typing, active, stopped_at, final = asyncio.run(scenario())
+    assert shared == (1, 2)
+    assert still_typing == 1
+    assert active == 0 and final == stopped_at
@@ -0,0 +1,63 @@
+import asyncio
+
+import prewarm
+from prewarm import PREWARM_MAX_AGE, Prewarmer
+
+
+def test_round_evicts_stale_and_dropped_symbols(monkeypatch):
+    now = [10_000.0]
+    monkeypatch.setattr(prewarm, "time", lambda: now[0])
+    warmer = Prewarmer()
+    warmer._results = {
+        "AMD": {"data": {}, "answer": "a", "at": now[0] - 10},
+        "OLD": {"data": {}, "answer": "b", "at": now[0] - PREWARM_MAX_AGE - 1},
+        "GONE": {"data": {}, "answer": "c", "at": now[0] - 10},
+    }
+    monkeypatch.setattr(warmer, "symbols", lambda: ["AMD", "OLD"])
+    monkeypatch.setattr(warmer, "busy", lambda: True)  # stop before warming anything
+    assert asyncio.run(warmer.warm_round()) is False
+    assert set(warmer._results) == {"AMD"}
+    assert warmer.stats()["evicted"] == 2
+
+
+def test_a_crashed_job_is_logged_and_restarted(monkeypatch, caplog):
+    monkeypatch.setattr(prewarm, "PREWARM_ENABLED", True)
+    monkeypatch.setattr(prewarm, "PREWARM_RESTART_DELAY", 0.01)
+
+    async def scenario():
+        warmer = Prewarmer()
+        runs = []
+
+        async def run():
+            runs.append(1)
+            if len(runs) == 1:
+                raise RuntimeError("round failed")
+            await asyncio.sleep(3600)
+
+        monkeypatch.setattr(warmer, "run", run)
+        warmer.start()
+        await asyncio.sleep(0.1)
+        restarted = warmer._task is not None and not warmer._task.done()
+        await warmer.stop()
+        return warmer, runs, restarted
+
+    warmer, runs, restarted = asyncio.run(scenario())
+    assert restarted and len(runs) == 2
+    assert warmer.stats()["restarts"] == 1
+    assert "Pre-warm job failed" in caplog.text
+
+
+def test_stopping_cancels_without_a_restart(monkeypatch):
+    monkeypatch.setattr(prewarm, "PREWARM_ENABLED", True)
+
+    async def scenario():
+        warmer = Prewarmer()
+        monkeypatch.setattr(warmer, "run", lambda: asyncio.sleep(3600))
+        warmer.start()
+        await asyncio.sleep(0)
+        await warmer.stop()
+        return warmer
+
+    warmer = asyncio.run(scenario())
+    assert warmer._task is None and warmer._restart is None
+    assert warmer.stats()["restarts"] == 0
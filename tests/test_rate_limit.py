@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+import rate_limit
+from rate_limit import BACKGROUND, INTERACTIVE, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock; waiting on the condition advances it instead of sleeping."""
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit, "monotonic", lambda: now[0])
+
+    def wait(self, timeout=None):
+        now[0] += timeout
+        return False
+    monkeypatch.setattr(threading.Condition, "wait", wait)
+    return now
+
+
+def test_bucket_alone_allows_burst_plus_refill(clock):
+    bucket = TokenBucket(rate=1.0, capacity=30)
+    for _ in range(30):
+        assert bucket.acquire() == 0
+    started = clock[0]
+    for _ in range(60):
+        bucket.acquire()
+    # 90 calls in about 60 s: more than a 60/min quota allows
+    assert clock[0] - started == pytest.approx(60, abs=1)
+
+
+def test_sliding_window_caps_calls_per_minute(clock):
+    bucket = TokenBucket(rate=30, capacity=30, window_limit=60, window=60.0)
+    handed_out = []
+    for _ in range(150):
+        bucket.acquire()
+        handed_out.append(clock[0])
+    for i, at in enumerate(handed_out):
+        in_window = [t for t in handed_out[:i + 1] if t > at - 60.0 + 1e-6]
+        assert len(in_window) <= 60
+
+
+def test_sliding_window_keeps_the_full_quota(clock):
+    bucket = TokenBucket(rate=30, capacity=30, window_limit=60, window=60.0)
+    started = clock[0]
+    for _ in range(120):
+        bucket.acquire()
+    # 30 at once, 30 more a second later, then each call waits for one of those to leave the window
+    assert clock[0] - started == pytest.approx(61, abs=0.1)
+    assert bucket.stats()["window_limit"] == 60
+
+
+def test_background_lane_cannot_use_the_interactive_share(clock):
+    bucket = TokenBucket(rate=100, capacity=100, window_limit=60, window=60.0, lane_limits={BACKGROUND: 20})
+    for _ in range(20):
+        assert bucket.acquire(BACKGROUND) == 0
+    # the rest of the window is still there for users
+    for _ in range(40):
+        assert bucket.acquire(INTERACTIVE) == 0
+    started = clock[0]
+    bucket.acquire(BACKGROUND)
+    assert clock[0] - started == pytest.approx(60, abs=0.1)
+
+
+def test_background_waits_for_its_own_tokens_to_leave_the_window(clock):
+    bucket = TokenBucket(rate=100, capacity=100, window_limit=60, window=60.0, lane_limits={BACKGROUND: 2})
+    bucket.acquire(BACKGROUND)
+    clock[0] += 30
+    bucket.acquire(BACKGROUND)
+    bucket.acquire(INTERACTIVE)
+    started = clock[0]
+    bucket.acquire(BACKGROUND)
+    # the first background token leaves the window 30 s later; interactive tokens do not count
+    assert clock[0] - started == pytest.approx(30, abs=0.1)
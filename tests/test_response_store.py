@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+import response_store
+from cache import TTLCache
+from response_store import ReplayMiss, ResponseStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(response_store, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "responses.sqlite3")
+
+
+def test_entries_expire_after_their_ttl(clock, path):
+    store = ResponseStore(path, replay=False)
+    store.put("finnhub", ("quote", "AMD"), {"c": 150.0}, ttl=30)
+    clock[0] += 29
+    assert store.get("finnhub", ("quote", "AMD")) == ({"c": 150.0}, 1_000_000.0)
+    clock[0] += 2
+    assert store.get("finnhub", ("quote", "AMD")) is None
+    assert store.stats()["hits"] == 1 and store.stats()["misses"] == 1
+
+
+def test_a_second_instance_reads_what_the_first_wrote(clock, path):
+    ResponseStore(path, replay=False).put("llm", ("llm", "abc"), "answer", ttl=60)
+    assert ResponseStore(path, replay=False).get("llm", ("llm", "abc"))[0] == "answer"
+
+
+def test_eviction_drops_expired_entries_first_then_the_oldest(clock, path):
+    store = ResponseStore(path, max_bytes=10 ** 9, replay=False)
+    value = "x" * 100
+    store.put("t", ("old",), value, ttl=1000)
+    clock[0] += 1
+    store.put("t", ("expired",), value, ttl=5)
+    clock[0] += 1
+    store.put("t", ("middle",), value, ttl=1000)
+    clock[0] += 1
+    store.put("t", ("new",), value, ttl=1000)
+    clock[0] += 10
+    entry = store.size() // 4
+    # room for a bit over two entries: the expired one goes, then the oldest live one
+    store.max_bytes = entry * 2.5 / response_store.EVICT_TARGET
+    assert store.evict() == 2
+    assert store.get("t", ("expired",)) is None and store.get("t", ("old",)) is None
+    assert store.get("t", ("middle",)) is not None and store.get("t", ("new",)) is not None
+
+
+def test_replay_ignores_expiry_and_falls_back_to_the_family(clock, path):
+    ResponseStore(path, replay=False).put("finnhub", ("news", "AMD", "2026-10-01", "2026-10-14"), ["old"], ttl=60)
+    clock[0] += 1
+    ResponseStore(path, replay=False).put("finnhub", ("news", "AMD", "2026-10-02", "2026-10-15"), ["new"], ttl=60)
+    clock[0] += 86_400
+    replay = ResponseStore(path, replay=True)
+    assert replay.get("finnhub", ("news", "AMD", "2026-10-02", "2026-10-15"))[0] == ["new"]
+    assert replay.get("finnhub", ("news", "AMD", "2026-10-17", "2026-10-30"))[0] == ["new"]
+    assert replay.get("finnhub", ("news", "NVDA", "2026-10-17", "2026-10-30")) is None
+    assert replay.stats()["replay_fallbacks"] == 1
+
+
+def test_replay_miss_never_fetches(path):
+    cache = TTLCache("finnhub", ttls={"quote": 15}, store=ResponseStore(path, replay=True))
+
+    def fetch():
+        raise AssertionError("replay must not fetch")
+
+    with pytest.raises(ReplayMiss):
+        cache.get_or_fetch(("quote", "AMD"), fetch)
+
+
+def test_async_peek_restores_from_the_store(path):
+    store = ResponseStore(path, replay=False)
+    asyncio.run(TTLCache("llm", ttls={"llm": 300}, store=store).aput(("llm", "k"), "answer"))
+    cold = TTLCache("llm", ttls={"llm": 300}, store=store)
+    assert asyncio.run(cold.apeek(("llm", "k"))) == "answer"
+    assert asyncio.run(cold.apeek(("llm", "other"))) is None
@@ -0,0 +1,103 @@
+import numpy as np
+
+from candle_store import CANDLE_DTYPE, DAY
+from rolling_extremes import ExtremesIndex, RollingExtremes
+
+START = 1_760_000_000
+STEP = 300
+
+
+def candles(highs, lows=None, start=START):
+    highs = np.asarray(highs, dtype=float)
+    result = np.zeros(len(highs), dtype=CANDLE_DTYPE)
+    result["ts"] = start + np.arange(len(highs)) * STEP
+    result["high"] = highs
+    result["low"] = highs - 1 if lows is None else lows
+    return result
+
+
+def test_push_matches_a_full_window_scan():
+    rng = np.random.default_rng(7)
+    series = candles(100 + np.cumsum(rng.normal(0, 1, 2000)))
+    window = 50 * STEP
+    extremes = RollingExtremes(window)
+    for i, (ts, high, low) in enumerate(zip(series["ts"], series["high"], series["low"])):
+        new_high, new_low = extremes.push(int(ts), high, low)
+        in_window = series[(series["ts"] > ts - window) & (np.arange(len(series)) <= i)]
+        assert extremes.high[1] == in_window["high"].max()
+        assert extremes.low[1] == in_window["low"].min()
+        assert new_high == (high >= in_window["high"].max())
+        assert new_low == (low <= in_window["low"].min())
+
+
+def test_old_extremes_leave_the_window():
+    extremes = RollingExtremes(3 * STEP)
+    for ts, high in zip(range(START, START + 5 * STEP, STEP), (10, 5, 4, 3, 2)):
+        extremes.push(ts, high, high)
+    # the 10 and 5 highs are older than the window
+    assert extremes.high == (START + 2 * STEP, 4)
+    assert extremes.low == (START + 4 * STEP, 2)
+
+
+def test_the_newest_candle_can_be_pushed_again():
+    extremes = RollingExtremes(DAY)
+    extremes.push(START, 10, 9)
+    extremes.push(START + STEP, 10.5, 9.5)
+    assert extremes.push(START + STEP, 11, 9.5) == (True, False)
+    assert extremes.high == (START + STEP, 11)
+
+
+def test_index_feeds_only_unseen_candles():
+    index = ExtremesIndex({"1d": DAY})
+    series = candles([10, 11, 12, 11])
+    first = index.update("AMD", series[:3])
+    assert first["1d"]["new_high"] and first["1d"]["high"] == (int(series["ts"][2]), 12)
+    # the last seen candle is re-fed (it may have been incomplete), older ones are skipped
+    result = index.update("AMD", series)
+    assert not result["1d"]["new_high"]
+    assert result["1d"]["high"][1] == 12
+    assert index.last_ts("AMD") == int(series["ts"][3])
+    assert index.update("AMD", series[:2]) is None
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "extremes.json")
+    index = ExtremesIndex({"1d": DAY, "5d": 5 * DAY})
+    index.update("AMD", candles([10, 12, 11]))
+    index.save(path)
+
+    restored = ExtremesIndex.load(path, {"1d": DAY, "5d": 5 * DAY})
+    assert restored.last_ts("AMD") == index.last_ts("AMD")
+    result = restored.update("AMD", candles([13], start=START + 3 * STEP))
+    assert result["5d"]["new_high"] and result["5d"]["high"][1] == 13
+
+
+def test_changed_windows_start_empty(tmp_path):
+    path = str(tmp_path / "extremes.json")
+    index = ExtremesIndex({"1d": DAY})
+    index.update("AMD", candles([10, 12]))
+    index.save(path)
+    assert ExtremesIndex.load(path, {"1d": 2 * DAY}).last_ts("AMD") is None
+    assert ExtremesIndex.load(str(tmp_path / "missing.json"), {"1d": DAY}).last_ts("AMD") is None
+
+
+def test_scanner_reports_nothing_new_without_newer_candles(tmp_path):
+    from candle_store import CandleStore, candle_matrix
+    from fetch_yfinance import update_extremes
+
+    store = CandleStore(str(tmp_path))
+    index = ExtremesIndex({"1d": DAY})
+
+    def scan():
+        matrix = candle_matrix(["AMD", "NEW"], store, 2 * DAY)
+        return update_extremes(["AMD", "NEW"], matrix, index, store)["1d"]
+
+    store.append("AMD", candles([10, 11, 12]))
+    assert list(scan()["new_high"]) == [True, False]
+    # no new candle since the last scan: the high is not reported again
+    assert not scan()["new_high"].any()
+    store.append("AMD", candles([13], start=START + 3 * STEP))
+    store.append("NEW", candles([5, 4]))
+    state = scan()
+    assert list(state["new_high"]) == [True, False]
+    assert list(state["high"]) == [13, 5]
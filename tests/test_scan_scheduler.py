@@ -0,0 +1,76 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import scan_scheduler
+from market_hours import MARKET_TZ, in_session, next_session_open
+from scan_scheduler import scan_due, seconds_until_next_run
+
+
+@pytest.fixture(autouse=True)
+def timing(monkeypatch):
+    monkeypatch.setattr(scan_scheduler, "SCAN_INTERVAL", 300)
+    monkeypatch.setattr(scan_scheduler, "SCAN_GRACE_SECONDS", 30)
+
+
+def at(day, hour, minute, second=0):
+    return datetime(2026, 10, day, hour, minute, second, tzinfo=MARKET_TZ)
+
+
+def test_due_during_the_session():
+    assert scan_due(at(15, 9, 30))
+    assert scan_due(at(15, 11, 0))
+    assert scan_due(at(15, 15, 59, 59))
+
+
+def test_not_due_before_the_open():
+    assert not scan_due(at(15, 9, 0))
+    assert not scan_due(at(15, 9, 29, 59))
+    # a run at 9:00 sleeps until the open plus grace
+    assert seconds_until_next_run(at(15, 9, 0)) == 30 * 60 + 30
+
+
+def test_first_run_after_the_close_scans_the_last_candle():
+    # the 15:55 candle closes at 16:00; the run one grace period later still scans it
+    assert seconds_until_next_run(at(15, 15, 58)) == 150
+    assert scan_due(at(15, 16, 0, 30))
+    assert not scan_due(at(15, 16, 5, 30))
+    # after it, the next run is the next session's first one
+    assert seconds_until_next_run(at(15, 16, 0, 30)) == (at(16, 9, 30) - at(15, 16, 0, 30)).total_seconds() + 30
+
+
+def test_weekends_are_skipped():
+    assert not scan_due(at(17, 11, 0))  # Saturday
+    assert not scan_due(at(18, 11, 0))  # Sunday
+    friday_close = at(16, 16, 1)
+    assert seconds_until_next_run(friday_close) == (at(19, 9, 30) - friday_close).total_seconds() + 30
+
+
+def test_exchange_holidays_are_skipped():
+    thanksgiving = datetime(2026, 11, 26, 11, 0, tzinfo=MARKET_TZ)
+    assert not in_session(thanksgiving) and not scan_due(thanksgiving)
+    day_before = datetime(2026, 11, 25, 16, 1, tzinfo=MARKET_TZ)
+    assert next_session_open(day_before) == datetime(2026, 11, 27, 9, 30, tzinfo=MARKET_TZ)
+    # Independence Day on a Saturday closes the Friday before
+    assert not in_session(datetime(2026, 7, 3, 11, 0, tzinfo=MARKET_TZ))
+    assert in_session(datetime(2026, 7, 2, 11, 0, tzinfo=MARKET_TZ))
+
+
+def test_a_failing_cycle_is_logged_and_the_loop_goes_on(monkeypatch, caplog):
+    cycles = []
+
+    async def run_cycle(symbols, notifier):
+        cycles.append(symbols)
+        if len(cycles) == 1:
+            raise RuntimeError("download failed")
+        raise asyncio.CancelledError  # stops the loop after the second cycle
+
+    monkeypatch.setattr(scan_scheduler, "get_watchlist", lambda: ["AMD"])
+    monkeypatch.setattr(scan_scheduler, "scan_due", lambda: True)
+    monkeypatch.setattr(scan_scheduler, "seconds_until_next_run", lambda: 0)
+    monkeypatch.setattr(scan_scheduler, "run_cycle", run_cycle)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(scan_scheduler.run_forever())
+    assert cycles == [["AMD"], ["AMD"]]
+    assert "Scan cycle failed" in caplog.text
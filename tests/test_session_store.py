@@ -0,0 +1,68 @@
+import pytest
+
+import session_store
+from session_store import SessionStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [10_000.0]
+    monkeypatch.setattr(session_store, "time", lambda: now[0])
+    return now
+
+
+def payload(symbol, news=3):
+    return {"symbol": symbol, "price": {"c": 10.0}, "news": [{"headline": f"{symbol} {i}"} for i in range(news)]}
+
+
+def test_snapshot_is_fresh_for_its_symbol_until_it_expires(clock):
+    store = SessionStore(max_age=300)
+    store.put(1, "amd", payload("AMD"))
+    assert store.get_fresh(1, "AMD")["data"]["symbol"] == "AMD"
+    assert store.get_fresh(1, "NVDA") is None
+    assert store.get_fresh(2, "AMD") is None
+    clock[0] += 301
+    assert store.get_fresh(1, "AMD") is None
+    assert store.last_symbol(1) is None
+    assert store.stats()["hits"] == 1 and store.stats()["misses"] == 3
+
+
+def test_the_fetch_time_not_the_store_time_counts(clock):
+    store = SessionStore(max_age=300)
+    store.put(1, "AMD", payload("AMD"), fetched_at=clock[0] - 290)
+    clock[0] += 11
+    assert store.get_fresh(1, "AMD") is None
+
+
+def test_least_recently_used_users_are_evicted_under_the_cap(clock):
+    size = session_store._estimate_size(payload("AMD"))
+    store = SessionStore(max_bytes=int(size * 2.5))
+    store.put(1, "AMD", payload("AMD"))
+    store.put(2, "NVD", payload("NVD"))
+    store.get_fresh(1, "AMD")
+    store.put(3, "TSL", payload("TSL"))
+    assert store.get_fresh(2, "NVD") is None
+    assert store.get_fresh(1, "AMD") is not None and store.get_fresh(3, "TSL") is not None
+    assert store.stats()["evictions"] == 1
+
+
+def test_fresh_snapshots_survive_a_restart(clock, tmp_path):
+    path = str(tmp_path / "sessions.json")
+    store = SessionStore(max_age=300, path=path)
+    store.put(1, "AMD", payload("AMD"), fetched_at=clock[0] - 250)
+    store.put(2, "NVDA", payload("NVDA"))
+    store.put(3, "OLD", payload("OLD"), fetched_at=clock[0] - 400)
+    store.save()
+    clock[0] += 60
+    restored = SessionStore(max_age=300, path=path)
+    assert restored.get_fresh(2, "NVDA")["data"] == payload("NVDA")
+    assert restored.last_symbol(2) == "NVDA"
+    # older than max_age once restored: dropped on load, never served
+    assert restored.get_fresh(1, "AMD") is None and restored.get_fresh(3, "OLD") is None
+    assert restored.stats()["users"] == 1
+
+
+def test_a_corrupt_file_starts_empty(tmp_path):
+    path = tmp_path / "sessions.json"
+    path.write_text("{not json")
+    assert SessionStore(path=str(path)).stats()["users"] == 0
@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+
+from candle_store import CANDLE_DTYPE, DAY, CandleStore, candle_matrix
+from fetch_yfinance import update_extremes
+from rolling_extremes import ExtremesIndex
+from signals import SignalEngine
+
+SESSION_OPEN = 1_760_016_600  # 2025-10-09 13:30 UTC
+STEP = 300
+
+
+def session(day, closes, opens=None, volumes=None):
+    """One session of 5-minute candles, `day` sessions after SESSION_OPEN."""
+    closes = np.asarray(closes, dtype=float)
+    result = np.zeros(len(closes), dtype=CANDLE_DTYPE)
+    result["ts"] = SESSION_OPEN + day * DAY + np.arange(len(closes)) * STEP
+    result["open"] = closes if opens is None else opens
+    result["close"] = closes
+    result["high"] = np.maximum(result["open"], closes) + 0.1
+    result["low"] = np.minimum(result["open"], closes) - 0.1
+    result["volume"] = 1000 if volumes is None else volumes
+    return result
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CandleStore(str(tmp_path))
+
+
+def evaluate(engine, store, history, extremes=None):
+    for symbol, candles in history.items():
+        store.append(symbol, candles)
+    symbols = list(history)
+    return engine.evaluate(symbols, candle_matrix(symbols, store, engine.lookback_seconds()), extremes)
+
+
+def by_rule(alerts):
+    return {(alert["symbol"], alert["window"]): alert for alert in alerts}
+
+
+def test_gap_up_and_down(store):
+    flat = session(0, [100] * 78)
+    engine = SignalEngine([
+        {"name": "gap_up", "type": "gap", "min_pct": 2.0},
+        {"name": "gap_down", "type": "gap", "min_pct": 2.0, "direction": "down"},
+    ])
+    alerts = by_rule(evaluate(engine, store, {
+        "UP": np.concatenate([flat, session(1, [103, 103], opens=[103, 103])]),
+        "DOWN": np.concatenate([flat, session(1, [97, 97], opens=[97, 97])]),
+        "FLAT": np.concatenate([flat, session(1, [101, 101], opens=[101, 101])]),
+    }))
+    assert set(alerts) == {("UP", "gap_up"), ("DOWN", "gap_down")}
+    assert alerts[("UP", "gap_up")]["level"] == pytest.approx(3.0)
+    assert alerts[("DOWN", "gap_down")]["level"] == pytest.approx(3.0)
+    assert alerts[("UP", "gap_up")]["min_step"] == 1.0
+
+
+def test_move_since_open(store):
+    engine = SignalEngine([{"name": "move", "type": "move_since_open", "min_pct": 3.0}])
+    alerts = evaluate(engine, store, {
+        "RUN": session(0, np.linspace(100, 104, 30)),
+        "DRIFT": session(0, np.linspace(100, 101, 30)),
+    })
+    assert [a["symbol"] for a in alerts] == ["RUN"]
+    assert alerts[0]["level"] == pytest.approx(4.0)
+
+
+def test_volume_spike(store):
+    rng = np.random.default_rng(3)
+    quiet = 1000 + rng.normal(0, 50, 79)
+    spike = quiet.copy()
+    spike[-1] = 5000
+    engine = SignalEngine([{"name": "volume", "type": "volume_spike", "z": 4.0, "lookback": 78}])
+    alerts = evaluate(engine, store, {
+        "SPIKE": session(0, [100] * 79, volumes=spike),
+        "QUIET": session(0, [100] * 79, volumes=quiet),
+    })
+    assert [a["symbol"] for a in alerts] == ["SPIKE"]
+    assert alerts[0]["level"] > 4.0
+
+
+def test_ma_cross_only_fires_on_the_crossing_candle(store):
+    engine = SignalEngine([{"name": "cross", "type": "ma_cross", "fast": 3, "slow": 6}])
+    falling = list(np.linspace(110, 100, 20))
+    assert evaluate(engine, store, {"X": session(0, falling + [101])}) == []
+    alerts = evaluate(engine, store, {"X": session(0, falling + [101, 106])})
+    assert [a["symbol"] for a in alerts] == ["X"]
+    assert evaluate(engine, store, {"X": session(0, falling + [101, 106, 108])}) == []
+
+
+def test_new_high_and_low_read_the_extremes_index(store):
+    engine = SignalEngine([
+        {"name": "high_5d", "type": "new_high", "days": 5},
+        {"name": "low_5d", "type": "new_low", "days": 5},
+    ])
+    index = ExtremesIndex(engine.extreme_windows())
+    history = {"UP": session(0, np.linspace(100, 110, 40)), "DOWN": session(0, np.linspace(100, 90, 40))}
+    for symbol, candles in history.items():
+        store.append(symbol, candles)
+    symbols = list(history)
+    matrix = candle_matrix(symbols, store, engine.lookback_seconds())
+    alerts = by_rule(engine.evaluate(symbols, matrix, update_extremes(symbols, matrix, index, store)))
+    assert set(alerts) == {("UP", "high_5d"), ("DOWN", "low_5d")}
+    assert alerts[("UP", "high_5d")]["level"] == pytest.approx(110.1)
+    assert alerts[("UP", "high_5d")]["min_step"] is None
+    # nothing newer since the last update: not new again
+    assert engine.evaluate(symbols, matrix, update_extremes(symbols, matrix, index, store)) == []
+    assert evaluate(engine, store, history, {}) == []
+
+
+def test_extremes_rules_do_not_widen_the_matrix():
+    engine = SignalEngine([
+        {"name": "high_30d", "type": "new_high", "days": 30},
+        {"name": "cross", "type": "ma_cross", "fast": 20, "slow": 50},
+    ])
+    assert engine.extreme_windows() == {"30d": 30 * DAY}
+    assert engine.lookback_seconds() == 2 * DAY
+
+
+def test_rule_settings_override_the_defaults(store):
+    engine = SignalEngine([{"name": "gap", "type": "gap", "min_pct": 1.0, "min_step": 0.5, "message": "{symbol} {level:.1f}"}])
+    alerts = evaluate(engine, store, {"X": np.concatenate([session(0, [100] * 3), session(1, [102], opens=[102])])})
+    assert alerts[0]["message"] == "X 2.0"
+    assert alerts[0]["min_step"] == 0.5
+
+
+def test_symbols_without_candles_never_alert(store):
+    engine = SignalEngine([{"name": "move", "type": "move_since_open", "min_pct": 0.0, "direction": "down"}])
+    assert evaluate(engine, store, {"EMPTY": np.zeros(0, dtype=CANDLE_DTYPE)}) == []
+
+
+@pytest.mark.parametrize("rule, error", [
+    ({"name": "x", "type": "moon_phase"}, "Unknown scan rule type"),
+    ({"name": "x", "type": "gap", "min_pc": 2}, "unknown parameters min_pc"),
+])
+def test_invalid_rules_are_rejected(rule, error):
+    with pytest.raises(ValueError, match=error):
+        SignalEngine([rule])
+
+
+def test_timings_are_kept_per_rule(store):
+    engine = SignalEngine([{"name": "gap", "type": "gap"}, {"name": "move", "type": "move_since_open"}])
+    evaluate(engine, store, {"X": session(0, [100] * 3)})
+    stats = engine.stats()
+    assert stats["runs"] == 1
+    assert set(stats["last_ms"]) == set(stats["avg_ms"]) == {"gap", "move"}
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+import finhub_api
+from finhub_api import MARKET_CACHE, SYMBOL_CACHE, get_stock_data
+
+QUOTE = {"c": 150.0, "d": 1.0, "dp": 0.67, "h": 151.0, "l": 148.0, "o": 149.0, "pc": 149.0, "t": 1_760_000_000}
+EMPTY_QUOTE = {"c": 0, "d": None, "dp": None, "h": 0, "l": 0, "o": 0, "pc": 0, "t": 0}
+
+
+class FakeClient:
+    """Stands in for the pooled Finnhub client; records calls, delays keyed by endpoint or (endpoint, symbol)."""
+
+    def __init__(self, quotes=None, delays=None):
+        self.quotes = quotes or {}
+        self.delays = delays or {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _record(self, name, *args):
+        with self._lock:
+            self.calls.append((name,) + args)
+        time.sleep(self.delays.get((name,) + args[:1], self.delays.get(name, 0)))
+
+    def quote(self, symbol):
+        self._record("quote", symbol)
+        return self.quotes.get(symbol, QUOTE)
+
+    def company_news(self, symbol, _from=None, to=None):
+        self._record("company_news", symbol)
+        return [{"headline": f"{symbol} news {i}"} for i in range(15)]
+
+    def stock_insider_sentiment(self, symbol, _from, to):
+        self._record("stock_insider_sentiment", symbol)
+        return {"data": [{"year": 2026, "month": 9, "change": 10, "mspr": 1.5}], "symbol": symbol}
+
+    def general_news(self, category, min_id=0):
+        self._record("general_news")
+        return [{"headline": "Markets rally"}]
+
+    def symbol_lookup(self, query):
+        self._record("symbol_lookup", query)
+        return {"result": [{"description": "ADVANCED MICRO DEVICES", "symbol": "AMD"}]}
+
+    def symbols_called(self, name):
+        return [call[1] for call in self.calls if call[0] == name]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    fake = FakeClient()
+    monkeypatch.setattr(finhub_api, "get_finhub_client", lambda lane=None: fake)
+    monkeypatch.setattr(finhub_api, "market_fear_and_greed", lambda: "Fear and Greed Index: Greed")
+    SYMBOL_CACHE.invalidate()
+    MARKET_CACHE.invalidate()
+    yield fake
+    SYMBOL_CACHE.invalidate()
+    MARKET_CACHE.invalidate()
+
+
+def test_full_payload_from_concurrent_fetches(client):
+    data = get_stock_data("AMD", "2026-10-01", "2026-10-15")
+    assert data["price"] == QUOTE and data["Market"] == QUOTE
+    assert len(data["news"]) == 10
+    assert data["insider_sentiment"]["symbol"] == "AMD"
+    assert data["Market_fear_and_greed"] == "Fear and Greed Index: Greed"
+    assert "partial" not in data and "missing" not in data
+
+
+def test_invalid_ticker_skips_the_symbol_endpoints(client):
+    client.quotes["XXXX"] = EMPTY_QUOTE
+    answer = get_stock_data("XXXX", "2026-10-01", "2026-10-15")
+    assert isinstance(answer, str) and "AMD" in answer
+    # the market context may have started alongside the quote, the ticker's own endpoints never do
+    assert "XXXX" not in client.symbols_called("company_news")
+    assert "XXXX" not in client.symbols_called("stock_insider_sentiment")
+
+
+def test_slow_endpoint_is_reported_missing(client, monkeypatch):
+    monkeypatch.setitem(finhub_api.ENDPOINT_TIMEOUTS, "news", 0.1)
+    client.delays[("company_news", "AMD")] = 0.5
+    started = time.monotonic()
+    data = get_stock_data("AMD", "2026-10-01", "2026-10-15")
+    assert time.monotonic() - started < 0.45
+    assert data["partial"] is True
+    assert data["missing"] == {"news": "timed out after 0.1s"}
+    assert data["news"] is None
+    assert data["price"] == QUOTE and data["Market news"] is not None
+
+
+def test_failed_endpoint_is_reported_missing(client, monkeypatch):
+    def broken(symbol, _from, to):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(client, "stock_insider_sentiment", broken)
+    data = get_stock_data("AMD", "2026-10-01", "2026-10-15")
+    assert data["missing"]["insider_sentiment"] == "failed: boom"
+    assert data["missing"]["insider_market"] == "failed: boom"
+
+
+def test_cached_sections_are_not_fetched_again(client):
+    get_stock_data("AMD", "2026-10-01", "2026-10-15")
+    calls = len(client.calls)
+    get_stock_data("AMD", "2026-10-01", "2026-10-15")
+    assert len(client.calls) == calls
+    # another ticker reuses the market context and only fetches its own endpoints
+    get_stock_data("NVDA", "2026-10-01", "2026-10-15")
+    new_calls = client.calls[calls:]
+    assert sorted(call[0] for call in new_calls) == ["company_news", "quote", "stock_insider_sentiment"]
+    assert all(call[1] == "NVDA" for call in new_calls)
@@ -0,0 +1,66 @@
+from datetime import date
+
+import pytest
+
+import cache
+import finhub_api
+from finhub_api import SYMBOL_CACHE, get_stock_insider_sentiment, get_symbol_insider_sentiment, get_symbol_quote
+
+EMPTY_INSIDER = {"data": [], "symbol": "AMD"}
+FALLBACK_INSIDER = {"data": [{"year": 2026, "month": 8, "change": 10, "mspr": 1.5}], "symbol": "AMD"}
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    def quote(self, symbol):
+        self.calls.append(("quote", symbol))
+        return {"c": 150.0 + len(self.calls)}
+
+    def stock_insider_sentiment(self, symbol, _from, to):
+        self.calls.append(("insider", symbol, _from))
+        # only the widened 90-day window has data
+        return EMPTY_INSIDER if _from == "2026-10-01" else FALLBACK_INSIDER
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, "monotonic", lambda: now[0])
+    SYMBOL_CACHE.invalidate()
+    yield now
+    SYMBOL_CACHE.invalidate()
+
+
+def test_stale_quote_is_served_while_it_refreshes(clock, monkeypatch):
+    client = FakeClient()
+    first = get_symbol_quote(client, "amd")
+    clock[0] += 10
+    assert get_symbol_quote(client, "AMD") == first
+    refreshes = []
+    # run the background refresh by hand, after the stale quote was handed out
+    monkeypatch.setattr(cache._REFRESH_POOL, "submit", lambda fn, *args: refreshes.append((fn, args)))
+    clock[0] += 10  # past the 15 s TTL, within the 15 s stale window
+    assert get_symbol_quote(client, "AMD") == first
+    fn, args = refreshes[0]
+    fn(*args)
+    assert get_symbol_quote(client, "AMD") != first
+    assert client.calls == [("quote", "amd"), ("quote", "AMD")]
+    # past TTL + stale the quote is fetched before answering
+    clock[0] += 31
+    assert get_symbol_quote(client, "AMD") == {"c": 153.0}
+
+
+def test_raw_and_fallback_insider_sentiment_are_cached_apart(clock, monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(finhub_api, "get_finhub_client", lambda lane=None: client)
+    start, end = date(2026, 10, 1), date(2026, 10, 15)
+    # the payload's insider section falls back to 90 days when the window is empty
+    assert get_symbol_insider_sentiment(client, "AMD", start, end) == FALLBACK_INSIDER
+    # the raw lookup for the same window must not be answered with that fallback
+    assert get_stock_insider_sentiment("AMD", start.isoformat(), end.isoformat()) == EMPTY_INSIDER
+    calls = len(client.calls)
+    get_symbol_insider_sentiment(client, "AMD", start, end)
+    get_stock_insider_sentiment("AMD", start.isoformat(), end.isoformat())
+    assert len(client.calls) == calls == 3
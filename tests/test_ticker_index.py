@@ -0,0 +1,111 @@
+import gzip
+import os
+
+import pytest
+
+from ticker_index import TickerIndex, normalize_ticker
+
+NAMES = {
+    "AMD": "ADVANCED MICRO DEVICES",
+    "AAPL": "APPLE INC",
+    "AAP": "ADVANCE AUTO PARTS INC",
+    "NVDA": "NVIDIA CORP",
+    "INTC": "INTEL CORP",
+    "BRK.B": "BERKSHIRE HATHAWAY INC-CL B",
+    "MSFT": "MICROSOFT CORP",
+}
+
+
+@pytest.fixture
+def index(tmp_path):
+    tickers = TickerIndex(path=str(tmp_path / "tickers.tsv.gz"))
+    tickers.save(NAMES)
+    assert tickers.load()
+    return tickers
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("amd", "AMD"),
+    (" NVDA ", "NVDA"),
+    ("brk-b", "BRK.B"),
+    ("BRK/B", "BRK.B"),
+    ("BRK.B", "BRK.B"),
+    ("TOOLONG", None),
+    ("AM D", None),
+    ("123", None),
+    ("", None),
+    (None, None),
+])
+def test_normalize_ticker(text, expected):
+    assert normalize_ticker(text) == expected
+
+
+def test_unloaded_index_knows_nothing(tmp_path):
+    tickers = TickerIndex(path=str(tmp_path / "missing.tsv.gz"))
+    assert not tickers.load()
+    assert tickers.is_known("AMD") is None
+    assert tickers.suggest("AMD") == []
+    assert tickers.prefix("A") == []
+
+
+def test_known_symbols_and_names(index):
+    assert len(index) == len(NAMES)
+    assert index.is_known("amd") is True
+    assert index.is_known("AMDX") is False
+    assert index.name("brk.b") == "BERKSHIRE HATHAWAY INC-CL B"
+
+
+def test_prefix_search(index):
+    assert index.prefix("AA") == ["AAP", "AAPL"]
+    assert index.prefix("A", limit=2) == ["AAP", "AAPL"]
+    assert index.prefix("Z") == []
+
+
+@pytest.mark.parametrize("typo, expected", [
+    ("AMDD", "AMD"),     # one character too many
+    ("NVA", "NVDA"),     # one character missing
+    ("INTX", "INTC"),    # substituted
+    ("MSTF", "MSFT"),    # swapped
+    ("NVIDIA", "NVDA"),  # company name
+])
+def test_suggestions(index, typo, expected):
+    suggestions = index.suggest(typo)
+    assert suggestions[0] == (expected, NAMES[expected])
+    assert typo not in [symbol for symbol, _ in suggestions]
+
+
+def test_suggestions_prefer_closer_symbols(index):
+    assert [symbol for symbol, _ in index.suggest("AAPP")][:2] == ["AAP", "AAPL"]
+
+
+def test_saved_file_is_a_gzipped_symbol_list(index):
+    with gzip.open(index.path, "rt", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines[0] == "AAP\tADVANCE AUTO PARTS INC"
+    assert len(lines) == len(NAMES)
+    assert not os.path.exists(index.path + ".tmp")
+
+
+def test_refresh_swaps_in_the_new_universe(index, monkeypatch):
+    class Client:
+        def stock_symbols(self, exchange):
+            return [{"symbol": "amd", "description": "Advanced  Micro Devices"}, {"symbol": "", "description": "skipped"}]
+
+    monkeypatch.setattr("ticker_index.get_client", lambda lane: Client())
+    index.refresh()
+    assert len(index) == 1
+    assert index.name("AMD") == "Advanced Micro Devices"
+    assert not index.stale()
+    reloaded = TickerIndex(path=index.path)
+    assert reloaded.load() and reloaded.is_known("AMD")
+
+
+def test_refresh_keeps_the_old_index_when_finnhub_returns_nothing(index, monkeypatch):
+    class Client:
+        def stock_symbols(self, exchange):
+            return []
+
+    monkeypatch.setattr("ticker_index.get_client", lambda lane: Client())
+    with pytest.raises(ValueError):
+        index.refresh()
+    assert index.is_known("NVDA")
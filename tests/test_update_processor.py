@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime
+
+from telegram import Chat, Message, Update
+
+from concurrency import ChatOrderedUpdateProcessor
+
+
+def make_update(update_id, chat_id):
+    chat = Chat(id=chat_id, type=Chat.PRIVATE)
+    return Update(update_id, message=Message(update_id, datetime.now(), chat, text="AMD"))
+
+
+def test_a_flooded_chat_does_not_block_other_chats():
+    async def scenario():
+        processor = ChatOrderedUpdateProcessor(max_concurrent_updates=2)
+        release = asyncio.Event()
+        order = []
+
+        async def handle(name, wait=False):
+            if wait:
+                await release.wait()
+            order.append(name)
+
+        flood = [
+            asyncio.create_task(processor.process_update(make_update(i, 1), handle(f"a{i}", wait=True)))
+            for i in range(5)
+        ]
+        await asyncio.sleep(0.01)
+        other = asyncio.create_task(processor.process_update(make_update(10, 2), handle("b")))
+        await asyncio.wait_for(other, 1)
+        assert order == ["b"]
+        release.set()
+        await asyncio.gather(*flood)
+        return order
+
+    assert asyncio.run(scenario()) == ["b", "a0", "a1", "a2", "a3", "a4"]
+
+
+def test_updates_beyond_the_chat_cap_are_dropped():
+    async def scenario():
+        processor = ChatOrderedUpdateProcessor(max_concurrent_updates=4, max_pending_per_chat=2)
+        release = asyncio.Event()
+        done = []
+
+        async def handle(name):
+            await release.wait()
+            done.append(name)
+
+        tasks = [asyncio.create_task(processor.process_update(make_update(i, 1), handle(i))) for i in range(5)]
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(*tasks)
+        return processor, done
+
+    processor, done = asyncio.run(scenario())
+    assert done == [0, 1, 2]
+    assert processor.dropped == 2
+
+
+def test_a_failing_update_does_not_stall_the_chat_queue(caplog):
+    async def scenario():
+        processor = ChatOrderedUpdateProcessor(max_concurrent_updates=2)
+        release = asyncio.Event()
+        done = []
+
+        async def failing():
+            await release.wait()
+            raise RuntimeError("handler failed")
+
+        async def handle(name):
+            done.append(name)
+
+        first = asyncio.create_task(processor.process_update(make_update(1, 1), failing()))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(processor.process_update(make_update(2, 1), handle("second")))
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.wait_for(asyncio.gather(first, second), 1)
+        return processor, done
+
+    processor, done = asyncio.run(scenario())
+    assert done == ["second"]
+    assert processor._chat_queues == {}
+    assert "Update of chat 1 failed" in caplog.text
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ai
+from finhub_api import collect_jobs, submit_jobs
+
+
+def test_queued_jobs_get_their_full_timeout_from_run_start():
+    pool = ThreadPoolExecutor(max_workers=1)
+    jobs = {name: (lambda name=name: time.sleep(0.1) or name) for name in ("a", "b", "c")}
+    started, futures = submit_jobs(jobs, pool=pool)
+    # each job takes 0.1 s, but "c" only starts after 0.2 s in the queue
+    results, missing = collect_jobs(started, futures, {"a": 0.15, "b": 0.15, "c": 0.15}, from_run_start=True)
+    assert results == {"a": "a", "b": "b", "c": "c"}
+    assert missing == {}
+    pool.shutdown()
+
+
+def test_deadlines_count_from_submission_by_default():
+    pool = ThreadPoolExecutor(max_workers=1)
+    jobs = {name: (lambda name=name: time.sleep(0.1) or name) for name in ("a", "b", "c")}
+    started, futures = submit_jobs(jobs, pool=pool)
+    results, missing = collect_jobs(started, futures, {"a": 0.15, "b": 0.15, "c": 0.15})
+    assert "a" in results and "c" in missing
+    pool.shutdown(wait=True)
+
+
+def test_watchlist_batches_are_bounded(monkeypatch):
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    async def fake_llm(payload, prompt):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return "[]"
+
+    monkeypatch.setattr(ai, "ainvoke_nvidia_ai", fake_llm)
+    symbols = {f"S{i}": {"symbol": f"S{i}", "price": {"c": 1}} for i in range(20)}
+    asyncio.run(ai.arate_watchlist({"market": {}, "symbols": symbols}, batch_size=2, concurrency=3))
+    assert peak[0] == 3
+
+
+def test_watchlist_is_capped_at_one_wave_of_batches():
+    symbols = [f"S{i}" for i in range(ai.WATCHLIST_MAX_SYMBOLS + 4)]
+    rated, dropped = ai.cap_watchlist(symbols)
+    assert ai.WATCHLIST_MAX_SYMBOLS == ai.WATCHLIST_BATCH_SIZE * ai.WATCHLIST_CONCURRENCY
+    assert rated == symbols[:ai.WATCHLIST_MAX_SYMBOLS]
+    assert dropped == symbols[ai.WATCHLIST_MAX_SYMBOLS:]
+    assert ai.cap_watchlist(["AMD", "NVDA"]) == (["AMD", "NVDA"], [])
+
+
+def test_watchlist_fetches_use_the_bulk_lane(monkeypatch):
+    import finhub_api
+    from rate_limit import BULK
+
+    lanes = []
+    monkeypatch.setattr(finhub_api, "get_finhub_client", lambda lane=None: lanes.append(lane) or object())
+    monkeypatch.setattr(finhub_api, "market_jobs", lambda client, from_date, to_date: {})
+    monkeypatch.setattr(finhub_api, "symbol_jobs", lambda client, symbol, from_date, to_date: {})
+    finhub_api.get_watchlist_data([], "2026-10-01", "2026-10-15")
+    assert lanes == [BULK]